@@ -3,7 +3,7 @@
 {
     "name": "MRP BOM EVR Customisation",
     "summary": "Custom enhancements for MRP BOM and EVR processes",
-    "version": "18.0.0.29",
+    "version": "18.0.0.37",
     "category": "Manufacturing",
     "license": "LGPL-3",
     'author': 'Creyox Technologies',
@@ -26,6 +26,7 @@
         "views/mrp_bom_usage_view.xml",
         "views/mrp_bom_action_view.xml",
         "data/ir_cron_data.xml",
+        "data/mrp_bom_data.xml",
     ],
     'assets': {
         'web.assets_backend': [
@@ -10,5 +10,8 @@ from . import stock_location_helpers
 from . import bom_helpers
 from . import mrp_bom_line_branch_components
 from . import mrp_bom_line_branch_assignment
+from . import mrp_bom_rebuild_request
+from . import mrp_bom_free_stock_queue
+from . import stock_quant
 from . import purchase_order_line
 from . import product_template
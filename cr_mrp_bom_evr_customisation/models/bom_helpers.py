@@ -1,11 +1,115 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
+import logging
+
 from odoo import models, api
 
+_logger = logging.getLogger(__name__)
+
+# Branch code blocks: A-Z, then A1-Z9, then AA-ZZ, AAA-ZZZ, ... (unbounded)
+BRANCH_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BRANCH_SINGLE_COUNT = 26
+BRANCH_DIGIT_COUNT = 26 * 9
+
+# Pending bus notifications of the current transaction, flushed at commit
+NOTIFICATION_BUFFER_KEY = 'cr_mrp_bom_notifications'
+NOTIFICATION_MAX_LINES = 10
+NOTIFICATION_SEVERITY = ['info', 'success', 'warning', 'danger']
+
+# Tracing: per-subsystem level in ir.config_parameter, e.g.
+#   cr_mrp_bom.trace_level.transfers = debug
+# falling back to cr_mrp_bom.trace_level, then to 'info' (summaries only)
+TRACE_PARAM = 'cr_mrp_bom.trace_level'
+TRACE_DEFAULT_LEVEL = 'info'
+
+# Per-transaction free stock snapshot: product -> available qty per location category
+FREE_STOCK_SNAPSHOT_KEY = 'cr_mrp_bom_free_stock_snapshot'
+
+
+class BomTracer:
+    """
+    Level-gated logger for one subsystem. Arguments are formatted lazily and
+    callables among them are only evaluated when the record is emitted, so
+    disabled traces cost neither string formatting nor ORM reads.
+    """
+
+    def __init__(self, subsystem, level):
+        self.subsystem = subsystem
+        self.level = level
+        self.logger = _logger.getChild(f"trace.{subsystem}")
+
+    def enabled(self, level=logging.DEBUG):
+        return level >= self.level and self.logger.isEnabledFor(level)
+
+    def _log(self, level, msg, args):
+        if not self.enabled(level):
+            return
+        self.logger.log(level, msg, *(arg() if callable(arg) else arg for arg in args))
+
+    def debug(self, msg, *args):
+        self._log(logging.DEBUG, msg, args)
+
+    def info(self, msg, *args):
+        self._log(logging.INFO, msg, args)
+
+    def summary(self, operation, **counters):
+        """One INFO line per operation: ``[subsystem] operation: key=value, ...``"""
+        if not self.enabled(logging.INFO):
+            return
+        details = ', '.join(
+            f"{key}={value() if callable(value) else value}" for key, value in counters.items()
+        )
+        self.logger.info("[%s] %s: %s", self.subsystem, operation, details)
+
+
 class MrpBomHelpers(models.AbstractModel):
     _name = "cr.mrp.bom.helpers"
     _description = "Helper: find ancestor/root BOMs"
 
+    @api.model
+    def encode_branch_code(self, index):
+        """
+        Map a 0-based branch index to its code: A..Z, A1..Z9, AA..ZZ, AAA..
+        Bijective with decode_branch_code, never runs out of codes.
+        """
+        if index < BRANCH_SINGLE_COUNT:
+            return BRANCH_LETTERS[index]
+        index -= BRANCH_SINGLE_COUNT
+        if index < BRANCH_DIGIT_COUNT:
+            return f"{BRANCH_LETTERS[index // 9]}{index % 9 + 1}"
+        index -= BRANCH_DIGIT_COUNT
+
+        # Letter-only codes of length >= 2, one block of 26**length per length
+        length = 2
+        while index >= 26 ** length:
+            index -= 26 ** length
+            length += 1
+        chars = []
+        for _i in range(length):
+            index, rest = divmod(index, 26)
+            chars.append(BRANCH_LETTERS[rest])
+        return ''.join(reversed(chars))
+
+    @api.model
+    def decode_branch_code(self, code):
+        """Inverse of encode_branch_code. Returns -1 for names that are not branch codes."""
+        if not code or code[0] not in BRANCH_LETTERS:
+            return -1
+        if len(code) == 1:
+            return BRANCH_LETTERS.index(code)
+        if len(code) == 2 and code[1] in '123456789':
+            return BRANCH_SINGLE_COUNT + BRANCH_LETTERS.index(code[0]) * 9 + int(code[1]) - 1
+        if any(c not in BRANCH_LETTERS for c in code):
+            return -1
+
+        index = BRANCH_SINGLE_COUNT + BRANCH_DIGIT_COUNT
+        for length in range(2, len(code)):
+            index += 26 ** length
+        value = 0
+        for c in code:
+            value = value * 26 + BRANCH_LETTERS.index(c)
+        return index + value
+
     @api.model
     def _get_parent_bom_lines(self, bom):
         """
@@ -76,3 +180,235 @@ class MrpBomHelpers(models.AbstractModel):
                     queue.append(parent_bom)
 
         return list(roots)
+
+    # ─────────────────────────────────────────────
+    # Tracing
+    # ─────────────────────────────────────────────
+    @api.model
+    def _get_tracer(self, subsystem):
+        """Tracer for ``subsystem`` at the level configured in the system parameters."""
+        Param = self.env['ir.config_parameter'].sudo()
+        level_name = (
+            Param.get_param(f"{TRACE_PARAM}.{subsystem}")
+            or Param.get_param(TRACE_PARAM)
+            or TRACE_DEFAULT_LEVEL
+        )
+        level = logging.getLevelName(level_name.strip().upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+        return BomTracer(subsystem, level)
+
+    # ─────────────────────────────────────────────
+    # Coalesced bus notifications
+    # ─────────────────────────────────────────────
+    @api.model
+    def _queue_notification(self, partner, payload):
+        """
+        Buffer a 'simple_notification' for ``partner`` instead of sending it
+        right away. Everything queued during the transaction is flushed at
+        commit as one summarized notification per partner.
+        """
+        if not partner:
+            return
+        cr = self.env.cr
+        buffer = cr.precommit.data.get(NOTIFICATION_BUFFER_KEY)
+        if buffer is None:
+            buffer = cr.precommit.data[NOTIFICATION_BUFFER_KEY] = {}
+            env = self.env
+            cr.precommit.add(lambda: env['cr.mrp.bom.helpers']._flush_notifications())
+        for partner_id in partner.ids:
+            buffer.setdefault(partner_id, []).append(dict(payload))
+
+    @api.model
+    def _summarize_notifications(self, payloads):
+        """Merge buffered payloads into a single notification payload."""
+        if len(payloads) == 1:
+            return payloads[0]
+
+        titles = list(dict.fromkeys(p.get('title') or '' for p in payloads))
+        lines = []
+        for p in payloads:
+            message = p.get('message') or ''
+            lines.append(message if len(titles) == 1 else f"{p.get('title')}: {message}")
+        if len(lines) > NOTIFICATION_MAX_LINES:
+            extra = len(lines) - NOTIFICATION_MAX_LINES
+            lines = lines[:NOTIFICATION_MAX_LINES] + [f"... and {extra} more"]
+
+        severity = max(
+            (NOTIFICATION_SEVERITY.index(p.get('type')) for p in payloads if p.get('type') in NOTIFICATION_SEVERITY),
+            default=0,
+        )
+        return {
+            'title': titles[0] if len(titles) == 1 else f"BOM Updates ({len(payloads)})",
+            'message': '\n'.join(lines),
+            'sticky': any(p.get('sticky') for p in payloads),
+            'type': NOTIFICATION_SEVERITY[severity],
+        }
+
+    @api.model
+    def _flush_notifications(self):
+        """Send one summarized notification per partner (precommit hook)."""
+        buffer = self.env.cr.precommit.data.pop(NOTIFICATION_BUFFER_KEY, None)
+        if not buffer:
+            return
+        partners = self.env['res.partner'].browse(list(buffer))
+        for partner in partners:
+            self.env['bus.bus']._sendone(
+                partner, 'simple_notification', self._summarize_notifications(buffer[partner.id])
+            )
+
+    # ─────────────────────────────────────────────
+    # Free stock snapshot
+    # ─────────────────────────────────────────────
+    @api.model
+    def _get_free_stock_cache(self):
+        """Snapshot storage of the current transaction (dropped at commit/rollback)."""
+        return self.env.cr.precommit.data.setdefault(
+            FREE_STOCK_SNAPSHOT_KEY, {'products': {}, 'locations': {}, 'owners': {}}
+        )
+
+    @api.model
+    def _get_location_stock_flags(self, location_ids):
+        """
+        Return {location_id: (is_free, is_tapy)}: whether the location or any
+        of its ancestors is categorised FREE / TAPY. Ancestors are resolved
+        through parent_path in one read for all uncached locations.
+        """
+        cache = self._get_free_stock_cache()['locations']
+        missing = {lid for lid in location_ids if lid and lid not in cache}
+        if missing:
+            Location = self.env['stock.location'].with_context(active_test=False)
+            locations = Location.browse(missing)
+            paths = {
+                loc.id: [int(pid) for pid in (loc.parent_path or str(loc.id)).split('/') if pid]
+                for loc in locations
+            }
+            ancestors = Location.browse({pid for path in paths.values() for pid in path})
+            categories = {loc.id: loc.location_category for loc in ancestors}
+            for location_id, path in paths.items():
+                chain = {categories.get(pid) for pid in path}
+                cache[location_id] = ('free' in chain, 'tapy' in chain)
+        return {lid: cache.get(lid, (False, False)) for lid in location_ids}
+
+    @api.model
+    def _get_free_stock_snapshot(self, product_ids):
+        """
+        Return {product_id: {'free': qty, 'tapy': qty}} of unreserved, unowned
+        stock. 'free' is stock below a FREE location, 'tapy' stock below a TAPY
+        (and no FREE) location. Uncached products are loaded in one grouped query.
+        """
+        cache = self._get_free_stock_cache()['products']
+        missing = {pid for pid in product_ids if pid and pid not in cache}
+        if missing:
+            self.env['stock.quant'].flush_model(
+                ['product_id', 'location_id', 'owner_id', 'quantity', 'reserved_quantity']
+            )
+            self.env.cr.execute("""
+                SELECT product_id, location_id, SUM(GREATEST(quantity - reserved_quantity, 0))
+                  FROM stock_quant
+                 WHERE product_id = ANY(%s)
+                   AND owner_id IS NULL
+                   AND quantity > 0
+                 GROUP BY product_id, location_id
+            """, [list(missing)])
+            rows = self.env.cr.fetchall()
+            flags = self._get_location_stock_flags({location_id for _product, location_id, _qty in rows})
+            for product_id in missing:
+                cache[product_id] = {'free': 0.0, 'tapy': 0.0}
+            for product_id, location_id, qty in rows:
+                is_free, is_tapy = flags[location_id]
+                if is_free:
+                    cache[product_id]['free'] += qty
+                elif is_tapy:
+                    cache[product_id]['tapy'] += qty
+        return {pid: cache.get(pid, {'free': 0.0, 'tapy': 0.0}) for pid in product_ids}
+
+    @api.model
+    def _get_owner_stock_index(self, owner_ids, product_ids):
+        """
+        Return {(owner_id, product_id): {location_id: qty}} of consigned stock
+        available for allocation in FREE/TAPY locations: unreserved quantity
+        minus the not-yet-reserved part of pending moves restricted to the same
+        owner out of that location, both in the product UoM. Uncached pairs are
+        loaded with one grouped query on quants and one on moves.
+        """
+        cache = self._get_free_stock_cache()['owners']
+        pairs = {(owner_id, product_id) for owner_id in owner_ids for product_id in product_ids
+                 if owner_id and product_id}
+        missing = pairs - set(cache)
+        if missing:
+            missing_owners = list({owner_id for owner_id, _product in missing})
+            missing_products = list({product_id for _owner, product_id in missing})
+            self.env['stock.quant'].flush_model(
+                ['product_id', 'location_id', 'owner_id', 'quantity', 'reserved_quantity']
+            )
+            self.env['stock.move'].flush_model(
+                ['product_id', 'location_id', 'restrict_partner_id', 'state', 'product_qty']
+            )
+            self.env['stock.move.line'].flush_model(['move_id', 'quantity_product_uom'])
+            available = {}
+            self.env.cr.execute("""
+                SELECT owner_id, product_id, location_id, SUM(GREATEST(quantity - reserved_quantity, 0))
+                  FROM stock_quant
+                 WHERE owner_id = ANY(%s)
+                   AND product_id = ANY(%s)
+                   AND quantity > 0
+                 GROUP BY owner_id, product_id, location_id
+            """, [missing_owners, missing_products])
+            for owner_id, product_id, location_id, qty in self.env.cr.fetchall():
+                available[(owner_id, product_id, location_id)] = qty
+            self.env.cr.execute("""
+                SELECT m.restrict_partner_id, m.product_id, m.location_id,
+                       SUM(GREATEST(m.product_qty - COALESCE(ml.reserved, 0), 0))
+                  FROM stock_move m
+                  LEFT JOIN (
+                        SELECT move_id, SUM(quantity_product_uom) AS reserved
+                          FROM stock_move_line
+                         WHERE move_id IS NOT NULL
+                         GROUP BY move_id
+                  ) ml ON ml.move_id = m.id
+                 WHERE m.restrict_partner_id = ANY(%s)
+                   AND m.product_id = ANY(%s)
+                   AND m.state NOT IN ('draft', 'done', 'cancel')
+                 GROUP BY m.restrict_partner_id, m.product_id, m.location_id
+            """, [missing_owners, missing_products])
+            for owner_id, product_id, location_id, qty in self.env.cr.fetchall():
+                key = (owner_id, product_id, location_id)
+                if key in available:
+                    available[key] -= qty
+
+            flags = self._get_location_stock_flags({key[2] for key in available})
+            for pair in missing:
+                cache[pair] = {}
+            for (owner_id, product_id, location_id), qty in available.items():
+                if qty > 0 and any(flags[location_id]) and (owner_id, product_id) in missing:
+                    cache[(owner_id, product_id)][location_id] = qty
+        return {pair: cache[pair] for pair in pairs}
+
+    @api.model
+    def _consume_owner_stock(self, owner_id, product_id, location_id, qty):
+        """Keep the owner index in step with a transfer just planned out of ``location_id``."""
+        entry = self._get_free_stock_cache()['owners'].get((owner_id, product_id))
+        if entry and location_id in entry:
+            entry[location_id] = max(entry[location_id] - qty, 0.0)
+
+    @api.model
+    def _invalidate_free_stock_snapshot(self, product_ids=None, locations=False):
+        """
+        Drop snapshot entries of ``product_ids`` (all when None). With
+        ``locations``, the location flags and every product total are dropped.
+        """
+        snapshot = self.env.cr.precommit.data.get(FREE_STOCK_SNAPSHOT_KEY)
+        if not snapshot:
+            return
+        if product_ids is None or locations:
+            snapshot['products'].clear()
+            snapshot['owners'].clear()
+        else:
+            product_ids = set(product_ids)
+            for product_id in product_ids:
+                snapshot['products'].pop(product_id, None)
+            for key in [key for key in snapshot['owners'] if key[1] in product_ids]:
+                del snapshot['owners'][key]
+        if locations:
+            snapshot['locations'].clear()
@@ -3,84 +3,279 @@
 import uuid
 
 from odoo import models, fields,api, _
+from odoo.tools.sql import column_exists
 import logging
 
 from odoo.exceptions import UserError, ValidationError
 
 _logger = logging.getLogger(__name__)
 
-
-def _generate_branch_codes():
-    codes = []
-    for c in range(ord('A'), ord('Z') + 1):
-        codes.append(chr(c))
-    for c in range(ord('A'), ord('Z') + 1):
-        for d in range(1, 10):
-            codes.append(f"{chr(c)}{d}")
-    for c1 in range(ord('A'), ord('Z') + 1):
-        for c2 in range(ord('A'), ord('Z') + 1):
-            codes.append(chr(c1) + chr(c2))
-    return codes
+# First key of the (namespace, root BOM id) advisory lock guarding structural rebuilds
+ROOT_REBUILD_LOCK_NAMESPACE = 4552
 
 
 class MrpBom(models.Model):
     _inherit = "mrp.bom"
 
+    used_in_root_bom_ids = fields.Many2many(
+        'mrp.bom',
+        relation='mrp_bom_used_in_root_rel',
+        column1='sub_bom_id',
+        column2='root_bom_id',
+        string='Used In Root BOMs',
+        copy=False,
+        help="Root BOMs (projects) where this BOM is currently used as a sub-component.",
+    )
+    root_sub_bom_ids = fields.Many2many(
+        'mrp.bom',
+        relation='mrp_bom_used_in_root_rel',
+        column1='root_bom_id',
+        column2='sub_bom_id',
+        string='Sub-BOMs In Use',
+        copy=False,
+        help="Sub-BOMs used anywhere below this root BOM. Replaced as a whole on every branch assignment.",
+    )
     used_in_root_bom_ids_str = fields.Char(
         string='Used In Root BOM IDs',
+        compute='_compute_used_in_root_bom_ids_str',
         help="Comma-separated IDs of the Root BOMs (projects) where this BOM is currently used as a sub-component.",
-        default=""
     )
-    used_in_root_bom_ids = fields.Many2many(
-        'mrp.bom', 
-        relation='dummy_mrp_bom_used_in_root_rel', 
-        column1='sub_bom_id', 
-        column2='root_bom_id',
-        string="Dummy"
-    ) # Temporary field to fix upgrade catch-22
     root_bom_id = fields.Integer(string="Dummy") # Temporary field to fix upgrade catch-22
 
+    branch_code_sequence = fields.Integer(
+        string='Next Branch Code Index',
+        default=0,
+        copy=False,
+        readonly=True,
+        help="Index of the next branch code to allocate under this root BOM "
+             "(see cr.mrp.bom.helpers.encode_branch_code).",
+    )
+
+    subtree_approved = fields.Boolean(
+        string='Subtree Approved',
+        default=True,
+        copy=False,
+        readonly=True,
+        help="Stored roll-up: every sub-assembly line below this BOM is approved to manufacture. "
+             "Maintained incrementally when approvals or the structure change.",
+    )
+
+    @api.depends('used_in_root_bom_ids')
+    def _compute_used_in_root_bom_ids_str(self):
+        for bom in self:
+            bom.used_in_root_bom_ids_str = ",".join(str(root_id) for root_id in bom.used_in_root_bom_ids.ids)
+
+    @api.model
+    def _migrate_used_in_root_bom_ids_str(self):
+        """
+        Upgrade helper: move the legacy comma-separated root IDs into the
+        mrp_bom_used_in_root_rel relation, then clear the old column.
+        """
+        cr = self.env.cr
+        if not column_exists(cr, 'mrp_bom', 'used_in_root_bom_ids_str'):
+            return
+        cr.execute("""
+            INSERT INTO mrp_bom_used_in_root_rel (sub_bom_id, root_bom_id)
+            SELECT sub.id, root.id
+              FROM mrp_bom sub
+              CROSS JOIN LATERAL unnest(string_to_array(sub.used_in_root_bom_ids_str, ',')) AS token
+              JOIN mrp_bom root ON root.id::text = trim(token)
+             WHERE coalesce(sub.used_in_root_bom_ids_str, '') != ''
+            ON CONFLICT DO NOTHING
+        """)
+        _logger.info("Migrated %s root BOM usage link(s) to mrp_bom_used_in_root_rel", cr.rowcount)
+        cr.execute("UPDATE mrp_bom SET used_in_root_bom_ids_str = NULL WHERE used_in_root_bom_ids_str IS NOT NULL")
+        self.invalidate_model(['used_in_root_bom_ids', 'root_sub_bom_ids'])
+
+    def _set_root_sub_boms(self, sub_bom_ids):
+        """Replace this root's sub-BOM usage links in one set-based write."""
+        self.ensure_one()
+        sub_bom_ids = set(sub_bom_ids)
+        if set(self.root_sub_bom_ids.ids) != sub_bom_ids:
+            self.with_context(skip_branch_recompute=True, skip_subtree_approval=True).write({
+                'root_sub_bom_ids': [(6, 0, list(sub_bom_ids))],
+            })
+
     def check_all_components_approved(self, processed_boms=None):
         """
-        Recursively check if all BOM components are approved to manufacture.
+        Check if all BOM components are approved to manufacture.
         Returns (is_approved, unapproved_products) tuple.
+        Only sub-BOMs whose stored roll-up is not approved are visited.
         """
         if processed_boms is None:
             processed_boms = set()
 
         # Prevent infinite loops in case of circular BOM references
-        if self.id in processed_boms:
+        if self.id in processed_boms or self.subtree_approved:
             return True, []
 
         processed_boms.add(self.id)
         unapproved_products = []
 
+        child_boms = self._get_line_child_boms(self.bom_line_ids)
         for bom_line in self.bom_line_ids:
-            # Check if this line has a BOM
-            component_bom = self.env['mrp.bom']._bom_find(
-                bom_line.product_id,
-                bom_type='normal'
-            )[bom_line.product_id]
-
-            if component_bom:
-                # This component has a BOM
-                if not bom_line.approve_to_manufacture:
-                    unapproved_products.append({
-                        'product': bom_line.product_id.display_name,
-                        'level': 'current'
-                    })
-
-                # Recursively check sub-components
-                is_approved, sub_unapproved = component_bom.check_all_components_approved(
-                    processed_boms.copy()
-                )
+            child_bom = child_boms[bom_line.id]
+            if bom_line.subtree_approved or not child_bom:
+                continue
 
-                if not is_approved:
-                    unapproved_products.extend(sub_unapproved)
+            if not bom_line.approve_to_manufacture:
+                unapproved_products.append({
+                    'product': bom_line.product_id.display_name,
+                    'level': 'current'
+                })
+
+            # Only descend into sub-BOMs that are not approved themselves
+            is_approved, sub_unapproved = child_bom.check_all_components_approved(processed_boms)
+            if not is_approved:
+                unapproved_products.extend(sub_unapproved)
 
-        is_all_approved = len(unapproved_products)  == 0
+        is_all_approved = len(unapproved_products) == 0
         return is_all_approved, unapproved_products
 
+    # ─────────────────────────────────────────────
+    # Approval roll-up maintenance
+    # ─────────────────────────────────────────────
+
+    @api.model
+    def _get_first_created_boms(self, products):
+        """Batch version of _get_first_created_bom: {product_id: oldest BOM} in one search."""
+        if not products:
+            return {}
+        boms = self.env['mrp.bom'].search([
+            '|',
+            ('product_id', 'in', products.ids),
+            '&',
+            ('product_tmpl_id', 'in', products.product_tmpl_id.ids),
+            ('product_id', '=', False),
+        ], order='create_date asc, id asc')
+        result = {}
+        for bom in boms:
+            targets = bom.product_id or products.filtered(lambda p: p.product_tmpl_id == bom.product_tmpl_id)
+            for product in targets:
+                result.setdefault(product.id, bom)
+        return result
+
+    @api.model
+    def _get_line_child_boms(self, lines):
+        """
+        Sub-BOM of each line as branch assignment resolves it: the line's
+        child BOM, else the first created BOM of its product.
+        """
+        result = {line.id: line.child_bom_id for line in lines}
+        missing = lines.filtered(lambda l: not l.child_bom_id and l.product_id)
+        if missing:
+            first_boms = self._get_first_created_boms(missing.product_id)
+            for line in missing:
+                result[line.id] = first_boms.get(line.product_id.id, self.env['mrp.bom'])
+        return result
+
+    def _get_line_subtree_approved(self, line, child_approved=None, child_bom=None):
+        """
+        Roll-up value of a single line. ``child_bom`` defaults to the sub-BOM
+        resolved by _get_line_child_boms, ``child_approved`` to its stored flag.
+        """
+        if child_bom is None:
+            child_bom = self._get_line_child_boms(line)[line.id]
+        if not child_bom:
+            return True
+        if child_approved is None:
+            child_approved = child_bom.subtree_approved
+        return bool(line.approve_to_manufacture) and child_approved
+
+    def _write_subtree_approved(self, records, value):
+        if records:
+            records.with_context(
+                skip_branch_recompute=True,
+                skip_mo_qty_update=True,
+                skip_subtree_approval=True,
+            ).write({'subtree_approved': value})
+
+    def _refresh_subtree_approval(self):
+        """
+        Recompute the approval roll-up of these BOMs from their lines and
+        propagate upward, BOM by BOM, only while the BOM flag actually changes.
+        """
+        BomLine = self.env['mrp.bom.line']
+        helpers = self.env['cr.mrp.bom.helpers']
+        queue = list(self.exists())
+        visited = set()
+
+        while queue:
+            bom = queue.pop(0)
+            # Guard against circular BOM references
+            if bom.id in visited:
+                continue
+            visited.add(bom.id)
+
+            changed_lines = {True: BomLine, False: BomLine}
+            bom_value = True
+            child_boms = self._get_line_child_boms(bom.bom_line_ids)
+            for line in bom.bom_line_ids:
+                line_value = bom._get_line_subtree_approved(line, child_bom=child_boms[line.id])
+                bom_value = bom_value and line_value
+                if line.subtree_approved != line_value:
+                    changed_lines[line_value] |= line
+            for value, lines in changed_lines.items():
+                self._write_subtree_approved(lines, value)
+
+            if bom.subtree_approved == bom_value:
+                continue
+            self._write_subtree_approved(bom, bom_value)
+            queue.extend(helpers._get_parent_bom_lines(bom).mapped('bom_id'))
+
+    def _refresh_parent_subtree_approval(self):
+        """Refresh the BOMs whose lines use these BOMs as sub-BOM."""
+        helpers = self.env['cr.mrp.bom.helpers']
+        parent_boms = self.env['mrp.bom']
+        for bom in self:
+            parent_boms |= helpers._get_parent_bom_lines(bom).mapped('bom_id')
+        (parent_boms - self)._refresh_subtree_approval()
+
+    @api.model
+    def _recompute_all_subtree_approval(self):
+        """Full bottom-up rebuild of the approval roll-up (install/upgrade helper)."""
+        boms = self.search([])
+        child_boms = self._get_line_child_boms(boms.bom_line_ids)
+        memo = {}
+        in_progress = set()
+
+        def bom_value(bom):
+            if bom.id in memo:
+                return memo[bom.id]
+            if bom.id in in_progress:
+                # Circular reference: treated as approved, like the recursive check
+                return True
+            in_progress.add(bom.id)
+            value = True
+            for line in bom.bom_line_ids:
+                child_bom = child_boms[line.id]
+                child_approved = bom_value(child_bom) if child_bom else True
+                line_value = bom._get_line_subtree_approved(
+                    line, child_approved=child_approved, child_bom=child_bom
+                )
+                memo[('line', line.id)] = line_value
+                value = value and line_value
+            in_progress.discard(bom.id)
+            memo[bom.id] = value
+            return value
+
+        for bom in boms:
+            bom_value(bom)
+
+        BomLine = self.env['mrp.bom.line']
+        lines = {True: BomLine, False: BomLine}
+        bom_groups = {True: self.env['mrp.bom'], False: self.env['mrp.bom']}
+        for key, value in memo.items():
+            if isinstance(key, tuple):
+                lines[value] |= BomLine.browse(key[1])
+            else:
+                bom_groups[value] |= self.browse(key)
+        for value in (True, False):
+            self._write_subtree_approved(lines[value], value)
+            self._write_subtree_approved(bom_groups[value], value)
+        _logger.info("Approval roll-up rebuilt for %s BOMs", len(boms))
+        return True
+
     def check_bom_components_approval(self):
         """
         Public method to be called from JavaScript.
@@ -184,19 +379,15 @@ class MrpBom(models.Model):
             if bom.id in old_line_ids:
                 current_line_ids = set(bom.bom_line_ids.ids)
                 new_line_ids = current_line_ids - old_line_ids[bom.id]
-                _logger.info(f"[SYNC TRACE] mrp.bom.write triggered for BOM {bom.id} (is_evr={bom.is_evr}). Line changes: +{new_line_ids}")
+                trace = self.env['cr.mrp.bom.helpers']._get_tracer('sync')
+                trace.debug("mrp.bom.write triggered for BOM %s (is_evr=%s). Line changes: +%s",
+                            bom.id, bom.is_evr, new_line_ids)
 
                 if current_line_ids != old_line_ids[bom.id]:
                     parent_roots = set()
 
-                    # Method 1: from explicit used_in_root_bom_ids_str tracking
-                    if bom.used_in_root_bom_ids_str:
-                        id_strings = [i.strip() for i in bom.used_in_root_bom_ids_str.split(',') if i.strip()]
-                        for root_id_str in id_strings:
-                            try:
-                                parent_roots.add(int(root_id_str))
-                            except ValueError:
-                                pass
+                    # Method 1: from explicit root usage tracking
+                    parent_roots.update(bom.used_in_root_bom_ids.ids)
 
                     # Method 2: BFS ancestor search via product relationship
                     helpers = self.env['cr.mrp.bom.helpers']
@@ -214,7 +405,7 @@ class MrpBom(models.Model):
                         parent_bom = pl.bom_id
                         if not parent_bom:
                             continue
-                        _logger.info(f"[SYNC TRACE] Method 3 found parent BOM '{parent_bom.display_name}' via child_bom_id")
+                        trace.debug("Method 3 found parent BOM '%s' via child_bom_id", lambda: parent_bom.display_name)
                         if parent_bom.is_evr and (parent_bom.cfe_project_location_id or getattr(parent_bom, 'sale_order_id', False)):
                             parent_roots.add(parent_bom.id)
                         for r in helpers.get_root_boms_for_bom(parent_bom):
@@ -229,11 +420,12 @@ class MrpBom(models.Model):
                     )
 
                     if final_roots:
-                        _logger.info(f"[SYNC TRACE] CASCADING branch update from BOM {bom.id} to {len(final_roots)} parent Root BOMs: {[r.display_name for r in final_roots]}")
+                        trace.summary("cascade line changes", bom=bom.id, roots=final_roots.ids)
+                        trace.debug("Cascading to parent Root BOMs: %s", lambda: final_roots.mapped('display_name'))
                         for r in final_roots:
                             r.with_context(skip_branch_recompute=False, force_check_new_lines=True)._assign_branches_for_bom()
                     else:
-                        _logger.info(f"[SYNC TRACE] No parent EVR Root BOMs found for BOM {bom.id}.")
+                        trace.debug("No parent EVR Root BOMs found for BOM %s.", bom.id)
 
                 # Now check and create missing MOs for ALL lines (only for EVR BOMs)
                 if bom.is_evr:
@@ -300,6 +492,11 @@ class MrpBom(models.Model):
                 })
                 bom.cfe_project_location_id = new_loc.id
 
+        # New BOMs may become the sub-BOM of existing lines
+        if not self.env.context.get('skip_subtree_approval'):
+            boms._refresh_subtree_approval()
+            boms._refresh_parent_subtree_approval()
+
         evr_boms_with_location = boms.filtered(lambda b: b.is_evr and b.cfe_project_location_id)
 
         if evr_boms_with_location:
@@ -320,6 +517,20 @@ class MrpBom(models.Model):
 
         return boms
 
+    def unlink(self):
+        parent_boms = self.env['mrp.bom']
+        if not self.env.context.get('skip_subtree_approval'):
+            helpers = self.env['cr.mrp.bom.helpers']
+            for bom in self:
+                parent_boms |= helpers._get_parent_bom_lines(bom).mapped('bom_id')
+            parent_boms -= self
+
+        res = super().unlink()
+
+        # Parent lines lost (or switched) their sub-BOM
+        parent_boms._refresh_subtree_approval()
+        return res
+
     def _get_first_created_bom(self, product):
         """Find the oldest BOM for a product."""
         domain = [
@@ -331,17 +542,81 @@ class MrpBom(models.Model):
         ]
         return self.env['mrp.bom'].search(domain, order='create_date asc, id asc', limit=1)
 
+    def _get_next_branch_code_index(self):
+        """
+        Next free branch code index for this root BOM.
+        Roots created before the stored sequence existed are seeded once from their branch names.
+        """
+        self.ensure_one()
+        if self.branch_code_sequence:
+            return self.branch_code_sequence
+        helpers = self.env['cr.mrp.bom.helpers']
+        names = self.env['mrp.bom.line.branch'].search([('bom_id', '=', self.id)]).mapped('branch_name')
+        return max((helpers.decode_branch_code(name) for name in names), default=-1) + 1
+
+    def _set_next_branch_code_index(self, index):
+        """Persist the branch code sequence without triggering structural recomputes."""
+        self.ensure_one()
+        if self.branch_code_sequence != index:
+            self.with_context(skip_branch_recompute=True, skip_subtree_approval=True).write({
+                'branch_code_sequence': index,
+            })
+
+    # ─────────────────────────────────────────────
+    # Root rebuild locking
+    # ─────────────────────────────────────────────
+    def _try_lock_root_rebuild(self):
+        """
+        Transaction-scoped PostgreSQL advisory try-lock on this root's rebuilds.
+        Re-entrant within the transaction, released on commit or rollback.
+        """
+        self.ensure_one()
+        self.env.cr.execute(
+            "SELECT pg_try_advisory_xact_lock(%s, %s)", (ROOT_REBUILD_LOCK_NAMESPACE, self.id)
+        )
+        return self.env.cr.fetchone()[0]
+
+    def _lock_roots_or_defer(self, operation):
+        """
+        Return the BOMs of ``self`` this transaction may rebuild now. BOMs another
+        transaction is already rebuilding are queued for ``operation`` instead and
+        picked up by the rebuild worker once that transaction is done; the user
+        is told the work was queued.
+        """
+        locked = self.browse()
+        deferred = self.browse()
+        for bom in self:
+            if bom._try_lock_root_rebuild():
+                locked |= bom
+            else:
+                deferred |= bom
+        if deferred:
+            _logger.info(
+                "Root BOM(s) %s busy in another transaction, deferring '%s'", deferred.ids, operation
+            )
+            self.env['mrp.bom.rebuild.request']._enqueue(deferred, operation)
+            label = 'Branch assignment' if operation == 'branches' else 'MO generation'
+            self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
+                'title': f"{label} Queued",
+                'message': f"{', '.join(deferred.mapped('display_name'))} is being rebuilt by another user. "
+                           f"{label} will run automatically once it is done.",
+                'sticky': False,
+                'type': 'warning',
+            })
+        return locked
+
     def _assign_branches_for_bom(self):
         """
         Assign branch codes for each root BOM in `self` incrementally.
         """
         Branch = self.env['mrp.bom.line.branch']
         Component = self.env['mrp.bom.line.branch.components']
-        codes = _generate_branch_codes()
 
         for root_bom in self:
             if self.env.context.get('skip_branch_recompute'):
                 continue
+            if not root_bom._lock_roots_or_defer('branches'):
+                continue
 
             # Root Guard: skip if root_bom is NOT itself in the set of roots
             # (A BOM with cfe_project_location_id is always its own root, even when used in another root.)
@@ -362,29 +637,12 @@ class MrpBom(models.Model):
             # Store root location ID (default to False if no project location)
             root_location_id = root_bom.cfe_project_location_id.id if root_bom.cfe_project_location_id else False
 
-            # Initialize index based on existing branches to preserve sequence
-            existing_branches = Branch.search([('bom_id', '=', root_bom.id)])
-            existing_names = existing_branches.mapped('branch_name')
-            max_idx = -1
-            for name in existing_names:
-                try:
-                    if name in codes:
-                        max_idx = max(max_idx, codes.index(name))
-                except ValueError:
-                    continue
-            
-            # Start from the next code in sequence
-            current_idx_ptr = max_idx + 1
+            # Continue the root's persistent branch code sequence
+            current_idx_ptr = root_bom._get_next_branch_code_index()
             new_branches_to_mo = []
 
-            # Clear old root assignments for this root BOM
-            root_id_str = str(root_bom.id)
-            sub_boms = self.env['mrp.bom'].search([('used_in_root_bom_ids_str', 'ilike', root_id_str)])
-            _logger.info(f"DEBUG EVR: Starting assignment for ROOT BOM: {root_bom.id}. Clearing old traces in {len(sub_boms)} sub-boms.")
-            for sub_bom in sub_boms:
-                if sub_bom.used_in_root_bom_ids_str:
-                    ids = [i.strip() for i in sub_bom.used_in_root_bom_ids_str.split(',') if i.strip() and i.strip() != root_id_str]
-                    sub_bom.used_in_root_bom_ids_str = ",".join(ids)
+            # Sub-BOMs reached by this pass; replaces the root's usage links afterwards
+            used_sub_bom_ids = set()
 
             # DFS to traverse hierarchy and assign branches/components
             def dfs(current_bom, parent_location_id, depth=0, parent_branch_id=None, root_line_id=None):
@@ -412,10 +670,7 @@ class MrpBom(models.Model):
                         ], limit=1)
 
                         if not branch:
-                            if current_idx_ptr >= len(codes):
-                                raise UserError("No more branch codes available.")
-
-                            code = codes[current_idx_ptr]
+                            code = helpers.encode_branch_code(current_idx_ptr)
                             current_idx_ptr += 1
 
                             # Create location as sublocation of parent
@@ -438,18 +693,8 @@ class MrpBom(models.Model):
                             })
                             new_branches_to_mo.append(line.id)
                         
-                        # Track BOM usage in Root BOM (The new logic requested by user)
-                        root_id_str = str(root_bom.id)
-                        current_ids = [i.strip() for i in (child_bom.used_in_root_bom_ids_str or '').split(',') if i.strip()]
-                        
-                        _logger.info(f"DEBUG EVR: Checking tracking for child BOM {child_bom.id} (under root {root_id_str}). Current strings: {current_ids}")
-                        if root_id_str not in current_ids:
-                            current_ids.append(root_id_str)
-                            new_str = ",".join(current_ids)
-                            child_bom.write({'used_in_root_bom_ids_str': new_str})
-                            _logger.info(f"DEBUG EVR: WROTE new string '{new_str}' to child BOM {child_bom.id} ({child_bom.display_name})")
-                        else:
-                            _logger.info(f"DEBUG EVR: Root {root_id_str} is ALREADY tracked in child BOM {child_bom.id}")
+                        # Track BOM usage in Root BOM
+                        used_sub_bom_ids.add(child_bom.id)
 
                         # Create/Update assignment for this context
                         Assignment = self.env['mrp.bom.line.branch.assignment']
@@ -522,14 +767,16 @@ class MrpBom(models.Model):
 
             # Start DFS with root_bom's cfe_project_location_id
             dfs(root_bom, root_location_id)
+            root_bom._set_next_branch_code_index(current_idx_ptr)
+            root_bom._set_root_sub_boms(used_sub_bom_ids)
 
             # Point 5: Auto-create MOs for newly added branches
             if new_branches_to_mo:
                 root_bom.action_create_child_mos_recursive()
 
             # Notify success
-            self.env['bus.bus']._sendone(
-                self.env.user.partner_id, "simple_notification",
+            self.env['cr.mrp.bom.helpers']._queue_notification(
+                self.env.user.partner_id,
                 {"title": "Sync Complete", "message": f"Project '{root_bom.display_name}' is now up to date.", "sticky": False, "type": "success"}
             )
 
@@ -587,35 +834,10 @@ class MrpBom(models.Model):
 
     def _check_all_children_approved(self, bom_line):
         """
-        Recursively check if all children (sub-BOMs) have approve_to_manufacture = True
-        Only checks lines that have child BOMs
+        Whether the line and every sub-BOM below it are approved to manufacture.
+        Reads the stored roll-up maintained by _refresh_subtree_approval.
         """
-        # Get child BOM using _bom_find which returns dict in Odoo 18
-        bom_dict = self.env['mrp.bom']._bom_find(
-            bom_line.product_id,
-            bom_type='normal',
-            company_id=self.company_id.id
-        )
-
-        # Extract actual bom record from dict
-        if isinstance(bom_dict, dict):
-            child_bom = bom_dict.get('bom', False)
-        else:
-            child_bom = bom_dict
-
-        if not child_bom or not isinstance(child_bom, type(self)):
-            # Leaf line (no child BOM) - always approved, no check needed
-            return True
-
-        # Has child BOM - check its approval and all its lines recursively
-        if not bom_line.approve_to_manufacture:
-            return False
-
-        for child_line in child_bom.bom_line_ids:
-            if not self._check_all_children_approved(child_line):
-                return False
-
-        return True
+        return bool(bom_line.subtree_approved)
 
     def action_create_mo_from_overview(self):
         """
@@ -670,8 +892,12 @@ class MrpBom(models.Model):
         Uses context-aware assignment model for path uniqueness.
         """
         Branch = self.env['mrp.bom.line.branch']
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('mo_plan')
         root_bom = self
 
+        if level == 0 and not self._lock_roots_or_defer('mos'):
+            return []
+
         # Initialize tracking list if not exists
         if level == 0:
             if not hasattr(self.__class__, '_created_mos_list'):
@@ -714,7 +940,8 @@ class MrpBom(models.Model):
             ], limit=1)
 
             if existing_mo:
-                _logger.info(f"MO {existing_mo.name} already exists for line {line.id} branch {branch_name}, skipping creation")
+                trace.debug("MO %s already exists for line %s branch %s, skipping creation",
+                            lambda: existing_mo.name, line.id, branch_name)
                 # Just continue to next line, don't break
                 continue
 
@@ -756,9 +983,8 @@ class MrpBom(models.Model):
             final_name = self.env['stock.location'].browse(
                 final_dest_location).display_name if final_dest_location else "N/A"
 
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 self.env.user.partner_id,
-                "simple_notification",
                 {
                     "title": "Manufacturing Order Created",
                     "message": (
@@ -790,6 +1016,7 @@ class MrpBom(models.Model):
                 created_mos_list = self.__class__._created_mos_list[root_bom.id]
                 del self.__class__._created_mos_list[root_bom.id]
 
+            trace.summary("create child MOs", root_bom=root_bom.id, created=len(created_mos_list))
             return created_mos_list
 
         return created_mo
@@ -803,16 +1030,17 @@ class MrpBom(models.Model):
         If missing, return False (caller will trigger re-assignment).
         Uses context-aware assignment model.
         """
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('mo_plan')
         assignment = line.get_assignment(root_bom, parent_branch_id)
         if not assignment:
-            _logger.info(f"Missing assignment for line {line.id} in context {root_bom.id}/{parent_branch_id}")
+            trace.debug("Missing assignment for line %s in context %s/%s", line.id, root_bom.id, parent_branch_id)
             return False
 
         # If it's a branch, check children
         child_bom = line.child_bom_id or root_bom._get_first_created_bom(line.product_id)
         if child_bom:
             if not assignment.own_branch_id:
-                _logger.info(f"Line {line.id} should have a branch but doesn't")
+                trace.debug("Line %s should have a branch but doesn't", line.id)
                 return False
             
             for child_line in child_bom.bom_line_ids:
@@ -821,7 +1049,7 @@ class MrpBom(models.Model):
         else:
             # Leaf component
             if not assignment or not assignment.component_id:
-                _logger.info(f"Line {line.id} should have a component record but doesn't")
+                trace.debug("Line %s should have a component record but doesn't", line.id)
                 return False
 
         return True
@@ -865,7 +1093,10 @@ class MrpBom(models.Model):
             stock_location = warehouse.lot_stock_id if warehouse else False
 
             # Create MO for this line
-            _logger.info(f"Creating missing MO for line {line.id} (product: {line.product_id.display_name}) branch {branch_rec.branch_name if branch_rec else 'N/A'}")
+            self.env['cr.mrp.bom.helpers']._get_tracer('mo_plan').debug(
+                "Creating missing MO for line %s (product: %s) branch %s",
+                line.id, lambda: line.product_id.display_name, lambda: branch_rec.branch_name if branch_rec else 'N/A',
+            )
 
             mo_vals = {
                 'product_id': child_bom.product_tmpl_id.product_variant_id.id,
@@ -897,9 +1128,8 @@ class MrpBom(models.Model):
             final_name = self.env['stock.location'].browse(
                 final_dest_location).display_name if final_dest_location else "N/A"
 
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 self.env.user.partner_id,
-                "simple_notification",
                 {
                     "title": "Manufacturing Order Created",
                     "message": (
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Product ids marked dirty during the transaction, queued once at precommit
+FREE_STOCK_BUFFER_KEY = 'cr_mrp_bom_free_stock_products'
+
+
+class MrpBomFreeStockQueue(models.Model):
+    """
+    Products whose stock changed since ``free_to_use`` was last computed.
+    Quant changes only insert a row here; the refresh worker recomputes the
+    branches and components of the queued products in bulk.
+    """
+    _name = "mrp.bom.free.stock.queue"
+    _description = "Products pending a free-to-use refresh"
+    _order = "id"
+
+    product_id = fields.Many2one('product.product', string='Product', required=True, ondelete='cascade')
+
+    _sql_constraints = [
+        ('product_unique', 'unique(product_id)', 'A product can only be queued once.'),
+    ]
+
+    @api.model
+    def _mark_products(self, product_ids):
+        """Mark ``product_ids`` dirty; they are queued in one statement at commit."""
+        product_ids = {pid for pid in product_ids if pid}
+        if not product_ids:
+            return
+        cr = self.env.cr
+        buffer = cr.precommit.data.get(FREE_STOCK_BUFFER_KEY)
+        if buffer is None:
+            buffer = cr.precommit.data[FREE_STOCK_BUFFER_KEY] = set()
+            env = self.env
+            cr.precommit.add(lambda: env['mrp.bom.free.stock.queue']._flush_marked_products())
+        buffer.update(product_ids)
+
+    @api.model
+    def _flush_marked_products(self):
+        """Insert the products marked dirty in this transaction (idempotent) and wake the worker."""
+        product_ids = self.env.cr.precommit.data.pop(FREE_STOCK_BUFFER_KEY, None)
+        if not product_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO mrp_bom_free_stock_queue (product_id, create_uid, write_uid, create_date, write_date)
+            SELECT pid, %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM unnest(%(ids)s) AS pid
+            ON CONFLICT (product_id) DO NOTHING
+        """, {'uid': self.env.uid, 'ids': list(product_ids)})
+        self._trigger_worker()
+
+    @api.model
+    def _trigger_worker(self):
+        cron = self.env.ref(
+            'cr_mrp_bom_evr_customisation.ir_cron_refresh_free_to_use',
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _pop_products(self, product_ids=None, limit=None):
+        """Remove and return queued product ids (all, or only those in ``product_ids``)."""
+        query = "SELECT id FROM mrp_bom_free_stock_queue"
+        params = []
+        if product_ids is not None:
+            if not product_ids:
+                return []
+            query += " WHERE product_id = ANY(%s)"
+            params.append(list(product_ids))
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        self.env.cr.execute(f"""
+            DELETE FROM mrp_bom_free_stock_queue
+             WHERE id IN ({query} FOR UPDATE SKIP LOCKED)
+            RETURNING product_id
+        """, params)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _refresh_products(self, product_ids):
+        """Recompute ``free_to_use`` of every branch and component of ``product_ids`` in bulk."""
+        if not product_ids:
+            return
+        components = self.env['mrp.bom.line.branch.components'].search([
+            ('cr_bom_line_id.product_id', 'in', product_ids),
+        ])
+        branches = self.env['mrp.bom.line.branch'].search([
+            ('bom_line_id.product_id', 'in', product_ids),
+        ])
+        for records in (components, branches):
+            if records:
+                self.env.add_to_compute(records._fields['free_to_use'], records)
+                records.flush_recordset(['free_to_use'])
+
+    @api.model
+    def _refresh_pending(self, product_ids):
+        """Read-time freshness: refresh now whatever of ``product_ids`` is still queued."""
+        product_ids = set(product_ids)
+        pending = self._pop_products(list(product_ids))
+        buffer = self.env.cr.precommit.data.get(FREE_STOCK_BUFFER_KEY)
+        if buffer:
+            pending = set(pending) | (buffer & product_ids)
+            buffer -= product_ids
+        self._refresh_products(list(pending))
+
+    @api.model
+    def _refresh_pending_for_root(self, root_bom):
+        """Read-time freshness for everything displayed under ``root_bom``."""
+        product_ids = set(self.env['mrp.bom.line.branch.components'].search([
+            ('root_bom_id', '=', root_bom.id),
+        ]).mapped('cr_bom_line_id.product_id').ids)
+        product_ids.update(self.env['mrp.bom.line.branch'].search([
+            ('bom_id', '=', root_bom.id),
+        ]).mapped('bom_line_id.product_id').ids)
+        self._refresh_pending(product_ids)
+
+    @api.model
+    def _cron_refresh_free_to_use(self, limit=500):
+        """
+        Scheduled action: refresh free-to-use quantities of products whose stock
+        changed. Runs in batches and re-triggers itself while products remain queued.
+        """
+        product_ids = self._pop_products(limit=limit)
+        self._refresh_products(product_ids)
+        _logger.info("[Free Stock] Refreshed free-to-use for %s product(s)", len(product_ids))
+        if product_ids and self.search_count([], limit=1):
+            self._trigger_worker()
+        return len(product_ids)
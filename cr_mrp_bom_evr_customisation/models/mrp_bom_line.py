@@ -12,12 +12,31 @@ class MrpBomLine(models.Model):
     customer_ref = fields.Char(string='Customer ref')
     root_bom_assignment_ids = fields.One2many('mrp.bom.line.branch.assignment', 'bom_line_id', 
                                            string='Root BOM Assignments')
+    subtree_approved = fields.Boolean(
+        string='Subtree Approved',
+        default=True,
+        copy=False,
+        readonly=True,
+        help="Stored roll-up: this line and every sub-assembly below it are approved to manufacture.",
+    )
+
+    def _get_subtree_approval_fields(self):
+        """Line fields that affect the approval roll-up of the parent BOM."""
+        return {'approve_to_manufacture', 'product_id', 'bom_id'}
 
     def write(self, vals):
         quantity_changed = 'product_qty' in vals
+        approval_changed = (
+            not self.env.context.get('skip_subtree_approval')
+            and bool(self._get_subtree_approval_fields() & set(vals))
+        )
+        boms_before = self.mapped('bom_id') if approval_changed else self.env['mrp.bom']
 
         res = super().write(vals)
 
+        if approval_changed:
+            (boms_before | self.mapped('bom_id'))._refresh_subtree_approval()
+
         if quantity_changed and not self.env.context.get('skip_mo_qty_update'):
             for line in self:
                 if line.bom_id.is_evr and line.child_bom_id:
@@ -74,20 +93,15 @@ class MrpBomLine(models.Model):
         Find root BOMs that must be recalculated based on line changes.
         Performance optimization: process by unique parent BOM.
         """
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('sync')
         affected_roots = set()
         parent_boms = self.mapped('bom_id')
 
         for bom in parent_boms:
-            _logger.info(f"[SYNC TRACE] _collect_affected_root_boms checking parent BOM '{bom.display_name}' (ID {bom.id})")
+            trace.debug("_collect_affected_root_boms checking parent BOM '%s' (ID %s)", lambda: bom.display_name, bom.id)
 
-            # Method 1: from explicit used_in_root_bom_ids_str tracking
-            if bom.used_in_root_bom_ids_str:
-                id_strings = [i.strip() for i in bom.used_in_root_bom_ids_str.split(',') if i.strip()]
-                for root_id_str in id_strings:
-                    try:
-                        affected_roots.add(int(root_id_str))
-                    except ValueError:
-                        pass
+            # Method 1: from explicit root usage tracking
+            affected_roots.update(bom.used_in_root_bom_ids.ids)
 
             # Method 2: BFS ancestor search via product relationship
             helpers = self.env['cr.mrp.bom.helpers']
@@ -114,29 +128,36 @@ class MrpBomLine(models.Model):
         final_roots = self.env['mrp.bom'].browse(list(affected_roots)).filtered(
             lambda r: r.is_evr and (r.cfe_project_location_id or getattr(r, 'sale_order_id', False))
         )
-        _logger.info(f"[SYNC TRACE] Final EVR Roots to reassign: {[r.display_name for r in final_roots]}")
+        trace.debug("Final EVR Roots to reassign: %s", lambda: final_roots.mapped('display_name'))
+        trace.summary(
+            "collect affected roots", lines=len(self), parent_boms=len(parent_boms), roots=final_roots.ids,
+        )
         return final_roots
 
     @api.model_create_multi
     def create(self, vals_list):
-        _logger.info(f"[SYNC TRACE] mrp.bom.line.create triggered for {len(vals_list)} lines. Context: {self.env.context}")
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('sync')
+        trace.debug("mrp.bom.line.create triggered for %s lines. Context: %s", len(vals_list), lambda: self.env.context)
         lines = super(MrpBomLine, self.with_context(skip_branch_recompute=True)).create(vals_list)
 
+        if not self.env.context.get('skip_subtree_approval'):
+            lines.mapped('bom_id')._refresh_subtree_approval()
+
         if not self.env.context.get('skip_branch_recompute'):
-            _logger.info(f"[SYNC TRACE] skip_branch_recompute is FALSE, checking affected roots...")
+            trace.debug("skip_branch_recompute is FALSE, checking affected roots...")
             roots = lines._collect_affected_root_boms()
             if roots:
                 for root in roots:
-                    _logger.info(f"[SYNC TRACE] Triggering _assign_branches_for_bom on Root '{root.display_name}' (ID {root.id})")
-                    self.env['bus.bus']._sendone(
-                        self.env.user.partner_id, "simple_notification",
+                    trace.debug("Triggering _assign_branches_for_bom on Root '%s' (ID %s)", lambda: root.display_name, root.id)
+                    self.env['cr.mrp.bom.helpers']._queue_notification(
+                        self.env.user.partner_id,
                         {"title": "BOM Hierarchy Sync", "message": f"Adding component to '{root.display_name}' hierarchy...", "sticky": False, "type": "info"}
                     )
                     root._assign_branches_for_bom()
             else:
-                _logger.info(f"[SYNC TRACE] No affected roots found for these newly created lines.")
+                trace.debug("No affected roots found for these newly created lines.")
         else:
-            _logger.info(f"[SYNC TRACE] skip_branch_recompute is TRUE, skipping trigger.")
+            trace.debug("skip_branch_recompute is TRUE, skipping trigger.")
 
         return lines
 
@@ -157,43 +178,40 @@ class MrpBomLine(models.Model):
         return Assignment.search(domain, limit=1)
 
     def _delete_child_records_recursive(self, line, root_bom_id):
-        """Recursively delete Branch, Component, and Draft MO records for a line's subtree."""
+        """
+        Delete Branch, Component, and Draft MO records for a line's subtree.
+        The subtree is resolved through the branch hierarchy (child_of on parent_path).
+        """
         Component = self.env['mrp.bom.line.branch.components']
         Branch = self.env['mrp.bom.line.branch']
         Production = self.env['mrp.production']
 
-        # Determine child BOM (same logic as branch assignment)
-        child_bom = line.child_bom_id
-        if not child_bom:
-             # Try default BOM for product
-             child_bom = self.env['mrp.bom']._get_first_created_bom(line.product_id)
-
-        if child_bom:
-            _logger.info("Cleaning up subtree for line %s (Product: %s)", line.id, line.product_id.display_name)
-            for child_line in child_bom.bom_line_ids:
-                # 1. Delete associated Components
-                Component.search([
-                    ('cr_bom_line_id', '=', child_line.id),
-                    ('root_bom_id', '=', root_bom_id)
-                ]).unlink()
-
-                # 2. Delete associated Branches
-                branches = Branch.search([
-                    ('bom_line_id', '=', child_line.id),
-                    ('bom_id', '=', root_bom_id)
-                ])
-                for branch in branches:
-                    branch.unlink() # Cascades to its components via O2M ondelete
-
-                # 3. Delete associated Draft MOs
-                Production.search([
-                    ('root_bom_id', '=', root_bom_id),
-                    ('line', '=', str(child_line.id)),
-                    ('state', '=', 'draft')
-                ]).unlink()
-
-                # 4. RECURSE: Process the next level down
-                self._delete_child_records_recursive(child_line, root_bom_id)
+        own_branches = Branch.search([
+            ('bom_line_id', '=', line.id),
+            ('bom_id', '=', root_bom_id),
+        ])
+        if not own_branches:
+            return
+
+        _logger.info("Cleaning up subtree for line %s (Product: %s)", line.id, line.product_id.display_name)
+        descendants = Branch.search([('id', 'child_of', own_branches.ids)]) - own_branches
+
+        # 1. Delete Components of all child lines below the line's branches
+        Component.search([
+            ('bom_line_branch_id', 'child_of', own_branches.ids),
+            ('root_bom_id', '=', root_bom_id)
+        ]).unlink()
+
+        # 2. Delete associated Draft MOs
+        if descendants:
+            Production.search([
+                ('root_bom_id', '=', root_bom_id),
+                ('branch_mapping_id', 'in', descendants.ids),
+                ('state', '=', 'draft')
+            ]).unlink()
+
+        # 3. Delete descendant Branches
+        descendants.unlink()
 
     def unlink(self):
         # 1. Collect affected root BOMs before deleting the lines
@@ -230,21 +248,25 @@ class MrpBomLine(models.Model):
 
         # Notify user about deletion start
         if any(del_counts.values()):
-            self.env['bus.bus']._sendone(
-                self.env.user.partner_id, "simple_notification",
+            self.env['cr.mrp.bom.helpers']._queue_notification(
+                self.env.user.partner_id,
                 {"title": "Cleaning Up BOM Hierarchy", 
                  "message": f"Removing {del_counts['branch']} branches, {del_counts['comp']} components, and {del_counts['mo']} draft MOs...", 
                  "sticky": False, "type": "warning"}
             )
 
         # 3. Perform the actual unlink
+        parent_boms = self.mapped('bom_id')
         res = super(MrpBomLine, self.with_context(skip_branch_recompute=True)).unlink()
 
+        if not self.env.context.get('skip_subtree_approval'):
+            parent_boms.exists()._refresh_subtree_approval()
+
         # 4. Trigger incremental update for roots
         if roots:
              for root in roots:
-                 self.env['bus.bus']._sendone(
-                     self.env.user.partner_id, "simple_notification",
+                 self.env['cr.mrp.bom.helpers']._queue_notification(
+                     self.env.user.partner_id,
                      {"title": "BOM Hierarchy Sync", "message": f"Syncing '{root.display_name}' after deletion...", "sticky": False, "type": "info"}
                  )
                  root._assign_branches_for_bom()
@@ -7,12 +7,15 @@ class MrpBomLineBranch(models.Model):
     _name = "mrp.bom.line.branch"
     _description = "Branch mapping per BOM per path"
     _rec_name = 'branch_name'
+    _parent_name = 'parent_branch_id'
+    _parent_store = True
 
     bom_id = fields.Many2one('mrp.bom', string='BOM', required=True, ondelete='cascade', index=True)
     bom_line_id = fields.Many2one('mrp.bom.line', string='BOM Line', ondelete='cascade', index=True)
     branch_name = fields.Char(string='Branch', required=True, index=True)
     sequence = fields.Integer(string='Sequence', default=0)
     parent_branch_id = fields.Many2one('mrp.bom.line.branch', string='Parent Branch', index=True, ondelete='cascade')
+    parent_path = fields.Char(index=True)
     root_line_id = fields.Many2one('mrp.bom.line', string='Root Component Line', index=True, ondelete='cascade')
     path_uid = fields.Char(string='Path UID', index=True)
     location_id = fields.Many2one('stock.location', string='Branch Location', ondelete='set null')
@@ -80,78 +83,23 @@ class MrpBomLineBranch(models.Model):
         return action
 
 
-    @api.depends(
-        'bom_line_id.product_id',
-        'bom_line_id.product_id.stock_quant_ids',
-        'bom_line_id.product_id.stock_quant_ids.quantity',
-        'bom_line_id.product_id.stock_quant_ids.reserved_quantity',
-        'bom_line_id.product_id.stock_quant_ids.location_id',
-        'bom_line_id.product_id.stock_quant_ids.location_id.location_category',
-        'bom_line_id.product_id.stock_quant_ids.location_id.location_id.location_category'
-    )
+    @api.depends('bom_line_id.product_id')
     def _compute_free_to_use(self):
-        StockQuant = self.env['stock.quant']
+        snapshot = self.env['cr.mrp.bom.helpers']._get_free_stock_snapshot(
+            self.mapped('bom_line_id.product_id').ids
+        )
         for rec in self:
-            rec.free_to_use = 0.0
-            if not rec.bom_line_id or not rec.bom_line_id.product_id:
-                continue
-
             product = rec.bom_line_id.product_id
-
-            # Search for quants with positive quantity (stored field)
-            quants = StockQuant.search([
-                ('product_id', '=', product.id),
-                ('quantity', '>', 0),
-                ('owner_id', '=', False),
-            ])
-
-            total_qty = 0.0
-
-            # Check each location that has stock and calculate available quantity
-            for quant in quants:
-                # Calculate available quantity (quantity - reserved_quantity)
-                available_qty = quant.quantity - quant.reserved_quantity
-                if available_qty > 0 and self._should_consider_location(quant.location_id):
-                    total_qty += available_qty
-
-            rec.free_to_use = float(total_qty)
+            rec.free_to_use = float(snapshot[product.id]['free']) if product else 0.0
 
     def _should_consider_location(self, location):
         """
-        Check if a location should be considered by checking itself and then its parent chain.
-        Returns True if the location itself OR any of its ancestors is marked as free.
-        Stops checking as soon as a free location is found.
+        Check if a location should be considered: the location itself or any
+        of its ancestors is marked as free (flags shared per transaction).
         """
         if not location:
             return False
-
-        location_fields = self.env['stock.location']._fields
-        use_boolean_field = 'free_to_use' in location_fields
-
-        cur = location
-        while cur:
-            # Check if current location is free
-            is_free = False
-            if use_boolean_field:
-                try:
-                    is_free = bool(cur.free_to_use)
-                except Exception:
-                    pass
-            else:
-                try:
-                    is_free = getattr(cur, 'location_category', False) == 'free'
-                except Exception:
-                    pass
-
-            if is_free:
-                # Found a free location in the chain, so this location should be considered
-                return True
-
-            # Move to parent and continue checking
-            cur = cur.location_id
-
-        # No free location found in the entire parent chain
-        return False
+        return self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id][0]
 
 
     def action_toggle_approve_to_manufacture(self, approve):
@@ -99,84 +99,54 @@ class MrpBomLineBranchComponents(models.Model):
         product = self.cr_bom_line_id.product_id
         if not product:
             return self.env['product.manufacturer.detail']
-        
-        # Consistent with report logic: find main vendor seller lines
-        main_vendor_sellers = product.product_tmpl_id.seller_ids.filtered(lambda s: s.main_vendor)
-        return main_vendor_sellers.mapped('manufacturer_ids')
-
-
-    @api.depends(
-        'cr_bom_line_id.product_id',
-        'cr_bom_line_id.product_id.stock_quant_ids',
-        'cr_bom_line_id.product_id.stock_quant_ids.quantity',
-        'cr_bom_line_id.product_id.stock_quant_ids.reserved_quantity',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id.location_category',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id.location_id.location_category'
-    )
-    def _compute_free_to_use(self):
-        StockQuant = self.env['stock.quant']
-        for rec in self:
-            rec.free_to_use = 0.0
-            if not rec.cr_bom_line_id or not rec.cr_bom_line_id.product_id:
-                continue
-
-            product = rec.cr_bom_line_id.product_id
+        return self._get_manufacturers_by_product(product)[product.id]
 
-            # Search for quants with positive quantity (stored field)
-            quants = StockQuant.search([
-                ('product_id', '=', product.id),
-                ('quantity', '>', 0),
-                ('owner_id', '=', False),
-            ])
-
-            total_qty = 0.0
+    @api.model
+    def _get_manufacturers_by_product(self, products):
+        """
+        Map product id -> manufacturer details of its main vendor seller lines
+        (consistent with report logic), resolved once for a whole batch.
+        """
+        # Prefetch seller lines and their manufacturers for every template at once
+        products.product_tmpl_id.seller_ids.filtered(lambda s: s.main_vendor).mapped('manufacturer_ids')
+        return {
+            product.id: product.product_tmpl_id.seller_ids.filtered(lambda s: s.main_vendor).mapped('manufacturer_ids')
+            for product in products
+        }
+
+    def _auto_select_manufacturer(self):
+        """Set the manufacturer on records without one when exactly one choice exists (grouped writes)"""
+        records = self.filtered(lambda r: not r.product_manufacturer_id and r.cr_bom_line_id.product_id)
+        if not records:
+            return
+        manufacturers = self._get_manufacturers_by_product(records.cr_bom_line_id.product_id)
+        to_write = {}
+        for rec in records:
+            available = manufacturers[rec.cr_bom_line_id.product_id.id]
+            if len(available) == 1:
+                to_write.setdefault(available.id, self.browse())
+                to_write[available.id] |= rec
+        for manufacturer_id, grouped in to_write.items():
+            grouped.write({'product_manufacturer_id': manufacturer_id})
 
-            # Check each location that has stock and calculate available quantity
-            for quant in quants:
-                # Calculate available quantity (quantity - reserved_quantity)
-                available_qty = quant.quantity - quant.reserved_quantity
-                if available_qty > 0 and self._should_consider_location(quant.location_id):
-                    total_qty += available_qty
 
-            rec.free_to_use = float(total_qty)
+    @api.depends('cr_bom_line_id.product_id')
+    def _compute_free_to_use(self):
+        snapshot = self.env['cr.mrp.bom.helpers']._get_free_stock_snapshot(
+            self.mapped('cr_bom_line_id.product_id').ids
+        )
+        for rec in self:
+            product = rec.cr_bom_line_id.product_id
+            rec.free_to_use = float(snapshot[product.id]['free']) if product else 0.0
 
     def _should_consider_location(self, location):
         """
-        Check if a location should be considered by checking itself and then its parent chain.
-        Returns True if the location itself OR any of its ancestors is marked as free.
-        Stops checking as soon as a free location is found.
+        Check if a location should be considered: the location itself or any
+        of its ancestors is marked as free (flags shared per transaction).
         """
         if not location:
             return False
-
-        location_fields = self.env['stock.location']._fields
-        use_boolean_field = 'free_to_use' in location_fields
-
-        cur = location
-        while cur:
-            # Check if current location is free
-            is_free = False
-            if use_boolean_field:
-                try:
-                    is_free = bool(cur.free_to_use)
-                except Exception:
-                    pass
-            else:
-                try:
-                    is_free = getattr(cur, 'location_category', False) == 'free'
-                except Exception:
-                    pass
-
-            if is_free:
-                # Found a free location in the chain, so this location should be considered
-                return True
-
-            # Move to parent and continue checking
-            cur = cur.location_id
-
-        # No free location found in the entire parent chain
-        return False
+        return self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id][0]
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -184,22 +154,29 @@ class MrpBomLineBranchComponents(models.Model):
         for vals in vals_list:
             if vals.get('approval_2'):
                 vals['approval_1'] = True
-        
+
+        # Auto-select manufacturer if only one choice exists, injected before insert
+        pending = [vals for vals in vals_list if not vals.get('product_manufacturer_id') and vals.get('cr_bom_line_id')]
+        if pending:
+            lines = self.env['mrp.bom.line'].browse({vals['cr_bom_line_id'] for vals in pending})
+            manufacturers = self._get_manufacturers_by_product(lines.product_id)
+            product_by_line = {line.id: line.product_id.id for line in lines}
+            for vals in pending:
+                available = manufacturers.get(product_by_line[vals['cr_bom_line_id']])
+                if available and len(available) == 1:
+                    vals['product_manufacturer_id'] = available.id
+
         records = super(MrpBomLineBranchComponents, self.with_context(skip_branch_recompute=True)).create(vals_list)
-        
-        # Auto-select manufacturer if only one choice exists
-        for rec in records:
-            if not rec.product_manufacturer_id:
-                available = rec._get_available_manufacturers()
-                if len(available) == 1:
-                    rec.product_manufacturer_id = available[0].id
-                    
         return records
 
     @api.constrains('approval_1', 'approval_2')
     def _check_approvals_main_vendor(self):
-        for line in self:
-            if (line.approval_1 or line.approval_2) and not line.cr_bom_line_id.product_id.product_main_vendor_id:
+        approved = self.filtered(lambda l: l.approval_1 or l.approval_2)
+        # Read the main vendor of every product in one go
+        products_without_vendor = approved.cr_bom_line_id.product_id.filtered(lambda p: not p.product_main_vendor_id)
+        for line in approved:
+            product = line.cr_bom_line_id.product_id
+            if not product or product in products_without_vendor:
                 raise models.ValidationError(_("Approvals can be marked only if the product has a main vendor."))
 
     def write(self, vals):
@@ -214,11 +191,8 @@ class MrpBomLineBranchComponents(models.Model):
         res = super(MrpBomLineBranchComponents, self.with_context(skip_branch_recompute=True)).write(vals)
 
         # Auto-select manufacturer if empty and exactly one choice exists
-        for rec in self:
-            if not rec.product_manufacturer_id:
-                available = rec._get_available_manufacturers()
-                if len(available) == 1:
-                    rec.product_manufacturer_id = available[0].id
+        if not vals.get('product_manufacturer_id'):
+            self._auto_select_manufacturer()
 
         # Refined Approval Logic (Notifications + Revocation)
         if 'approval_1' in vals or 'approval_2' in vals:
@@ -233,7 +207,7 @@ class MrpBomLineBranchComponents(models.Model):
                 if is_approving or is_unapproving:
                     _logger.info("Sending Bus Notification for approval change on Component %s", line.id)
                     try:
-                        self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
+                        self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
                             'title': _("BOM Approval Updated"),
                             'message': _("Approval %s for %s") % (
                                 _("granted") if is_approving else _("removed"),
@@ -322,7 +296,7 @@ class MrpBomLineBranchComponents(models.Model):
                                     order.unlink()
                                     
                                     # Notify only about PO deletion (exclusive)
-                                    self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
+                                    self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
                                         'title': _("Purchase Order Deleted"),
                                         'message': _("PO %s was automatically deleted because it has no lines remaining.") % order_name,
                                         'sticky': True,
@@ -332,7 +306,7 @@ class MrpBomLineBranchComponents(models.Model):
                                     _logger.warning("Could not cancel/delete empty PO %s: %s", order_name, str(e))
                             else:
                                 # PO still has other lines, notify only about the line removal
-                                self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
+                                self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
                                     'title': _("PO Line Deleted"),
                                     'message': _("A line on PO %s was removed due to approval revocation.") % order_name,
                                     'sticky': False,
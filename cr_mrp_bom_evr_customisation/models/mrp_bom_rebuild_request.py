@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Context keys that shape a rebuild (transition target, rebuild mode, MO scope);
+# they are stored on the request so the deferred run behaves like the original call
+REBUILD_CONTEXT_KEYS = (
+    'changed_line_id',
+    'changed_branch_id',
+    'new_buy_make_value',
+    'parent_branch_id',
+    'parent_branch_name',
+    'sync_ui_only',
+    'skip_structural_recompute',
+    'force_check_new_lines',
+    'mo_scope_line_ids',
+)
+
+
+class MrpBomRebuildRequest(models.Model):
+    _name = "mrp.bom.rebuild.request"
+    _description = "Deferred root BOM rebuild"
+    _order = "id"
+
+    root_bom_id = fields.Many2one('mrp.bom', string='Root BOM', index=True, ondelete='cascade', required=True)
+    operation = fields.Selection([
+        ('branches', 'Branch Assignment'),
+        ('mos', 'MO Generation'),
+    ], string='Operation', required=True, default='branches')
+    user_id = fields.Many2one(
+        'res.users', string='Requested By', default=lambda self: self.env.user, ondelete='set null',
+        help='The deferred rebuild runs as this user, so their notifications and access apply.',
+    )
+    context_data = fields.Json(string='Context', help='Rebuild context of the deferred call.')
+    attempts = fields.Integer(string='Attempts', default=0)
+    max_attempts = fields.Integer(string='Max Attempts', default=3)
+    last_error = fields.Text(string='Last Error', readonly=True)
+
+    @api.model
+    def _get_rebuild_context(self):
+        """The rebuild-relevant part of the current context (see REBUILD_CONTEXT_KEYS)."""
+        context = self.env.context
+        return {key: context[key] for key in REBUILD_CONTEXT_KEYS if context.get(key)}
+
+    @api.model
+    def _enqueue(self, root_boms, operation):
+        """
+        Queue ``operation`` for ``root_boms`` with the current user and rebuild
+        context (once per root, user and context) and wake the worker.
+        """
+        context_data = self._get_rebuild_context()
+        existing = self.search([
+            ('root_bom_id', 'in', root_boms.ids),
+            ('operation', '=', operation),
+            ('user_id', '=', self.env.uid),
+        ]).filtered(lambda r: (r.context_data or {}) == context_data)
+        # A new trigger gives requests that ran out of attempts another chance
+        existing.filtered(lambda r: r.attempts >= r.max_attempts).write({'attempts': 0})
+        queued = existing.mapped('root_bom_id')
+        requests = self.create([
+            {
+                'root_bom_id': bom.id,
+                'operation': operation,
+                'user_id': self.env.uid,
+                'context_data': context_data or False,
+            }
+            for bom in root_boms - queued
+        ])
+        cron = self.env.ref(
+            'cr_mrp_bom_evr_customisation.ir_cron_process_bom_rebuild_requests',
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron._trigger()
+        return requests
+
+    def _get_run_bom(self):
+        """Root BOM of this request in the env of the original call: user, company and rebuild context."""
+        self.ensure_one()
+        root_bom = self.root_bom_id.with_company(self.root_bom_id.company_id)
+        if self.user_id:
+            root_bom = root_bom.with_user(self.user_id)
+        return root_bom.with_context(**(self.context_data or {}))
+
+    @api.model
+    def _cron_process_rebuild_requests(self, limit=50):
+        """
+        Scheduled action: run deferred rebuilds, oldest first, each as the user
+        and with the context of the call that was deferred. Roots still locked
+        by another transaction stay queued for the next run. Failing requests
+        are retried up to max_attempts times, then left with their last error
+        for review.
+        """
+        requests_by_root = {}
+        for request in self.search([]).filtered(lambda r: r.attempts < r.max_attempts):
+            requests_by_root.setdefault(request.root_bom_id, self.browse())
+            requests_by_root[request.root_bom_id] |= request
+
+        processed = 0
+        for root_bom, requests in list(requests_by_root.items())[:limit]:
+            if not root_bom._try_lock_root_rebuild():
+                continue
+            # Branch assignment before MO generation, call order within each operation
+            for request in requests.sorted(lambda r: (r.operation != 'branches', r.id)):
+                try:
+                    with self.env.cr.savepoint():
+                        run_bom = request._get_run_bom()
+                        if request.operation == 'branches':
+                            run_bom._assign_branches_for_bom()
+                        else:
+                            run_bom.action_create_child_mos_recursive()
+                        request.unlink()
+                except Exception as e:
+                    _logger.exception("Deferred rebuild of root BOM %s failed", root_bom.id)
+                    request.write({'attempts': request.attempts + 1, 'last_error': str(e)})
+            processed += 1
+
+        _logger.info("[Rebuild Queue] Processed %s of %s root BOM(s)", processed, len(requests_by_root))
+        return processed
@@ -26,9 +26,12 @@ class StockLocation(models.Model):
     def write(self, vals):
         res = super().write(vals)
 
+        if 'location_category' in vals or 'location_id' in vals:
+            self.env['cr.mrp.bom.helpers']._invalidate_free_stock_snapshot(locations=True)
+
         if 'location_category' in vals:
-            # Recompute free_to_use for all branch components
-            self.env['mrp.bom.line.branch.components'].search([])._compute_free_to_use()
-            self.env['mrp.bom.line.branch'].search([])._compute_free_to_use()
+            # Queue a free_to_use refresh for the products stored below these locations
+            quants = self.env['stock.quant'].search([('location_id', 'child_of', self.ids)])
+            self.env['mrp.bom.free.stock.queue']._mark_products(quants.product_id.ids)
 
         return res
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo import api, models
+
+# Quant fields feeding free_to_use on branches and components
+FREE_STOCK_QUANT_FIELDS = {'product_id', 'location_id', 'owner_id', 'quantity', 'reserved_quantity'}
+
+
+class StockQuant(models.Model):
+    _inherit = "stock.quant"
+
+    def _free_stock_changed(self, product_ids):
+        """Drop the transaction snapshot and queue the stored free_to_use refresh."""
+        self.env['cr.mrp.bom.helpers']._invalidate_free_stock_snapshot(product_ids)
+        self.env['mrp.bom.free.stock.queue']._mark_products(product_ids)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        quants = super().create(vals_list)
+        quants._free_stock_changed(quants.product_id.ids)
+        return quants
+
+    def write(self, vals):
+        if not FREE_STOCK_QUANT_FIELDS.intersection(vals):
+            return super().write(vals)
+        product_ids = self.product_id.ids
+        if vals.get('product_id'):
+            product_ids.append(vals['product_id'])
+        res = super().write(vals)
+        self._free_stock_changed(product_ids)
+        return res
+
+    def unlink(self):
+        product_ids = self.product_id.ids
+        res = super().unlink()
+        self._free_stock_changed(product_ids)
+        return res
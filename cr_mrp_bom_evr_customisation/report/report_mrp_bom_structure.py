@@ -239,10 +239,14 @@ class ReportBomStructureBranch(models.AbstractModel):
         if hasattr(self.__class__, '_branch_assignment_cache'):
             self.__class__._branch_assignment_cache.pop(f"bom_{bom_id}", None)
 
+        # Stock changes are applied to free_to_use by a worker; bring this BOM up to date first
+        bom = self.env['mrp.bom'].browse(bom_id)
+        if bom.is_evr:
+            self.env['mrp.bom.free.stock.queue']._refresh_pending_for_root(bom)
+
         # Set root BOM and initial parent branch context for the entire report
         self = self.with_context(root_bom_id=bom_id, parent_branch_id=False)
         result = super()._get_report_data(bom_id, searchQty, searchVariant)
-        bom = self.env['mrp.bom'].browse(bom_id)
         result['is_evr'] = bom.is_evr
         return result
 
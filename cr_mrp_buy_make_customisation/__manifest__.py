@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'MRP Buy/Make Customisation',
-    'version': '18.0.0.18',
+    'version': '18.0.0.20',
     'category': 'Manufacturing',
     'summary': 'Add Buy/Make selection in BOM overview for products',
     'description': """
@@ -17,6 +17,7 @@
         "cr_mrp_bom_evr_customisation","cr_mrp_bom_evr_automation",'bus','cr_custom_internal_transfer'],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/stock_picking.xml',
         'views/product_category_views.xml',
         'views/product_template_views.xml',
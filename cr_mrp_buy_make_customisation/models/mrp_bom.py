@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
 import uuid
+from collections import defaultdict
 
 from odoo import models, api, _
 import logging
@@ -10,19 +11,6 @@ from odoo.exceptions import UserError, ValidationError
 _logger = logging.getLogger(__name__)
 
 
-def _generate_branch_codes():
-    codes = []
-    for c in range(ord('A'), ord('Z') + 1):
-        codes.append(chr(c))
-    for c in range(ord('A'), ord('Z') + 1):
-        for d in range(1, 10):
-            codes.append(f"{chr(c)}{d}")
-    for c1 in range(ord('A'), ord('Z') + 1):
-        for c2 in range(ord('A'), ord('Z') + 1):
-            codes.append(chr(c1) + chr(c2))
-    return codes
-
-
 class MrpBom(models.Model):
     _inherit = 'mrp.bom'
 
@@ -56,10 +44,18 @@ class MrpBom(models.Model):
             bom._assign_branches_for_bom()
         return True
 
-    def _should_treat_as_component(self, bom_line, parent_branch_id=None, root_bom=None):
+    def action_recalculate_transfer_demand(self):
+        """Run the purchase flow for every component of the selected root BoMs in one batch."""
+        self.env['mrp.bom.line.branch.components'].search([
+            ('root_bom_id', 'in', self.ids),
+        ])._process_purchase_flow()
+        return True
+
+    def _should_treat_as_component(self, bom_line, parent_branch_id=None, root_bom=None, plan_cache=None):
         """
         Smart path-aware check if BOM line should be treated as a component.
         Considers context overrides, existing branch selections, and global defaults.
+        ``plan_cache`` (see _get_mo_plan_cache) replaces the per-line lookups.
         """
         if not bom_line:
             return False
@@ -70,7 +66,10 @@ class MrpBom(models.Model):
         has_child = bool(bom_line.child_bom_id)
         if not has_child:
             # Check if other BOMs exist if this line has no child_bom_id
-            possible_bom = self._get_first_created_bom(bom_line.product_id)
+            if plan_cache is not None:
+                possible_bom = self._get_first_created_bom_cached(bom_line.product_id, plan_cache)
+            else:
+                possible_bom = self._get_first_created_bom(bom_line.product_id)
             if possible_bom:
                 has_child = True
 
@@ -103,13 +102,15 @@ class MrpBom(models.Model):
             is_buy = (new_buy_make_value == 'buy')
         else:
             # Priority 2: Look for existing branch and its selection
-            Branch = self.env['mrp.bom.line.branch']
-            existing_branch = Branch.search([
-                ('bom_id', '=', root_bom.id),
-                ('bom_line_id', '=', bom_line.id),
-                ('parent_branch_id', '=', parent_branch_id)
-            ], limit=1)
-            
+            if plan_cache is not None:
+                existing_branch = plan_cache['branches'].get((bom_line.id, parent_branch_id or False))
+            else:
+                existing_branch = self.env['mrp.bom.line.branch'].search([
+                    ('bom_id', '=', root_bom.id),
+                    ('bom_line_id', '=', bom_line.id),
+                    ('parent_branch_id', '=', parent_branch_id)
+                ], limit=1)
+
             if existing_branch:
                 # If this IS the explicitly changed branch record, use the context value
                 if changed_branch_id and existing_branch.id == changed_branch_id:
@@ -151,8 +152,49 @@ class MrpBom(models.Model):
         line = self.env['mrp.bom.line'].browse(line_id)
         if not line.exists():
             return {'success': False, 'message': 'BOM Line not found'}
+        if not self._try_lock_root_rebuild():
+            return {
+                'success': False,
+                'message': 'This BOM is being rebuilt by another user. Please retry in a moment.',
+            }
 
         # Determine parent_branch_name for the context check
+        target_parent_name = self._get_transition_parent_name(record_model, record_id, parent_branch_name)
+
+        old_value = getattr(line, 'buy_make_selection', 'buy')
+
+        # 2. SUBTREE-SCOPED TRANSITION when the path is materialized, full rebuild otherwise
+        parent_branch = self._get_transition_parent_branch(line, self, parent_branch_name=target_parent_name)
+        if self._can_transition_subtree(line, parent_branch):
+            outcome = self._transition_bom_line_subtree(line, parent_branch, target_parent_name, new_value)
+        else:
+            outcome = self._transition_bom_line_full(line, target_parent_name, new_value)
+        cleanup_results = outcome['cleanup']
+        create_results = outcome['created']
+
+        # 7. REAL-TIME NOTIFICATIONS (WOW EFFECT)
+        _logger.info(f"  ✓ SENDING TRANSITION NOTIFICATION")
+        self._notify_transition_summary(line, old_value, new_value, cleanup_results, create_results)
+
+        _logger.info(f"### ATOMIC TRANSITION COMPLETE ###")
+        transfers_cancelled = [t for t in cleanup_results.get('transfers', []) if not t.get('reversed')]
+        transfers_reversed = [t for t in cleanup_results.get('transfers', []) if t.get('reversed')]
+
+        return {
+            'success': True,
+            'product_name': line.product_id.display_name,
+            'old_value': old_value,
+            'mos_deleted': outcome['mos_deleted'],
+            'pos_deleted': cleanup_results.get('pos', []),
+            'transfers_cancelled': transfers_cancelled,
+            'transfers_reversed': transfers_reversed,
+            'mos_created': create_results,
+            'branches_deleted': outcome['branches_deleted'],
+            'components_deleted': outcome['components_deleted'],
+        }
+
+    def _get_transition_parent_name(self, record_model, record_id, parent_branch_name=None):
+        """Parent branch name ("ROOT" at top level) of the record a transition was started from."""
         target_parent_name = parent_branch_name or "ROOT"
         if record_model == 'mrp.bom.line.branch' and record_id:
             branch_rec = self.env['mrp.bom.line.branch'].browse(record_id)
@@ -166,10 +208,168 @@ class MrpBom(models.Model):
             mech_rec = self.env['mrp.mechanical.part'].browse(record_id)
             if mech_rec.exists():
                 target_parent_name = mech_rec.parent_branch_name
+        return target_parent_name
 
-        # 2. CAPTURE DATA BEFORE PURGE
-        old_value = getattr(line, 'buy_make_selection', 'buy')
+    def _get_transition_parent_branch(self, line, root_bom, parent_branch_name=None):
+        """Parent branch of ``line`` in the ``parent_branch_name`` path (empty for ROOT)."""
+        Assignment = self.env['mrp.bom.line.branch.assignment']
+
+        # Find the parent branch ID from existing assignments for this line
+        assign_domain = [('root_bom_id', '=', root_bom.id), ('bom_line_id', '=', line.id)]
+        if parent_branch_name:
+            if parent_branch_name == "ROOT":
+                assign_domain.append(('branch_id', '=', False))
+            else:
+                assign_domain.append(('branch_id.branch_name', '=', parent_branch_name))
+
+        assign = Assignment.search(assign_domain, limit=1)
+        # Guard against stale references to already-deleted branch records
+        if assign and assign.branch_id.exists():
+            return assign.branch_id
+        return self.env['mrp.bom.line.branch']
+
+    def _can_transition_subtree(self, line, parent_branch):
+        """Subtree-scoped transitions need the path's structure to exist already."""
+        return bool(self._get_transition_path_records(line, parent_branch))
+
+    def _get_transition_path_records(self, line, parent_branch):
+        """Own branch or component record of ``line`` in the ``parent_branch`` path of this root."""
+        self.ensure_one()
+        own_branch = self.env['mrp.bom.line.branch'].search([
+            ('bom_id', '=', self.id),
+            ('bom_line_id', '=', line.id),
+            ('parent_branch_id', '=', parent_branch.id or False),
+        ], limit=1)
+        if own_branch:
+            return own_branch
+        return self.env['mrp.bom.line.branch.components'].search([
+            ('root_bom_id', '=', self.id),
+            ('cr_bom_line_id', '=', line.id),
+            ('bom_line_branch_id', '=', parent_branch.id or False),
+        ], limit=1)
+
+    def _transition_bom_line_subtree(self, line, parent_branch, parent_branch_name, new_value):
+        """
+        Transition one path: cleanup, structure and MO regeneration are limited to
+        the line's own branch subtree (or its component record). Unrelated branches,
+        MOs and their IDs are left untouched.
+        """
+        self.ensure_one()
+        Branch = self.env['mrp.bom.line.branch']
+        Component = self.env['mrp.bom.line.branch.components']
+        Production = self.env['mrp.production']
 
+        path_record = self._get_transition_path_records(line, parent_branch)
+        subtree_branches = path_record._get_branch_subtree() if path_record._name == Branch._name else Branch
+        path_component = path_record if path_record._name == Component._name else Component
+
+        # Snapshot MOs of the subtree before cleanup
+        mos_deleted = [
+            {'name': mo.name, 'product': mo.product_id.display_name}
+            for mo in Production.search([
+                ('root_bom_id', '=', self.id),
+                ('branch_mapping_id', 'in', subtree_branches.ids),
+                ('state', 'not in', ['done', 'cancel']),
+            ])
+        ]
+
+        # 3. SURGICAL LEGACY CLEANUP (MOs, POs, Transfers) while the structure still exists
+        cleanup_results = self._cleanup_transition_legacy_data(line, self, parent_branch_name=parent_branch_name)
+
+        # Remaining open MOs of the subtree (e.g. closing ones)
+        handled = {m.get('name') for m in cleanup_results.get('mos', [])}
+        extra_mos = Production.search([
+            ('root_bom_id', '=', self.id),
+            ('branch_mapping_id', 'in', subtree_branches.exists().ids),
+            ('state', 'in', ['draft', 'confirmed', 'progress', 'to_close']),
+            ('name', 'not in', list(handled)),
+        ])
+        cleanup_results['mos'].extend(extra_mos._cancel_and_unlink_with_summary('SUBTREE MO'))
+
+        # 4. SUBTREE STRUCTURE: drop the path records (cascades to descendants) and rebuild them
+        subtree_branches = subtree_branches.exists()
+        old_branch_names = set(subtree_branches.mapped('branch_name'))
+        branches_deleted = len(subtree_branches)
+        components_deleted = len(path_component) + Component.search_count([
+            ('bom_line_branch_id', 'in', subtree_branches.ids),
+        ])
+        path_component.exists().unlink()
+        subtree_branches.unlink()
+
+        _logger.info(f"  ✓ REBUILDING SUBTREE of line {line.id} under {parent_branch_name}")
+        state = self.with_context(
+            changed_line_id=line.id,
+            new_buy_make_value=new_value,
+            parent_branch_name=parent_branch_name,
+        )._get_branch_build_state(next_code_index=self._get_next_branch_code_index())
+        state['relink_orphan_mos_only'] = True
+        self._build_branch_structure(
+            line, parent_branch.id or False, 1 if parent_branch else 0,
+            parent_branch.root_line_id.id if parent_branch else None, parent_branch_name, state
+        )
+        self._set_next_branch_code_index(state['next_code_index'])
+
+        # 5. MO REGENERATION for the new branch subtree only
+        create_results = []
+        if self._get_transition_path_records(line, parent_branch)._name == Branch._name:
+            parent_mo = Production
+            parent_qty = 1.0
+            if parent_branch:
+                parent_mo = Production.search([
+                    ('root_bom_id', '=', self.id),
+                    ('branch_mapping_id', '=', parent_branch.id),
+                    ('state', 'not in', ['done', 'cancel']),
+                ], limit=1)
+                branch = parent_branch
+                while branch:
+                    parent_qty *= branch.bom_line_id.product_qty or 1.0
+                    branch = branch.parent_branch_id
+                if parent_mo:
+                    parent_qty = parent_mo.product_qty
+
+            _logger.info(f"  ✓ GENERATING NEW MOs for the MAKE subtree")
+            line.bom_id.with_context(
+                created_mos_list=create_results,
+                mo_scope_line_ids=[line.id],
+            ).action_create_child_mos_recursive(
+                root_bom=self,
+                parent_mo=parent_mo,
+                level=1,
+                parent_qty=parent_qty,
+                parent_branch_location=parent_branch.location_id.id if parent_branch else None,
+                parent_branch_id=parent_branch.id or None,
+            )
+
+        # 6. MANAGEMENT UI: refresh MO links of the rebuilt paths, purge parts of the old subtree
+        sync_data = state['sync_data']
+        if sync_data:
+            mo_ids_by_line = defaultdict(list)
+            for mo in Production.search([
+                ('root_bom_id', '=', self.id),
+                ('line', 'in', [str(data['bom_line_id']) for data in sync_data]),
+                ('state', '!=', 'cancel'),
+            ]):
+                mo_ids_by_line[mo.line].append(mo.id)
+            for data in sync_data:
+                data['mo_ids'] = mo_ids_by_line.get(str(data['bom_line_id']), [])
+        self.env['mrp.mechanical.part'].sync_mechanical_parts(
+            self, sync_data, scope_parent_branch_names=old_branch_names
+        )
+
+        return {
+            'cleanup': cleanup_results,
+            'created': create_results,
+            'mos_deleted': mos_deleted,
+            'branches_deleted': branches_deleted,
+            'components_deleted': components_deleted,
+        }
+
+    def _transition_bom_line_full(self, line, parent_branch_name, new_value):
+        """
+        Fallback when the transition path is not materialized yet:
+        project-wide MO cleanup followed by a full structural rebuild.
+        """
+        self.ensure_one()
         # Snapshot only MOs tied to currently active branches (not orphaned historical ones)
         active_branch_ids = self.env['mrp.bom.line.branch'].search([
             ('bom_id', '=', self.id)
@@ -185,66 +385,195 @@ class MrpBom(models.Model):
 
         # 3. SURGICAL & AGGRESSIVE LEGACY CLEANUP (MOs, POs, Transfers)
         # We do this FIRST while structural records still exist for path lookup
-        cleanup_results = self._cleanup_transition_legacy_data(line, self, parent_branch_name=target_parent_name)
+        cleanup_results = self._cleanup_transition_legacy_data(line, self, parent_branch_name=parent_branch_name)
 
         # AGGRESSIVE GLOBAL MO CLEANUP: Delete ALL draft/confirmed/progress MOs for this project (ROOT BOM)
         # USER REQUEST: Search using ONLY root_bom_id, nothing else.
+        # Skip MOs already handled in cleanup_results
+        handled = {m.get('name') for m in cleanup_results.get('mos', [])}
         extra_mos = self.env['mrp.production'].search([
             ('root_bom_id', '=', self.id),
-            ('state', 'in', ['draft', 'confirmed', 'progress', 'to_close'])
+            ('state', 'in', ['draft', 'confirmed', 'progress', 'to_close']),
+            ('name', 'not in', list(handled)),
         ])
-        for xmo in extra_mos:
-            # Check if already handled in cleanup_results
-            if xmo.name not in [m.get('name') for m in cleanup_results.get('mos', [])]:
-                cleanup_results['mos'].append({
-                    'name': xmo.name, 
-                    'product': xmo.product_id.display_name,
-                    'state': xmo.state
-                })
-                _logger.info(f"  ✗ Deleting PROJECT-WIDE MO: {xmo.name} (State: {xmo.state})")
-                xmo.action_cancel()
-                xmo.unlink()
-
+        cleanup_results['mos'].extend(extra_mos._cancel_and_unlink_with_summary('PROJECT-WIDE MO'))
 
         # 4. FRESH REBUILD (Purge happens safely inside after caching)
         _logger.info(f"  ✓ TRIGGERING FRESH REBUILD")
         self.with_context(
-            changed_line_id=line_id,
+            changed_line_id=line.id,
             new_buy_make_value=new_value,
-            parent_branch_name=target_parent_name,
+            parent_branch_name=parent_branch_name,
         )._assign_branches_for_bom()
 
         _logger.info(f"  ✓ GENERATING NEW MOs for all remaining MAKE branches")
         create_results = []
         self.with_context(created_mos_list=create_results).action_create_child_mos_recursive()
-        
+
         # FINAL SYNC: picking up new MOs without unlinking structure again
         self.with_context(skip_structural_recompute=True)._assign_branches_for_bom()
 
-        # After full transition: show all MOs that existed before (all branches' old MOs)
-        all_deleted_mos = [{'name': name, 'product': product} for name, product in mos_before.items()]
+        return {
+            'cleanup': cleanup_results,
+            'created': create_results,
+            # After full transition: show all MOs that existed before (all branches' old MOs)
+            'mos_deleted': [{'name': name, 'product': product} for name, product in mos_before.items()],
+            'branches_deleted': 0, # They are always all deleted/reassigned now
+            'components_deleted': 0,
+        }
 
-        # 7. REAL-TIME NOTIFICATIONS (WOW EFFECT)
-        _logger.info(f"  ✓ SENDING TRANSITION NOTIFICATION")
-        self._notify_transition_summary(line, old_value, new_value, cleanup_results, create_results)
+    # ─────────────────────────────────────────────
+    # Transition impact preview (read-only)
+    # ─────────────────────────────────────────────
+    def action_plan_bom_line_transition(self, line_id, record_model, record_id, new_value, parent_branch_name=None):
+        """
+        DRY RUN of action_transition_bom_line: same path resolution and cleanup
+        rules, computed with bulk reads only. Nothing is written, cancelled or sent.
+        """
+        self.ensure_one()
+        line = self.env['mrp.bom.line'].browse(line_id)
+        if not line.exists():
+            return {'success': False, 'message': 'BOM Line not found'}
 
-        _logger.info(f"### ATOMIC TRANSITION COMPLETE ###")
-        transfers_cancelled = [t for t in cleanup_results.get('transfers', []) if not t.get('reversed')]
-        transfers_reversed = [t for t in cleanup_results.get('transfers', []) if t.get('reversed')]
+        target_parent_name = self._get_transition_parent_name(record_model, record_id, parent_branch_name)
+        parent_branch = self._get_transition_parent_branch(line, self, parent_branch_name=target_parent_name)
+        subtree_mode = self._can_transition_subtree(line, parent_branch)
 
-        return {
+        plan = self._get_transition_cleanup_plan(line, parent_branch, subtree_mode)
+        plan.update({
             'success': True,
+            'dry_run': True,
+            'mode': 'subtree' if subtree_mode else 'full',
             'product_name': line.product_id.display_name,
-            'old_value': old_value,
-            'mos_deleted': all_deleted_mos,
-            'pos_deleted': cleanup_results.get('pos', []),
-            'transfers_cancelled': transfers_cancelled,
-            'transfers_reversed': transfers_reversed,
-            'mos_created': create_results,
-            'branches_deleted': 0, # They are always all deleted/reassigned now
-            'components_deleted': 0
+            'old_value': getattr(line, 'buy_make_selection', 'buy'),
+            'new_value': new_value,
+            'branches_to_create': self._get_transition_new_branch_count(
+                line, parent_branch, target_parent_name, new_value, subtree_mode
+            ),
+        })
+        return plan
+
+    def _get_transition_cleanup_plan(self, line, parent_branch, subtree_mode):
+        """
+        Impact set of a transition: MOs to delete, PO lines to delete or review,
+        transfers to cancel or reverse, structure to drop. Mirrors
+        _cleanup_transition_legacy_data and the branch cleanup helpers.
+        """
+        self.ensure_one()
+        Branch = self.env['mrp.bom.line.branch']
+        Component = self.env['mrp.bom.line.branch.components']
+        Production = self.env['mrp.production']
+        Picking = self.env['stock.picking']
+
+        path_record = self._get_transition_path_records(line, parent_branch)
+        own_branch = path_record if path_record._name == Branch._name else Branch
+        subtree_branches = own_branch._get_branch_subtree() if own_branch else Branch
+        # Legacy component cleanup works on the line's component record of this root
+        comp_rec = Component.search([
+            ('root_bom_id', '=', self.id),
+            ('cr_bom_line_id', '=', line.id),
+        ], limit=1)
+
+        # MOs: the subtree's open MOs, or every open MO of the root for the full rebuild
+        mo_domain = [
+            ('root_bom_id', '=', self.id),
+            ('state', 'in', ['draft', 'confirmed', 'progress', 'to_close']),
+        ]
+        if subtree_mode:
+            mo_domain.append(('branch_mapping_id', 'in', subtree_branches.ids))
+        mos = Production.search(mo_domain)
+
+        # PO lines of the components below the subtree and of the line's component record
+        subtree_components = Component.search([
+            ('bom_line_branch_id', 'in', subtree_branches.ids),
+            ('root_bom_id', '=', self.id),
+        ]) if subtree_branches else Component
+        po_lines = self.env['purchase.order.line'].search([
+            ('component_branch_id', 'in', (subtree_components | comp_rec).ids),
+            ('bom_id', '=', self.id),
+        ])
+        draft_po_lines = po_lines.filtered(lambda l: l.order_id.state in ['draft', 'sent', 'to approve'])
+        # Confirmed lines are only reported for branch hierarchies (component lines are left as-is)
+        confirmed_po_lines = po_lines.filtered(
+            lambda l: l.order_id.state in ['purchase', 'done'] and l.component_branch_id in subtree_components
+        )
+
+        # Transfers of the EVR flow
+        origin = f"EVR Flow - {self.display_name}"
+        pending_pickings = Picking
+        done_pickings = Picking
+        if own_branch or comp_rec:
+            pending_pickings = Picking.search([
+                ('root_bom_id', '=', self.id),
+                ('origin', '=', origin),
+                ('state', 'not in', ['cancel', 'done']),
+            ])
+            if not own_branch:
+                pending_pickings = pending_pickings.filtered(
+                    lambda p: p.move_ids.filtered(lambda m: m.mrp_bom_line_id.id == line.id)
+                )
+            else:
+                pending_pickings = pending_pickings.filtered('move_ids')
+            done_pickings = Picking.search([
+                ('root_bom_id', '=', self.id),
+                ('state', '=', 'done'),
+                ('origin', '=', origin),
+                ('location_dest_id', 'child_of', self.cfe_project_location_id.id),
+            ])
+        moves_to_reverse = done_pickings.move_ids.filtered(lambda m: m.quantity > 0)
+
+        def po_info(po_line):
+            po = po_line.order_id
+            return {
+                'po_name': po.name,
+                'product': po_line.product_id.display_name,
+                'vendor': po.partner_id.name,
+                'type': 'CFE' if po.cfe else 'Vendor',
+            }
+
+        return {
+            'mos_to_delete': [
+                {'name': mo.name, 'product': mo.product_id.display_name, 'state': mo.state}
+                for mo in mos
+            ],
+            'pos_to_delete': [po_info(po_line) for po_line in draft_po_lines],
+            'pos_to_review': [po_info(po_line) for po_line in confirmed_po_lines],
+            'transfers_to_cancel': [
+                {'transfer_name': p.name, 'product': p.move_ids[:1].product_id.display_name}
+                for p in pending_pickings
+            ],
+            'transfers_to_reverse': [
+                {'transfer_name': m.picking_id.name, 'product': m.product_id.display_name, 'qty': m.quantity}
+                for m in moves_to_reverse
+            ],
+            # The full rebuild purges every branch and component of the root
+            'branches_to_delete': len(subtree_branches) if subtree_mode else Branch.search_count(
+                [('bom_id', '=', self.id)]
+            ),
+            'components_to_delete': len(subtree_components) + (
+                1 if path_record and path_record._name == Component._name else 0
+            ) if subtree_mode else Component.search_count([('root_bom_id', '=', self.id)]),
         }
 
+    def _get_transition_new_branch_count(self, line, parent_branch, parent_branch_name, new_value, subtree_mode=True):
+        """
+        Branches the rebuild would create, from an in-memory (UI-only) DFS: over
+        the line's subtree, or over the whole root for the full rebuild.
+        """
+        state = self.with_context(
+            changed_line_id=line.id,
+            new_buy_make_value=new_value,
+            parent_branch_name=parent_branch_name,
+        )._get_branch_build_state(skip_structural=True)
+        if subtree_mode:
+            self._build_branch_structure(
+                line, parent_branch.id or False, 1 if parent_branch else 0,
+                parent_branch.root_line_id.id if parent_branch else None, parent_branch_name, state
+            )
+        else:
+            self._build_branch_structure(self.bom_line_ids, None, 0, None, "ROOT", state)
+        return state['next_code_index']
+
     def _cleanup_transition_legacy_data(self, line, root_bom, parent_branch_name=None):
         """
         Surgical cleanup of MOs, POs, and Transfers for a specific BOM line path.
@@ -252,19 +581,8 @@ class MrpBom(models.Model):
         self.ensure_one()
         Branch = self.env['mrp.bom.line.branch']
         Component = self.env['mrp.bom.line.branch.components']
-        Assignment = self.env['mrp.bom.line.branch.assignment']
-        
-        # Find the parent branch ID from existing assignments for this line
-        assign_domain = [('root_bom_id', '=', root_bom.id), ('bom_line_id', '=', line.id)]
-        if parent_branch_name:
-            if parent_branch_name == "ROOT":
-                assign_domain.append(('branch_id', '=', False))
-            else:
-                assign_domain.append(('branch_id.branch_name', '=', parent_branch_name))
-        
-        assign = Assignment.search(assign_domain, limit=1)
-        # Guard against stale references to already-deleted branch records
-        parent_branch_id = assign.branch_id.id if (assign and assign.branch_id.exists()) else False
+
+        parent_branch_id = self._get_transition_parent_branch(line, root_bom, parent_branch_name).id or False
 
         results = {'mos': [], 'pos': [], 'transfers': []}
 
@@ -319,15 +637,13 @@ class MrpBom(models.Model):
                 ('origin', '=', origin),
                 ('location_dest_id', 'child_of', root_bom.cfe_project_location_id.id),
             ])
-            for picking in done_pickings:
-                for move in picking.move_ids:
-                    if move.quantity > 0:
-                        reversed_trans = self.env['mrp.bom.line']._create_reverse_transfer_to_free(move, root_bom)
-                        if reversed_trans:
-                            _logger.info(f"  ↩ Created reverse transfer for component: {reversed_trans.name}")
-                            results['transfers'].append({'transfer_name': reversed_trans.name, 'product': line.product_id.display_name, 'reversed': True})
-                # Remove root_bom_id link as requested by user to prevent duplicate reversal
-                picking.write({'root_bom_id': False})
+            reversed_pickings = self.env['mrp.bom.line']._create_reverse_transfers_to_free(
+                done_pickings.mapped('move_ids'), root_bom
+            )
+            for reversed_trans in set(reversed_pickings.values()):
+                results['transfers'].append({'transfer_name': reversed_trans.name, 'product': line.product_id.display_name, 'reversed': True})
+            # Remove root_bom_id link as requested by user to prevent duplicate reversal
+            done_pickings.write({'root_bom_id': False})
 
         return results
 
@@ -379,9 +695,8 @@ class MrpBom(models.Model):
             
         message = "\n".join(msg_parts)
         
-        self.env['bus.bus']._sendone(
+        self.env['cr.mrp.bom.helpers']._queue_notification(
             self.env.user.partner_id,
-            "simple_notification",
             {
                 "title": title,
                 "message": message,
@@ -400,26 +715,22 @@ class MrpBom(models.Model):
         Branch = self.env['mrp.bom.line.branch']
         Component = self.env['mrp.bom.line.branch.components']
         Assignment = self.env['mrp.bom.line.branch.assignment']
-        codes = _generate_branch_codes()
-        
+
         # Check for UI-Only mode (Refresh Management UI without touching backend structure)
         ui_only = self.env.context.get('sync_ui_only')
         skip_structural = self.env.context.get('skip_structural_recompute') or ui_only
 
-        PartObj = self.env['mrp.mechanical.part']
-        
         for root_bom in self:
             if self.env.context.get('skip_branch_recompute'):
                 continue
-                
-            # selection_cache should pull from STABLE Management UI records
-            selection_cache = {}
-            existing_parts = PartObj.search([('root_bom_id', '=', root_bom.id)])
-            for part in existing_parts:
-                if part.buy_make_selection:
-                    selection_cache[(part.parent_branch_name, part.bom_line_id.id)] = part.buy_make_selection
+            if not root_bom._lock_roots_or_defer('branches'):
+                continue
 
+            state = root_bom._get_branch_build_state(skip_structural=skip_structural)
             if not skip_structural:
+                # Branch locations survive the purge and are reused per BOM line path
+                state['location_pool'] = root_bom._get_branch_location_pool()
+
                 # PURGE STRUCTURE (Backend models only)
                 _logger.info(f"Rebuilding Structure for ROOT BOM: {root_bom.display_name}")
                 Assignment.search([('root_bom_id', '=', root_bom.id)]).unlink()
@@ -427,275 +738,391 @@ class MrpBom(models.Model):
                 Branch.search([('bom_id', '=', root_bom.id)]).unlink()
 
             # 3. REBUILD DFS (with Mechanical Sync)
-            current_idx_ptr = 0
-            root_location_id = root_bom.cfe_project_location_id.id if root_bom.cfe_project_location_id else False
-            mechanical_sync_data = []
-
-            # Extract context for targeted selection overrides
-            changed_line_id = self.env.context.get('changed_line_id')
-            new_buy_make_value = self.env.context.get('new_buy_make_value')
-            target_parent_name = self.env.context.get('parent_branch_name', "ROOT")
-
-            def dfs(current_bom, parent_branch_id, depth, current_root_line_id=None, parent_branch_name="ROOT"):
-                nonlocal current_idx_ptr
-
-                for line in current_bom.bom_line_ids:
-                    if not line.product_id: continue
-
-                    is_buy_prod = line.product_id.manufacture_purchase == 'buy'
-                    child_bom = line.child_bom_id or root_bom._get_first_created_bom(line.product_id)
-                    matches_context = (changed_line_id and line.id == changed_line_id and target_parent_name == parent_branch_name)
-
-                    if matches_context:
-                        current_selection = new_buy_make_value
-                    elif (parent_branch_name, line.id) in selection_cache:
-                        current_selection = selection_cache[(parent_branch_name, line.id)]
-                    else:
-                        if child_bom and not is_buy_prod:
-                            current_selection = getattr(line, 'buy_make_selection', False)
-                        else:
-                            current_selection = getattr(line, 'buy_make_selection', 'buy')
-
-                    is_mech_categ = line.product_id.categ_id.mech
-                    is_component = (current_selection == 'buy' or not (child_bom or is_mech_categ) or is_buy_prod)
-                    
-                    if depth == 0: current_root_line_id = line.id
-
-                    path_key = f"{root_bom.id}_{line.id}_{parent_branch_name}"
-                    sync_vals = {
-                        'path_key': path_key,
-                        'bom_id': current_bom.id,
-                        'bom_line_id': line.id,
-                        'parent_branch_name': parent_branch_name,
-                        'selection': current_selection or '',
-                        'is_buy_make_product': True, # We already filtered for buy_make
-                    }
+            root_bom._build_branch_structure(root_bom.bom_line_ids, None, 0, None, "ROOT", state)
+            if not skip_structural:
+                # Full rebuild renumbers from A; incremental EVR assignment continues from here
+                root_bom._set_next_branch_code_index(state['next_code_index'])
 
-                    if is_component:
-                        # 1. LEGACY COMPONENT RECORD
-                        if not skip_structural:
-                            comp = Component.create({
-                                'root_bom_id': root_bom.id,
-                                'bom_id': current_bom.id,
-                                'cr_bom_line_id': line.id,
-                                'bom_line_branch_id': parent_branch_id,
-                                'buy_make_selection': current_selection,
-                                'root_line_id': current_root_line_id,
-                                'is_direct_component': not bool(parent_branch_id),
-                                'location_id': root_location_id, # Always use root loc
-                            })
-
-                            Assignment.create({
-                                'root_bom_id': root_bom.id, 'bom_id': current_bom.id, 'bom_line_id': line.id,
-                                'branch_id': parent_branch_id, 'own_branch_id': False, 'component_id': comp.id,
-                                'root_line_id': current_root_line_id,
-                            })
-                        
-                        sync_vals.update({
-                            'part_type': 'component',
-                            'branch_name': False,
-                        })
-                    else:
-                        # 2. LEGACY BRANCH RECORD
-                        code = codes[current_idx_ptr]
-                        current_idx_ptr += 1
-
-                        if not skip_structural:
-                            loc = self.env['stock.location'].create({
-                                'name': code, 'location_id': root_location_id, 'usage': 'internal',
-                            })
-                            branch_vals = {
-                                'bom_id': root_bom.id, 'bom_line_id': line.id, 'branch_name': code,
-                                'sequence': current_idx_ptr, 'path_uid': uuid.uuid4().hex, 'location_id': loc.id,
-                                'parent_branch_id': parent_branch_id, 'root_line_id': current_root_line_id,
-                            }
-                            if current_selection == 'make':
-                                branch_vals['buy_make_selection'] = 'make'
-                            branch = Branch.create(branch_vals)
-
-                            Assignment.create({
-                                'root_bom_id': root_bom.id, 'bom_id': current_bom.id, 'bom_line_id': line.id,
-                                'branch_id': parent_branch_id, 'own_branch_id': branch.id, 'component_id': False,
-                                'root_line_id': current_root_line_id,
-                            })
-                        else:
-                            # In Read-Only / UI-Only mode, we don't create or search for branches in the backend
-                            branch = False 
-                        
-                        sync_vals.update({
-                            'part_type': 'branch',
-                            'branch_name': code,
-                        })
-
-                    # 3. MO SYNC DATA (Strict UI Filter)
-                    # USER REQUEST: ONLY sync to Management UI if is 'buy_make'
-                    if line.product_id.manufacture_purchase == 'buy_make':
-                        mos = self.env['mrp.production'].search([
-                            ('root_bom_id', '=', root_bom.id),
-                            ('line', '=', str(line.id)),
-                            ('state', '!=', 'cancel')
-                        ])
-                        # Link MOs to branch if we are in structural mode
-                        if not is_component and branch:
-                             mos.write({'branch_mapping_id': branch.id})
-                             
-                        sync_vals['mo_ids'] = mos.ids
-                        mechanical_sync_data.append(sync_vals)
-                    else:
-                        # Link MOs to branch if they happen to exist but aren't buy_make (and we have a branch)
-                        if not is_component and branch:
-                            self.env['mrp.production'].search([
-                                ('root_bom_id', '=', root_bom.id),
-                                ('line', '=', str(line.id)),
-                                ('state', '!=', 'cancel')
-                            ]).write({'branch_mapping_id': branch.id})
-
-                    # 4. RECURSION (Always recurse through sub-boms if they are set to MAKE)
-                    if not is_component and child_bom:
-                        dfs(child_bom, branch.id if branch else False, depth + 1, current_root_line_id, code)
-
-            dfs(root_bom, None, 0)
-            
             # 4. Synchronize Mechanical Parts
-            self.env['mrp.mechanical.part'].sync_mechanical_parts(root_bom, mechanical_sync_data)
+            self.env['mrp.mechanical.part'].sync_mechanical_parts(root_bom, state['sync_data'])
         return True
 
-    def action_create_child_mos_recursive(self, root_bom=None, parent_mo=None, index="0", level=0, parent_qty=1.0,
-                                          parent_branch_location=None, parent_branch_id=None):
+    def _get_branch_build_state(self, skip_structural=False, next_code_index=0):
         """
-        Create MOs ONLY for BOM lines that have a child BOM and are NOT set to BUY.
-        Modified to correctly handle branch path contexts including parent_branch_id.
+        Settings and accumulators shared by one _build_branch_structure run.
+        selection_cache pulls from STABLE Management UI records.
+        """
+        self.ensure_one()
+        selection_cache = {}
+        for part in self.env['mrp.mechanical.part'].search([('root_bom_id', '=', self.id)]):
+            if part.buy_make_selection:
+                selection_cache[(part.parent_branch_name, part.bom_line_id.id)] = part.buy_make_selection
+
+        # Extract context for targeted selection overrides
+        return {
+            'selection_cache': selection_cache,
+            'skip_structural': skip_structural,
+            'location_pool': {},
+            # Branch id -> BOM line ids from the root down to its line (location pool key)
+            'branch_line_paths': {},
+            'root_location_id': self.cfe_project_location_id.id if self.cfe_project_location_id else False,
+            'next_code_index': next_code_index,
+            'changed_line_id': self.env.context.get('changed_line_id'),
+            'new_buy_make_value': self.env.context.get('new_buy_make_value'),
+            'target_parent_name': self.env.context.get('parent_branch_name', "ROOT"),
+            # Subtree rebuilds only re-attach MOs that lost their branch
+            'relink_orphan_mos_only': False,
+            'sync_data': [],
+        }
+
+    def _build_branch_structure(self, lines, parent_branch_id, depth, current_root_line_id, parent_branch_name, state):
         """
+        DFS over ``lines`` of this root BOM: creates branch/component/assignment
+        records and collects Management UI sync data into ``state``.
+        Shared by the full rebuild and subtree-scoped transitions.
+        """
+        root_bom = self
         Branch = self.env['mrp.bom.line.branch']
+        Component = self.env['mrp.bom.line.branch.components']
+        Assignment = self.env['mrp.bom.line.branch.assignment']
+        Production = self.env['mrp.production']
+        helpers = self.env['cr.mrp.bom.helpers']
 
-        # Get specific branch to start from (if called recursively from a branch change)
-        start_from_branch = self.env.context.get('changed_branch_id')
+        skip_structural = state['skip_structural']
+        selection_cache = state['selection_cache']
+        root_location_id = state['root_location_id']
+        changed_line_id = state['changed_line_id']
 
-        # Get created MOs list from context
-        created_mos_list = self.env.context.get('created_mos_list')
-        if created_mos_list is None:
-            created_mos_list = []
+        for line in lines:
+            if not line.product_id: continue
 
-        if root_bom is None:
-            root_bom = self
+            is_buy_prod = line.product_id.manufacture_purchase == 'buy'
+            child_bom = line.child_bom_id or root_bom._get_first_created_bom(line.product_id)
+            matches_context = (changed_line_id and line.id == changed_line_id and state['target_parent_name'] == parent_branch_name)
 
-        _logger.info(f"{index}  >>> action_create_child_mos_recursive START: parent_branch={parent_branch_id}, root_bom={root_bom.id}")
+            if matches_context:
+                current_selection = state['new_buy_make_value']
+            elif (parent_branch_name, line.id) in selection_cache:
+                current_selection = selection_cache[(parent_branch_name, line.id)]
+            else:
+                if child_bom and not is_buy_prod:
+                    current_selection = getattr(line, 'buy_make_selection', False)
+                else:
+                    current_selection = getattr(line, 'buy_make_selection', 'buy')
 
-        warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.env.company.id)], limit=1)
-        stock_location = warehouse.lot_stock_id if warehouse else False
+            is_mech_categ = line.product_id.categ_id.mech
+            is_component = (current_selection == 'buy' or not (child_bom or is_mech_categ) or is_buy_prod)
 
-        mo = False
-        for line_idx, line in enumerate(self.bom_line_ids):
-            # Check if this line is a component in the context of the current parent branch
-            is_comp = self._should_treat_as_component(line, parent_branch_id=parent_branch_id, root_bom=root_bom)
-            _logger.info(f"{index}      Line Check: {line.id} | is_component={is_comp}")
-            if is_comp:
-                continue
+            if depth == 0: current_root_line_id = line.id
+
+            path_key = f"{root_bom.id}_{line.id}_{parent_branch_name}"
+            sync_vals = {
+                'path_key': path_key,
+                'bom_id': line.bom_id.id,
+                'bom_line_id': line.id,
+                'parent_branch_name': parent_branch_name,
+                'selection': current_selection or '',
+                'is_buy_make_product': True, # We already filtered for buy_make
+            }
+
+            branch = False
+            code = False
+            if is_component:
+                # 1. LEGACY COMPONENT RECORD
+                if not skip_structural:
+                    comp = Component.create({
+                        'root_bom_id': root_bom.id,
+                        'bom_id': line.bom_id.id,
+                        'cr_bom_line_id': line.id,
+                        'bom_line_branch_id': parent_branch_id,
+                        'buy_make_selection': current_selection,
+                        'root_line_id': current_root_line_id,
+                        'is_direct_component': not bool(parent_branch_id),
+                        'location_id': root_location_id, # Always use root loc
+                    })
 
-            if not line.child_bom_id:
-                # Still check if it has a first created BOM as fallback
-                possible_bom = root_bom._get_first_created_bom(line.product_id)
-                if not possible_bom:
-                     continue
-                child_bom = possible_bom
+                    Assignment.create({
+                        'root_bom_id': root_bom.id, 'bom_id': line.bom_id.id, 'bom_line_id': line.id,
+                        'branch_id': parent_branch_id, 'own_branch_id': False, 'component_id': comp.id,
+                        'root_line_id': current_root_line_id,
+                    })
+
+                sync_vals.update({
+                    'part_type': 'component',
+                    'branch_name': False,
+                })
             else:
-                child_bom = line.child_bom_id
+                # 2. LEGACY BRANCH RECORD
+                code = helpers.encode_branch_code(state['next_code_index'])
+                state['next_code_index'] += 1
+
+                if not skip_structural:
+                    line_path = state['branch_line_paths'].get(parent_branch_id, ()) + (line.id,)
+                    loc = root_bom._get_pooled_branch_location(
+                        state['location_pool'], line_path, code, root_location_id
+                    )
+                    branch_vals = {
+                        'bom_id': root_bom.id, 'bom_line_id': line.id, 'branch_name': code,
+                        'sequence': state['next_code_index'], 'path_uid': uuid.uuid4().hex, 'location_id': loc.id,
+                        'parent_branch_id': parent_branch_id, 'root_line_id': current_root_line_id,
+                    }
+                    if current_selection == 'make':
+                        branch_vals['buy_make_selection'] = 'make'
+                    branch = Branch.create(branch_vals)
+                    state['branch_line_paths'][branch.id] = line_path
+
+                    Assignment.create({
+                        'root_bom_id': root_bom.id, 'bom_id': line.bom_id.id, 'bom_line_id': line.id,
+                        'branch_id': parent_branch_id, 'own_branch_id': branch.id, 'component_id': False,
+                        'root_line_id': current_root_line_id,
+                    })
+                # In Read-Only / UI-Only mode, we don't create or search for branches in the backend
 
-            child_qty = float(line.product_qty or 1.0) * parent_qty
-            line_index = f"{index}{line_idx}"
+                sync_vals.update({
+                    'part_type': 'branch',
+                    'branch_name': code,
+                })
 
-            # Find the branch record for this specific path
-            branch_rec = Branch.search([
-                ('bom_id', '=', root_bom.id),
-                ('bom_line_id', '=', line.id),
-                ('parent_branch_id', '=', parent_branch_id)
-            ], limit=1)
+            # 3. MO SYNC DATA (Strict UI Filter)
+            # USER REQUEST: ONLY sync to Management UI if is 'buy_make'
+            is_buy_make = line.product_id.manufacture_purchase == 'buy_make'
+            if is_buy_make or (not is_component and branch):
+                mos = Production.search([
+                    ('root_bom_id', '=', root_bom.id),
+                    ('line', '=', str(line.id)),
+                    ('state', '!=', 'cancel')
+                ])
+                # Link MOs to branch if we are in structural mode
+                if not is_component and branch:
+                    link_mos = mos.filtered(lambda mo: not mo.branch_mapping_id) if state['relink_orphan_mos_only'] else mos
+                    link_mos.write({'branch_mapping_id': branch.id})
+
+                if is_buy_make:
+                    sync_vals['mo_ids'] = mos.ids
+                    state['sync_data'].append(sync_vals)
+
+            # 4. RECURSION (Always recurse through sub-boms if they are set to MAKE)
+            if not is_component and child_bom:
+                root_bom._build_branch_structure(
+                    child_bom.bom_line_ids, branch.id if branch else False, depth + 1,
+                    current_root_line_id, code, state
+                )
 
-            _logger.info(f"{index}      Branch Lookup: line={line.id}, parent={parent_branch_id} => Found={bool(branch_rec)}")
+    def _get_branch_location_pool(self):
+        """
+        Branch locations of this root BOM for a structural rebuild, which renumbers
+        codes from A. Locations of the current branches are keyed by BOM line path
+        (the line ids from the root down to the branch line), so each one goes back
+        to the branch of the same line with whatever stock it holds. Other tagged
+        locations, archived ones included, are only kept as spares when they hold
+        no stock and no move.
+        """
+        self.ensure_one()
+        Location = self.env['stock.location'].with_context(active_test=False)
+        branches = self.env['mrp.bom.line.branch'].search([('bom_id', '=', self.id)])
 
-            if not branch_rec:
+        paths = {}
+        for branch in branches:
+            if not branch.location_id:
                 continue
+            line_ids = []
+            node = branch
+            while node:
+                line_ids.append(node.bom_line_id.id)
+                node = node.parent_branch_id
+            paths.setdefault(tuple(reversed(line_ids)), branch.location_id)
+
+        linked = Location.browse([location.id for location in paths.values()])
+        unlinked = Location.search(
+            [('branch_root_bom_id', '=', self.id), ('id', 'not in', linked.ids)], order='active desc, id asc'
+        )
+        spare = unlinked - unlinked._get_locations_in_use()
+        return {'paths': paths, 'spare': list(spare)}
 
-            current_branch_location = branch_rec.location_id.id if branch_rec.location_id else False
-            branch_name = branch_rec.branch_name
+    def _get_pooled_branch_location(self, pool, line_path, code, parent_location_id):
+        """
+        Take the location of ``line_path`` (or else an empty spare) out of the pool,
+        renamed/re-parented/unarchived if needed, or create one for ``code``.
+        """
+        self.ensure_one()
+        location = pool.get('paths', {}).pop(line_path, None)
+        if not location and pool.get('spare'):
+            location = pool['spare'].pop(0)
+        if not location:
+            return self.env['stock.location'].create({
+                'name': code,
+                'location_id': parent_location_id,
+                'usage': 'internal',
+                'branch_root_bom_id': self.id,
+            })
+
+        vals = {}
+        if not location.active:
+            vals['active'] = True
+        if location.name != code:
+            vals['name'] = code
+        if location.location_id.id != parent_location_id:
+            vals['location_id'] = parent_location_id
+        if location.branch_root_bom_id != self:
+            vals['branch_root_bom_id'] = self.id
+        if vals:
+            location.write(vals)
+        return location
+
+    def _get_mo_plan_cache(self, root_bom):
+        """
+        Preload everything the MO tree planner needs for ``root_bom`` in a few
+        queries: branches per (line, parent branch) path and draft MOs per
+        (line, branch). First-created BOMs are filled lazily per product.
+        """
+        branches = self.env['mrp.bom.line.branch'].search([('bom_id', '=', root_bom.id)])
+        branch_map = {}
+        for branch in branches:
+            branch_map.setdefault((branch.bom_line_id.id, branch.parent_branch_id.id or False), branch)
 
-            # Determine final destination (parent's branch location or project location)
-            final_dest_location = parent_branch_location if parent_branch_location else root_bom.cfe_project_location_id.id
+        draft_mos = self.env['mrp.production'].search([
+            ('root_bom_id', '=', root_bom.id),
+            ('branch_mapping_id', 'in', branches.ids),
+            ('state', '=', 'draft'),
+        ])
+        draft_mo_map = {}
+        for mo in draft_mos:
+            draft_mo_map.setdefault((mo.line, mo.branch_mapping_id.id), mo)
 
-            # CHECK: Does MO already exist for this branch-line?
-            existing_mo = self.env['mrp.production'].search([
-                ('root_bom_id', '=', root_bom.id),
-                ('line', '=', str(line.id)),
-                ('branch_mapping_id', '=', branch_rec.id),
-                ('state', '=', 'draft')
-            ], limit=1)
-
-            if existing_mo:
-                _logger.info(f"{index}      Updating EXISTING MO: {existing_mo.name} (ID: {existing_mo.id})")
-                existing_mo.write({
-                    'product_qty': child_qty,
-                    'parent_mo_id': parent_mo.id if parent_mo else False,
-                    'cr_final_location_id': final_dest_location if final_dest_location else False,
-                    'branch_intermediate_location_id': current_branch_location
-                })
-                mo = existing_mo
-                if created_mos_list is not None:
-                    created_mos_list.append({
-                        'name': mo.display_name,
-                        'product': mo.product_id.display_name,
-                        'qty': mo.product_qty
+        return {
+            'branches': branch_map,
+            'draft_mos': draft_mo_map,
+            'first_boms': {},
+        }
+
+    def _get_first_created_bom_cached(self, product, plan_cache):
+        """_get_first_created_bom memoized per product inside a planner run."""
+        if product.id not in plan_cache['first_boms']:
+            plan_cache['first_boms'][product.id] = self._get_first_created_bom(product)
+        return plan_cache['first_boms'][product.id]
+
+    def action_create_child_mos_recursive(self, root_bom=None, parent_mo=None, index="0", level=0, parent_qty=1.0,
+                                          parent_branch_location=None, parent_branch_id=None):
+        """
+        Create MOs ONLY for BOM lines that have a child BOM and are NOT set to BUY.
+        The MO tree is planned in memory and materialized level by level:
+        one create(vals_list) per level and grouped writes for existing draft MOs.
+        """
+        if root_bom is None:
+            if not self._lock_roots_or_defer('mos'):
+                return []
+            root_bom = self
+
+        # Get created MOs list from context
+        created_mos_list = self.env.context.get('created_mos_list')
+        if created_mos_list is None:
+            created_mos_list = []
+
+        Production = self.env['mrp.production']
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('mo_plan')
+        plan_cache = self._get_mo_plan_cache(root_bom)
+        project_location_id = root_bom.cfe_project_location_id.id
+        # Optional restriction of the first level to some lines (subtree regeneration)
+        scope_line_ids = self.env.context.get('mo_scope_line_ids')
+
+        # Node: (bom, parent MO, parent qty, parent branch location, parent branch id)
+        current_level = [(self, parent_mo or Production, parent_qty, parent_branch_location, parent_branch_id)]
+        mo = Production
+        depth = level
+        while current_level:
+            next_level = []
+            new_vals_list = []
+            new_nodes = []
+            updates = defaultdict(lambda: Production)
+
+            for bom, node_parent_mo, node_qty, node_location, node_branch_id in current_level:
+                for line in bom.bom_line_ids:
+                    if scope_line_ids and depth == level and line.id not in scope_line_ids:
+                        continue
+                    # Check if this line is a component in the context of the current parent branch
+                    if self._should_treat_as_component(
+                        line, parent_branch_id=node_branch_id, root_bom=root_bom, plan_cache=plan_cache
+                    ):
+                        continue
+
+                    child_bom = line.child_bom_id or self._get_first_created_bom_cached(line.product_id, plan_cache)
+                    if not child_bom:
+                        continue
+
+                    # Find the branch record for this specific path
+                    branch_rec = plan_cache['branches'].get((line.id, node_branch_id or False))
+                    if not branch_rec:
+                        continue
+
+                    child_qty = float(line.product_qty or 1.0) * node_qty
+                    current_branch_location = branch_rec.location_id.id or False
+                    # Final destination: parent's branch location or project location
+                    final_dest_location = node_location or project_location_id or False
+
+                    existing_mo = plan_cache['draft_mos'].get((str(line.id), branch_rec.id))
+                    if existing_mo:
+                        update_key = (child_qty, node_parent_mo.id or False, final_dest_location, current_branch_location)
+                        updates[update_key] |= existing_mo
+                        next_level.append((child_bom, existing_mo, child_qty, current_branch_location, branch_rec.id))
+                        continue
+
+                    new_vals_list.append({
+                        'product_id': child_bom.product_id.id or child_bom.product_tmpl_id.product_variant_id.id,
+                        'product_uom_id': child_bom.product_uom_id.id,
+                        'product_qty': child_qty,
+                        'bom_id': child_bom.id,
+                        'root_bom_id': root_bom.id,
+                        'parent_mo_id': node_parent_mo.id or False,
+                        'project_id': root_bom.project_id.id,
+                        'line': str(line.id),
+                        'cr_final_location_id': final_dest_location,
+                        'state': 'draft',
+                        'branch_mapping_id': branch_rec.id,
+                        'branch_intermediate_location_id': current_branch_location,
                     })
-            else:
-                mo_vals = {
-                    'product_id': child_bom.product_id.id or child_bom.product_tmpl_id.product_variant_id.id,
-                    'product_uom_id': child_bom.product_uom_id.id,
-                    'product_qty': child_qty,
-                    'bom_id': child_bom.id,
-                    'root_bom_id': root_bom.id,
-                    'parent_mo_id': parent_mo.id if parent_mo else False,
-                    'project_id': root_bom.project_id.id,
-                    'line': str(line.id),
-                    'cr_final_location_id': final_dest_location if final_dest_location else False,
-                    'state': 'draft',
-                    'branch_mapping_id': branch_rec.id,
-                    'branch_intermediate_location_id': current_branch_location
-                }
+                    new_nodes.append((child_bom, child_qty, current_branch_location, branch_rec.id))
+
+            # Existing draft MOs sharing the same target values are written together
+            for (qty, parent_id, final_location, branch_location), mos in updates.items():
+                mos.write({
+                    'product_qty': qty,
+                    'parent_mo_id': parent_id,
+                    'cr_final_location_id': final_location,
+                    'branch_intermediate_location_id': branch_location,
+                })
+            updated_mos = Production.concat(*updates.values()) if updates else Production
 
-                _logger.info(f"{index}      Creating NEW MO for branch {branch_rec.id} (BOM: {child_bom.id}) | Qty: {child_qty}")
-                mo = self.env['mrp.production'].with_context(
-                    branch_intermediate_location=current_branch_location,
-                    branch_final_location=final_dest_location,
+            created_mos = Production
+            if new_vals_list:
+                created_mos = Production.with_context(
                     skip_component_moves=True,
                     force_skip_component_moves=True,
                     created_mos_list=created_mos_list
-                ).create(mo_vals)
-
-            # RECURSE: Create MOs for this child's sub-BOMs
-            child_bom.action_create_child_mos_recursive(
-                parent_mo=mo,
-                parent_branch_id=branch_rec.id,
-                level=level + 1,
-                index=f"{line_index}.",
-                parent_qty=child_qty,
-                parent_branch_location=current_branch_location,
-                root_bom=root_bom
-            )
-
-            if hasattr(self.__class__, '_branch_assignment_cache'):
-                if cache_key in self.__class__._branch_assignment_cache:
-                    del self.__class__._branch_assignment_cache[cache_key]
+                ).create(new_vals_list)
+                for (child_bom, child_qty, branch_location, branch_id), new_mo in zip(new_nodes, created_mos):
+                    next_level.append((child_bom, new_mo, child_qty, branch_location, branch_id))
+
+            for level_mo in updated_mos | created_mos:
+                created_mos_list.append({
+                    'name': level_mo.display_name,
+                    'product': level_mo.product_id.display_name,
+                    'qty': level_mo.product_qty
+                })
 
+            trace.summary(
+                "MO plan level", level=depth, root_bom=root_bom.id,
+                updated=len(updated_mos), created=len(created_mos),
+            )
+            if updated_mos or created_mos:
+                mo = (updated_mos | created_mos)[-1]
+            current_level = next_level
+            depth += 1
 
-        # Return list at root level, single MO object for recursion
+        # Return list at root level, last MO object for nested calls
         if level == 0:
-            # Always return as list format
             return created_mos_list
-
-        # For recursive calls, return the single MO object (last one created in this level)
         return mo
 
-
-
     def action_verify_branch_assignment(self):
         """Debug action to verify branch assignment"""
         self.ensure_one()
@@ -745,6 +1172,13 @@ class MrpBom(models.Model):
         # Normal flow
         return super(MrpBom, self)._check_all_children_approved(line)
 
+    def _get_line_subtree_approved(self, line, child_approved=None, child_bom=None):
+        """BUY-selected lines need no child MO, so they never block the roll-up."""
+        if (line.product_id.manufacture_purchase == 'buy_make' and
+                getattr(line, 'buy_make_selection', None) == 'buy'):
+            return True
+        return super()._get_line_subtree_approved(line, child_approved=child_approved, child_bom=child_bom)
+
     @api.model_create_multi
     def create(self, vals_list):
         boms = super().create(vals_list)
@@ -913,9 +1347,8 @@ class MrpBom(models.Model):
             final_name = self.env['stock.location'].browse(
                 final_dest_location).display_name if final_dest_location else "N/A"
 
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 self.env.user.partner_id,
-                "simple_notification",
                 {
                     "title": "Manufacturing Order Created",
                     "message": (
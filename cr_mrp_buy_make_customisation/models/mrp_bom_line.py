@@ -20,6 +20,10 @@ class MrpBomLine(models.Model):
         for line in self:
             line.is_buy_make_product = line.product_id.manufacture_purchase == 'buy_make'
 
+    def _get_subtree_approval_fields(self):
+        """BUY lines are approved by definition, so the selection feeds the roll-up too."""
+        return super()._get_subtree_approval_fields() | {'buy_make_selection'}
+
 
     def _find_actual_root_bom(self, line):
         """Find root by traversing upward through parent BOMs"""
@@ -123,256 +127,121 @@ class MrpBomLine(models.Model):
 
         return check_recursive(bom)
 
-    def _cleanup_related_mos(self, line, root_bom):
-        """Cancel and delete all MOs related to this line and its children recursively"""
-        MO = self.env['mrp.production']
-
-        def recursive_mo_cleanup(bom_line):
-            """Recursively find and delete MOs"""
-            # Find MOs for this line
-            mos = MO.search([
-                ('root_bom_id', '=', root_bom.id),
-                ('line', '=', str(bom_line.id)),
-                ('state', '=', 'draft')
-            ])
-
-            if mos:
-                mos.action_cancel()
-                mos.unlink()
-
-            # Recurse into child BOM
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_mo_cleanup(child_line)
-
-        # Start recursive cleanup
-        recursive_mo_cleanup(line)
+    # ─────────────────────────────────────────────
+    # Line subtree collection
+    # ─────────────────────────────────────────────
+    def _get_line_subtree(self, lines):
+        """
+        ``lines`` and every line reachable below them through ``child_bom_id``.
+        Resolved one BOM level at a time, so each level costs a single batched read.
+        """
+        subtree = self.env['mrp.bom.line']
+        visited_boms = set()
+        level = lines
+        while level:
+            subtree |= level
+            child_boms = level.mapped('child_bom_id').filtered(lambda b: b.id not in visited_boms)
+            visited_boms.update(child_boms.ids)
+            level = child_boms.mapped('bom_line_ids') - subtree
+        return subtree
+
+    def _collect_line_subtree(self, lines, root_bom, include=(), mo_states=('draft',)):
+        """
+        Collect the records hanging off a line subtree under ``root_bom``.
 
-    def _find_child_mos_recursive(self, bom, root_bom):
-        """Recursively find all child MOs"""
-        MO = self.env['mrp.production']
-        all_mos = self.env['mrp.production']
+        Descendant line ids are resolved once; every requested record type is then
+        fetched with a single ``in`` query. ``include`` selects among
+        'mos', 'components', 'branches', 'po_lines' and 'pickings'.
+        """
+        subtree = self._get_line_subtree(lines)
+        line_ids = subtree.ids
+        data = {'lines': subtree}
 
-        for line in bom.bom_line_ids:
-            line_mos = MO.search([
+        if 'mos' in include:
+            domain = [
                 ('root_bom_id', '=', root_bom.id),
-                ('line', '=', str(line.id)),
-                ('state', '=', 'draft')
-            ])
-            all_mos |= line_mos
-
-            if line.child_bom_id:
-                all_mos |= self._find_child_mos_recursive(line.child_bom_id, root_bom)
-
-        return all_mos
-
-    def _cleanup_branch_records(self, line, root_bom):
-        """Delete branch and component records for this line and all descendants recursively"""
-        Branch = self.env['mrp.bom.line.branch']
-        Component = self.env['mrp.bom.line.branch.components']
-        Location = self.env['stock.location']
-
-        def recursive_cleanup(bom_line):
-            """Recursively clean up branches and components"""
-            _logger.info(f"Cleaning up line {bom_line.product_id.display_name}")
-
-            # Delete ALL component records for this line (both direct and branch-linked)
-            all_components = Component.search([
+                ('line', 'in', [str(line_id) for line_id in line_ids]),
+            ]
+            if mo_states:
+                domain.append(('state', 'in', list(mo_states)))
+            data['mos'] = self.env['mrp.production'].search(domain)
+
+        if 'components' in include or 'po_lines' in include:
+            data['components'] = self.env['mrp.bom.line.branch.components'].search([
                 ('root_bom_id', '=', root_bom.id),
-                ('cr_bom_line_id', '=', bom_line.id)
+                ('cr_bom_line_id', 'in', line_ids),
             ])
 
-            if all_components:
-                _logger.info(f"Deleting {len(all_components)} component records")
-                all_components.unlink()
-
-            # Delete branches for this line
-            branches = Branch.search([
+        if 'branches' in include:
+            data['branches'] = self.env['mrp.bom.line.branch'].search([
                 ('bom_id', '=', root_bom.id),
-                ('bom_line_id', '=', bom_line.id)
+                ('bom_line_id', 'in', line_ids),
             ])
 
-            if branches:
-                _logger.info(f"Deleting {len(branches)} branch records")
-
-                # Store locations to delete later
-                locations_to_delete = branches.mapped('location_id')
-
-                # Delete branches first
-                branches.unlink()
-
-                # Delete unused locations
-                for loc in locations_to_delete:
-                    if loc and loc.exists():
-                        # Check if location is still referenced
-                        other_branches = Branch.search([('location_id', '=', loc.id)], limit=1)
-                        other_components = Component.search([('location_id', '=', loc.id)], limit=1)
+        if 'po_lines' in include:
+            data['po_lines'] = self.env['purchase.order.line'].search([
+                ('component_branch_id', 'in', data['components'].ids),
+                ('bom_id', '=', root_bom.id),
+            ]) if data['components'] else self.env['purchase.order.line']
 
-                        if not other_branches and not other_components:
-                            quants = self.env['stock.quant'].search([('location_id', '=', loc.id)], limit=1)
-                            moves = self.env['stock.move'].search([
-                                '|',
-                                ('location_id', '=', loc.id),
-                                ('location_dest_id', '=', loc.id)
-                            ], limit=1)
+        if 'pickings' in include:
+            data['pickings'] = self.env['stock.picking'].search([
+                ('root_bom_id', '=', root_bom.id),
+                ('state', 'in', ['draft', 'waiting', 'confirmed', 'assigned', 'done']),
+                ('location_dest_id', 'child_of', root_bom.cfe_project_location_id.id),
+                ('origin', '=', f"EVR Flow - {root_bom.display_name}"),
+            ])
 
-                            if not quants and not moves:
-                                _logger.info(f"Deleting unused location {loc.display_name}")
-                                loc.unlink()
+        return data
 
-            # Recurse into child BOM
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup(child_line)
+    def _cleanup_related_mos(self, line, root_bom):
+        """Cancel and delete all draft MOs related to this line and its children"""
+        self._collect_line_subtree(line, root_bom, include=('mos',))['mos']._cancel_and_unlink_with_summary()
 
-        recursive_cleanup(line)
+    def _find_child_mos_recursive(self, bom, root_bom):
+        """Find all draft MOs for the lines of ``bom`` and their descendants"""
+        return self._collect_line_subtree(bom.bom_line_ids, root_bom, include=('mos',))['mos']
 
     def _delete_child_components_recursive(self, bom, root_bom):
-        """Recursively delete components for child BOMs"""
-        Component = self.env['mrp.bom.line.branch.components']
-
-        for line in bom.bom_line_ids:
-            Component.search([
-                ('root_bom_id', '=', root_bom.id),
-                ('cr_bom_line_id', '=', line.id)
-            ]).unlink()
-
-            if line.child_bom_id:
-                self._delete_child_components_recursive(line.child_bom_id, root_bom)
+        """Delete components for the lines of ``bom`` and their descendants"""
+        self._collect_line_subtree(bom.bom_line_ids, root_bom, include=('components',))['components'].unlink()
 
     def _get_all_components_for_line(self, line, root_bom):
         """Get all component records for this line and its children"""
-        Component = self.env['mrp.bom.line.branch.components']
-        all_components = self.env['mrp.bom.line.branch.components']
-
-        # Get components for this line
-        components = Component.search([
-            ('root_bom_id', '=', root_bom.id),
-            ('cr_bom_line_id', '=', line.id)
-        ])
-        all_components |= components
-
-        # Get components for children if BOM exists
-        if line.child_bom_id:
-            for child_line in line.child_bom_id.bom_line_ids:
-                all_components |= self._get_all_components_for_line(child_line, root_bom)
-
-        return all_components
+        return self._collect_line_subtree(line, root_bom, include=('components',))['components']
 
     def _cleanup_manufacturing_orders(self, line, root_bom):
         """Cancel and delete manufacturing orders - returns list of deleted MOs"""
-        deleted_mos = []
-
-        def recursive_cleanup_mos(bom_line):
-            nonlocal deleted_mos
-            line = bom_line.id
-            mos = self.env['mrp.production'].search([
-                ('line', '=', line),
-                ('product_id', '=', bom_line.product_id.id),
-                ('root_bom_id', '=', root_bom.id),
-                ('state', 'in', ['draft', 'confirmed', 'progress']),
-            ])
-
-            if mos:
-                for mo in mos:
-                    deleted_mos.append({
-                        'name': mo.name,
-                        'product': mo.product_id.display_name
-                    })
-                    _logger.info(f"  ✗ Deleting MO: {mo.name} for {mo.product_id.display_name}")
-
-                mos.action_cancel()
-                mos.unlink()
-
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup_mos(child_line)
-
-        recursive_cleanup_mos(line)
-        return deleted_mos
-
-    def _cleanup_purchase_orders(self, line, root_bom):
-        """Cancel purchase orders - returns list of deleted PO lines"""
-        deleted_pos = []
-
-        def recursive_cleanup_pos(bom_line):
-            nonlocal deleted_pos
-
-            po_lines = self.env['purchase.order.line'].search([
-                ('product_id', '=', bom_line.product_id.id),
-                ('order_id.state', 'in', ['draft', 'sent', 'to approve']),
-                ('bom_id','=',root_bom.id)
-            ])
-
-            for po_line in po_lines:
-                pickings = po_line.order_id.picking_ids
-
-                if pickings:
-                    deleted_pos.append({
-                        'po_name': po_line.order_id.name,
-                        'product': bom_line.product_id.display_name
-                    })
-                    _logger.info(f"  ✗ Deleting PO line from {po_line.order_id.name}")
-                    po_line.unlink()
-
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup_pos(child_line)
-
-        recursive_cleanup_pos(line)
-        return deleted_pos
+        data = self._collect_line_subtree(
+            line, root_bom, include=('mos',), mo_states=('draft', 'confirmed', 'progress'),
+        )
+        product_by_line = {str(l.id): l.product_id.id for l in data['lines']}
+        mos = data['mos'].filtered(lambda mo: product_by_line.get(mo.line) == mo.product_id.id)
 
+        return mos._cancel_and_unlink_with_summary()
 
     def _cleanup_branch_records(self, line, root_bom):
         """Delete branch and component records - returns counts"""
-        Branch = self.env['mrp.bom.line.branch']
-        Component = self.env['mrp.bom.line.branch.components']
-
-        total_branches = 0
-        total_components = 0
-
-        def recursive_cleanup(bom_line):
-            nonlocal total_branches, total_components
-
-            components = Component.search([
-                ('root_bom_id', '=', root_bom.id),
-                ('cr_bom_line_id', '=', bom_line.id)
-            ])
-
-            if components:
-                total_components += len(components)
-                _logger.info(f"  ✗ Deleting {len(components)} component(s)")
-                components.unlink()
-
-            branches = Branch.search([
-                ('bom_id', '=', root_bom.id),
-                ('bom_line_id', '=', bom_line.id)
-            ])
+        data = self._collect_line_subtree(line, root_bom, include=('components', 'branches'))
+        components = data['components']
+        branches = data['branches']
 
-            if branches:
-                total_branches += len(branches)
-                _logger.info(f"  ✗ Deleting {len(branches)} branch(es)")
+        if components:
+            _logger.info("  ✗ Deleting %s component(s)", len(components))
+            components.unlink()
 
-                locations = branches.mapped('location_id')
-                branches.unlink()
+        if branches:
+            _logger.info("  ✗ Deleting %s branch(es)", len(branches))
 
-                for loc in locations:
-                    if loc and loc.exists():
-                        if not Branch.search([('location_id', '=', loc.id)], limit=1) and \
-                                not Component.search([('location_id', '=', loc.id)], limit=1):
-                            if not self.env['stock.quant'].search([('location_id', '=', loc.id)], limit=1) and \
-                                    not self.env['stock.move'].search(
-                                        ['|', ('location_id', '=', loc.id), ('location_dest_id', '=', loc.id)],
-                                        limit=1):
-                                _logger.info(f"  ✗ Deleting location: {loc.complete_name}")
-                                loc.unlink()
+            locations = branches.mapped('location_id')
+            branches.unlink()
 
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup(child_line)
+            deletable = locations.exists() - locations._get_locations_in_use()
+            if deletable:
+                _logger.info("  ✗ Deleting location(s): %s", ', '.join(deletable.mapped('complete_name')))
+                deletable.unlink()
 
-        recursive_cleanup(line)
-        return total_branches, total_components
+        return len(branches), len(components)
 
 
     def _cleanup_stock_pickings(self, line, root_bom):
@@ -380,58 +249,41 @@ class MrpBomLine(models.Model):
         cancelled_transfers = []
         reversed_transfers = []
 
-        def recursive_cleanup_pickings(bom_line):
-            nonlocal cancelled_transfers, reversed_transfers
-
-            origin = f"EVR Flow - {root_bom.display_name}"
-            pickings = self.env['stock.picking'].search([
-                ('root_bom_id', '=', root_bom.id),
-                ('state', 'in', ['draft', 'waiting', 'confirmed', 'assigned']),
-                ('location_dest_id', 'child_of', root_bom.cfe_project_location_id.id),
-                ('origin', '=', origin)
-            ])
+        data = self._collect_line_subtree(line, root_bom, include=('pickings',))
+        product_by_line = {l.id: l.product_id for l in data['lines']}
 
-            for picking in pickings:
-                moves = picking.move_ids.filtered(lambda m: m.product_id.id == bom_line.product_id.id
-                                                            and m.mrp_bom_line_id.id == bom_line.id
-                                                  )
-                if moves:
-                    cancelled_transfers.append({
-                        'transfer_name': picking.name,
-                        'product': bom_line.product_id.display_name
-                    })
-                    _logger.info(f"  ✗ Cancelling transfer: {picking.name}")
-                    picking.action_cancel()
-
-            # Find done pickings that transferred to branch - create reverse
-            origin = f"EVR Flow - {root_bom.display_name}"
-            done_pickings = self.env['stock.picking'].search([
-                ('root_bom_id', '=', root_bom.id),
-                ('state', '=', 'done'),
-                ('location_dest_id', 'child_of', root_bom.cfe_project_location_id.id),
-                ('origin', '=', origin)
-            ])
+        def subtree_moves(picking):
+            return picking.move_ids.filtered(
+                lambda m: m.mrp_bom_line_id.id in product_by_line
+                and m.product_id == product_by_line[m.mrp_bom_line_id.id]
+            )
 
-            for picking in done_pickings:
-                moves = picking.move_ids.filtered(lambda m: m.product_id.id == bom_line.product_id.id
-                                                            and m.mrp_bom_line_id.id == bom_line.id
-                                                  )
-                if moves:
-                    for move in moves:
-                        if move.quantity > 0:
-                            reversed = self._create_reverse_transfer_to_free(move, root_bom)
-                            if reversed:
-                                reversed_transfers.append({
-                                    'transfer_name': reversed.name,
-                                    'product': bom_line.product_id.display_name,
-                                    'qty': move.quantity
-                                })
-
-            if bom_line.child_bom_id:
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup_pickings(child_line)
-
-        recursive_cleanup_pickings(line)
+        pickings_to_cancel = self.env['stock.picking']
+        for picking in data['pickings'].filtered(lambda p: p.state != 'done'):
+            moves = subtree_moves(picking)
+            if moves:
+                cancelled_transfers.append({
+                    'transfer_name': picking.name,
+                    'product': moves[0].product_id.display_name
+                })
+                _logger.info("  ✗ Cancelling transfer: %s", picking.name)
+                pickings_to_cancel |= picking
+        if pickings_to_cancel:
+            pickings_to_cancel.action_cancel()
+
+        # Done pickings that transferred to a branch get a reverse transfer
+        done_moves = self.env['stock.move']
+        for picking in data['pickings'].filtered(lambda p: p.state == 'done'):
+            done_moves |= subtree_moves(picking)
+        reversed_by_move = self._create_reverse_transfers_to_free(done_moves, root_bom)
+        for move in done_moves:
+            reversed = reversed_by_move.get(move.id)
+            if reversed:
+                reversed_transfers.append({
+                    'transfer_name': reversed.name,
+                    'product': move.product_id.display_name,
+                    'qty': move.quantity
+                })
 
         # Combine results
         all_transfers = cancelled_transfers + [{
@@ -445,7 +297,20 @@ class MrpBomLine(models.Model):
 
     def _create_reverse_transfer_to_free(self, original_move, root_bom):
         """Create reverse transfer from branch to FREE location"""
-        # Find FREE location
+        return self._create_reverse_transfers_to_free(original_move, root_bom).get(original_move.id, False)
+
+    def _create_reverse_transfers_to_free(self, moves, root_bom):
+        """
+        Return the quantities of done ``moves`` to the FREE location.
+
+        Moves are grouped by (source location, owner) into one multi-move picking
+        per group; all pickings are confirmed and assigned together, then validated one by one.
+        Returns a dict mapping each reversed move id to its return picking.
+        """
+        moves = moves.filtered(lambda m: m.quantity > 0)
+        if not moves:
+            return {}
+
         free_location = self.env['stock.location'].search([
             ('location_category', '=', 'free'),
             ('usage', '=', 'internal')
@@ -453,7 +318,7 @@ class MrpBomLine(models.Model):
 
         if not free_location:
             _logger.warning("No FREE location found for reverse transfer")
-            return False
+            return {}
 
         picking_type = self.env['stock.picking.type'].search([
             ('code', '=', 'internal'),
@@ -461,30 +326,50 @@ class MrpBomLine(models.Model):
         ], limit=1)
 
         if not picking_type:
-            return False
-
-
-        picking = self.env['stock.picking'].create({
-            'picking_type_id': picking_type.id,
-            'location_id': original_move.location_dest_id.id,
-            'location_dest_id': original_move.location_id.id,
-            'origin': "reverse transfer of evr",
-            'move_ids': [(0, 0, {
-                'name': original_move.product_id.display_name,
-                'product_id': original_move.product_id.id,
-                'product_uom_qty': original_move.quantity,
-                'product_uom': original_move.product_uom.id,
-                'location_id': original_move.location_dest_id.id,
+            return {}
+
+        groups = {}
+        for move in moves:
+            key = (move.location_dest_id.id, move.restrict_partner_id.id)
+            groups.setdefault(key, self.env['stock.move'])
+            groups[key] |= move
+
+        vals_list = []
+        for (source_location_id, owner_id), group_moves in groups.items():
+            vals_list.append({
+                'picking_type_id': picking_type.id,
+                'location_id': source_location_id,
                 'location_dest_id': free_location.id,
-            })]
-        })
-
-        picking.action_confirm()
-        picking.action_assign()
-        picking.button_validate()
+                'owner_id': owner_id or False,
+                'origin': "reverse transfer of evr",
+                'move_ids': [(0, 0, {
+                    'name': move.product_id.display_name,
+                    'product_id': move.product_id.id,
+                    'product_uom_qty': move.quantity,
+                    'product_uom': move.product_uom.id,
+                    'location_id': source_location_id,
+                    'location_dest_id': free_location.id,
+                    'restrict_partner_id': owner_id or False,
+                }) for move in group_moves]
+            })
+
+        pickings = self.env['stock.picking'].create(vals_list)
+        pickings.action_confirm()
+        pickings.action_assign()
+        # Validate one by one: a partly reserved picking must not turn the whole set
+        # into a single backorder wizard and leave every return unvalidated
+        for picking in pickings:
+            picking.button_validate()
 
-        _logger.info(f"  ↩ Created reverse transfer: {picking.name}")
-        return picking
+        _logger.info(
+            "  ↩ Created %s reverse transfer(s) for %s move(s): %s",
+            len(pickings), len(moves), ', '.join(pickings.mapped('name'))
+        )
+        return {
+            move.id: picking
+            for picking, group_moves in zip(pickings, groups.values())
+            for move in group_moves
+        }
 
 
     def _cleanup_purchase_orders(self, line, root_bom):
@@ -494,130 +379,48 @@ class MrpBomLine(models.Model):
 
         _logger.info("START _cleanup_purchase_orders | line=%s root_bom=%s", line.id, root_bom.id)
 
-        def recursive_cleanup_pos(bom_line):
-            nonlocal deleted_pos, confirmed_pos
-
-            # Find ALL component branches for this BOM line
-            component_branches = self.env['mrp.bom.line.branch.components'].search([
-                ('cr_bom_line_id', '=', bom_line.id),
-                ('root_bom_id', '=', root_bom.id)
-            ])
-
-            _logger.info(
-                "Found %s component branches for BOM line %s",
-                len(component_branches), bom_line.id
-            )
-
-            for component in component_branches:
-                # Find CFE PO lines (customer POs)
-                cfe_po_lines = self.env['purchase.order.line'].search([
-                    ('component_branch_id', '=', component.id),
-                    ('bom_id', '=', root_bom.id),
-                    ('order_id.cfe', '=', True),
-                ])
-
-                _logger.info(
-                    "Component %s: Found %s CFE PO lines",
-                    component.id, len(cfe_po_lines)
-                )
-
-                for po_line in cfe_po_lines:
-                    po = po_line.order_id
-                    _logger.info(
-                        "Processing CFE PO line %s in %s (state=%s)",
-                        po_line.id, po.name, po.state
-                    )
-
-                    if po.state in ['draft', 'sent', 'to approve']:
-                        deleted_pos.append({
-                            'po_name': po.name,
-                            'product': bom_line.product_id.display_name,
-                            'type': 'CFE'
-                        })
-                        _logger.info("  ✗ Deleting CFE PO line %s from %s", po_line.id, po.name)
-
-                        # Remove the line
-                        po_line.unlink()
-
-                        # If PO has no more lines, delete the PO
-                        if not po.order_line:
-                            po_name = po.name
-                            po.button_cancel()
-                            po.unlink()
-                            _logger.info("  ✗ Deleted empty PO %s", po_name)
-
-                    elif po.state in ['purchase', 'done']:
-                        confirmed_pos.append({
-                            'po_name': po.name,
-                            'product': bom_line.product_id.display_name,
-                            'vendor': po.partner_id.name,
-                            'type': 'CFE'
-                        })
-                        _logger.info(
-                            "  ✓ Confirmed CFE PO line %s in %s (vendor: %s)",
-                            po_line.id, po.name, po.partner_id.name
-                        )
-
-                # Find regular PO lines (vendor POs)
-                vendor_po_lines = self.env['purchase.order.line'].search([
-                    ('component_branch_id', '=', component.id),
-                    ('bom_id', '=', root_bom.id),
-                    ('order_id.cfe', '=', False),
-                ])
-
+        po_lines = self._collect_line_subtree(line, root_bom, include=('po_lines',))['po_lines']
+        _logger.info("Found %s PO lines for the subtree of BOM line %s", len(po_lines), line.id)
+
+        lines_to_delete = self.env['purchase.order.line']
+        # CFE (customer) PO lines first, then vendor PO lines
+        for po_line in po_lines.sorted(lambda l: not l.order_id.cfe):
+            po = po_line.order_id
+            po_type = 'CFE' if po.cfe else 'Vendor'
+            product_name = po_line.component_branch_id.cr_bom_line_id.product_id.display_name
+
+            if po.state in ['draft', 'sent', 'to approve']:
+                deleted_pos.append({
+                    'po_name': po.name,
+                    'product': product_name,
+                    'type': po_type
+                })
+                _logger.info("  ✗ Deleting %s PO line %s from %s", po_type, po_line.id, po.name)
+                lines_to_delete |= po_line
+
+            elif po.state in ['purchase', 'done']:
+                confirmed_pos.append({
+                    'po_name': po.name,
+                    'product': product_name,
+                    'vendor': po.partner_id.name,
+                    'type': po_type
+                })
                 _logger.info(
-                    "Component %s: Found %s vendor PO lines",
-                    component.id, len(vendor_po_lines)
+                    "  ✓ Confirmed %s PO line %s in %s (vendor: %s)",
+                    po_type, po_line.id, po.name, po.partner_id.name
                 )
 
-                for po_line in vendor_po_lines:
-                    po = po_line.order_id
-                    _logger.info(
-                        "Processing vendor PO line %s in %s (state=%s)",
-                        po_line.id, po.name, po.state
-                    )
-
-                    if po.state in ['draft', 'sent', 'to approve']:
-                        deleted_pos.append({
-                            'po_name': po.name,
-                            'product': bom_line.product_id.display_name,
-                            'type': 'Vendor'
-                        })
-                        _logger.info("  ✗ Deleting vendor PO line %s from %s", po_line.id, po.name)
-
-                        # Remove the line
-                        po_line.unlink()
-
-                        # If PO has no more lines, delete the PO
-                        if not po.order_line:
-                            po_name = po.name
-                            po.button_cancel()
-                            po.unlink()
-                            _logger.info("  ✗ Deleted empty PO %s", po_name)
-
-                    elif po.state in ['purchase', 'done']:
-                        confirmed_pos.append({
-                            'po_name': po.name,
-                            'product': bom_line.product_id.display_name,
-                            'vendor': po.partner_id.name,
-                            'type': 'Vendor'
-                        })
-                        _logger.info(
-                            "  ✓ Confirmed vendor PO line %s in %s (vendor: %s)",
-                            po_line.id, po.name, po.partner_id.name
-                        )
-
-            # Recurse into child BOM if exists
-            if bom_line.child_bom_id:
-                _logger.info(
-                    "Recursing into child BOM %s for line %s",
-                    bom_line.child_bom_id.id, bom_line.id
-                )
-                for child_line in bom_line.child_bom_id.bom_line_ids:
-                    recursive_cleanup_pos(child_line)
+        if lines_to_delete:
+            orders = lines_to_delete.mapped('order_id')
+            lines_to_delete.unlink()
 
-        # Start recursion from the line being changed
-        recursive_cleanup_pos(line)
+            # Orders left without lines are cancelled and removed as well
+            empty_orders = orders.filtered(lambda po: not po.order_line)
+            if empty_orders:
+                empty_names = empty_orders.mapped('name')
+                empty_orders.button_cancel()
+                empty_orders.unlink()
+                _logger.info("  ✗ Deleted empty PO(s) %s", ', '.join(empty_names))
 
         # Notify purchase admin if confirmed POs exist
         if confirmed_pos:
@@ -649,9 +452,8 @@ class MrpBomLine(models.Model):
             message += f"  ... and {len(confirmed_pos) - 10} more\n"
 
         for user in purchase_admin_group.users:
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 user.partner_id,
-                'simple_notification',
                 {
                     'title': 'MAKE → BUY: Confirmed POs Require Review',
                     'message': message,
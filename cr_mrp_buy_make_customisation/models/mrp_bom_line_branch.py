@@ -9,91 +9,31 @@ class MrpBomLineBranch(models.Model):
     def _should_consider_location(self, location, bom_line=None):
         """
         Override to include TAPY locations for MECH category products.
-        Check if a location should be considered by checking itself and then its parent chain.
         Returns True if:
         1. The location (or ancestor) is marked as 'free', OR
         2. Product has MECH category AND location (or ancestor) is marked as 'tapy'
         """
         if not location:
             return False
-
-            # Check if product has MECH category
         product = bom_line.product_id if bom_line else False
         is_mech_product = product and product.categ_id and product.categ_id.mech
 
-        location_fields = self.env['stock.location']._fields
-        use_boolean_field = 'free_to_use' in location_fields
-
-        cur = location
-        while cur:
-            # Check if current location is free or tapy
-            is_free = False
-            is_tapy = False
-
-            if use_boolean_field:
-                try:
-                    is_free = bool(cur.free_to_use)
-                except Exception:
-                    pass
-            else:
-                try:
-                    location_cat = getattr(cur, 'location_category', False)
-                    is_free = location_cat == 'free'
-                    is_tapy = location_cat == 'tapy'
-                except Exception:
-                    pass
-
-            # If free location found, always consider it
-            if is_free:
-                return True
-
-            # If TAPY location and product is MECH category, consider it
-            if is_tapy and is_mech_product:
-                return True
+        is_free, is_tapy = self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id]
+        return is_free or bool(is_tapy and is_mech_product)
 
-            # Move to parent and continue checking
-            cur = cur.location_id
-
-        # No matching location found in the entire parent chain
-        return False
-
-    @api.depends(
-        'bom_line_id.product_id',
-        'bom_line_id.product_id.stock_quant_ids',
-        'bom_line_id.product_id.stock_quant_ids.quantity',
-        'bom_line_id.product_id.stock_quant_ids.reserved_quantity',
-        'bom_line_id.product_id.stock_quant_ids.location_id',
-        'bom_line_id.product_id.stock_quant_ids.location_id.location_category',
-        'bom_line_id.product_id.stock_quant_ids.location_id.location_id.location_category'
-    )
+    @api.depends('bom_line_id.product_id')
     def _compute_free_to_use(self):
-        StockQuant = self.env['stock.quant']
-
+        snapshot = self.env['cr.mrp.bom.helpers']._get_free_stock_snapshot(
+            self.mapped('bom_line_id.product_id').ids
+        )
         for rec in self:
-            rec.free_to_use = 0.0
-            if not rec.bom_line_id or not rec.bom_line_id.product_id:
-                continue
-
             product = rec.bom_line_id.product_id
-            bom_line = rec.bom_line_id  # Store for this specific record
-
-            # Search for quants with positive quantity
-            quants = StockQuant.search([
-                ('product_id', '=', product.id),
-                ('quantity', '>', 0),
-                ('owner_id', '=', False),
-            ])
-
-            total_qty = 0.0
-
-            # Check each location that has stock and calculate available quantity
-            for quant in quants:
-                # Calculate available quantity (quantity - reserved_quantity)
-                available_qty = quant.quantity - quant.reserved_quantity
-                if available_qty > 0 and rec._should_consider_location(quant.location_id, bom_line):
-                    total_qty += available_qty
-
-            rec.free_to_use = float(total_qty)
+            if not product:
+                rec.free_to_use = 0.0
+                continue
+            stock = snapshot[product.id]
+            is_mech_product = product.categ_id and product.categ_id.mech
+            rec.free_to_use = float(stock['free'] + (stock['tapy'] if is_mech_product else 0.0))
 
     buy_make_selection = fields.Selection([
         ('buy', 'BUY'),
@@ -133,78 +73,25 @@ class MrpBomLineBranch(models.Model):
             new_value=new_value
         )
 
+    def _get_branch_subtree(self):
+        """These branches and all their descendant branches (single parent_path query)."""
+        if not self:
+            return self
+        return self.env['mrp.bom.line.branch'].search([('id', 'child_of', self.ids)])
+
     def _cleanup_branch_manufacturing_orders(self, root_bom):
-        """Cancel and delete MOs linked to this branch and its descendants (Recursive)"""
-        deleted_mos = []
-        
-        # Find MOs for this specific branch
+        """Cancel and delete MOs linked to this branch and its descendants"""
+        # MOs of the whole branch subtree in one query, cancelled and deleted as a set
         mos = self.env['mrp.production'].search([
-            ('branch_mapping_id', '=', self.id),
+            ('branch_mapping_id', 'child_of', self.id),
             ('root_bom_id', '=', root_bom.id),
             ('state', 'in', ['draft', 'confirmed', 'progress']),
         ])
-        
-        for mo in mos:
-            deleted_mos.append({
-                'name': mo.name, 
-                'product': mo.product_id.display_name,
-                'state': mo.state
-            })
-            _logger.info(f"  ✗ Deleting branch MO: {mo.name} (State: {mo.state})")
-            mo.action_cancel()
-            mo.unlink()
-
-        # Recurse into child branches
-        child_branches = self.env['mrp.bom.line.branch'].search([('parent_branch_id', '=', self.id)])
-        for child in child_branches:
-            deleted_mos.extend(child._cleanup_branch_manufacturing_orders(root_bom))
-            
-        return deleted_mos
+        return mos._cancel_and_unlink_with_summary('branch MO')
 
     def _cleanup_branch_purchase_orders(self, root_bom):
-        """Cancel PO lines linked to component branches under this branch hierarchy (Recursive)"""
-        deleted_pos = []
-        confirmed_pos = []
-        
-        # Component branches directly under this branch
-        components = self.env['mrp.bom.line.branch.components'].search([
-            ('bom_line_branch_id', '=', self.id),
-            ('root_bom_id', '=', root_bom.id)
-        ])
-        
-        for comp in components:
-            # Handle both CFE and regular Vendor POs
-            po_lines = self.env['purchase.order.line'].search([
-                ('component_branch_id', '=', comp.id),
-                ('bom_id', '=', root_bom.id),
-            ])
-            for po_line in po_lines:
-                po = po_line.order_id
-                if po.state in ['draft', 'sent', 'to approve']:
-                    deleted_pos.append({
-                        'po_name': po.name, 
-                        'product': po_line.product_id.display_name,
-                        'type': 'CFE' if po.cfe else 'Vendor'
-                    })
-                    _logger.info(f"  ✗ Deleting branch PO line from {po.name}")
-                    po_line.unlink()
-                    if not po.order_line:
-                        po.button_cancel()
-                        po.unlink()
-                elif po.state in ['purchase', 'done']:
-                    confirmed_pos.append({
-                        'po_name': po.name,
-                        'product': po_line.product_id.display_name,
-                        'vendor': po.partner_id.name,
-                        'type': 'CFE' if po.cfe else 'Vendor'
-                    })
-
-        # Recurse into descendant branches
-        child_branches = self.env['mrp.bom.line.branch'].search([('parent_branch_id', '=', self.id)])
-        for child in child_branches:
-            res_deleted, res_confirmed = child._cleanup_branch_purchase_orders_recursive_data(root_bom)
-            deleted_pos.extend(res_deleted)
-            confirmed_pos.extend(res_confirmed)
+        """Cancel PO lines linked to component branches under this branch hierarchy"""
+        deleted_pos, confirmed_pos = self._cleanup_branch_purchase_orders_recursive_data(root_bom)
 
         # Notify purchase admin about confirmed POs if switching to BUY
         if confirmed_pos and self.buy_make_selection == 'buy':
@@ -213,42 +100,37 @@ class MrpBomLineBranch(models.Model):
         return deleted_pos
 
     def _cleanup_branch_purchase_orders_recursive_data(self, root_bom):
-        """Helper for recursive PO data collection without immediate notification"""
+        """PO data collection for the whole branch subtree without immediate notification"""
         deleted_pos = []
         confirmed_pos = []
         components = self.env['mrp.bom.line.branch.components'].search([
-            ('bom_line_branch_id', '=', self.id),
+            ('bom_line_branch_id', 'child_of', self.id),
             ('root_bom_id', '=', root_bom.id)
         ])
-        for comp in components:
-            po_lines = self.env['purchase.order.line'].search([
-                ('component_branch_id', '=', comp.id),
-                ('bom_id', '=', root_bom.id),
-            ])
-            for po_line in po_lines:
-                po = po_line.order_id
-                if po.state in ['draft', 'sent', 'to approve']:
-                    deleted_pos.append({
-                        'po_name': po.name, 
-                        'product': po_line.product_id.display_name,
-                        'type': 'CFE' if po.cfe else 'Vendor'
-                    })
-                    po_line.unlink()
-                    if not po.order_line:
-                        po.button_cancel()
-                        po.unlink()
-                elif po.state in ['purchase', 'done']:
-                    confirmed_pos.append({
-                        'po_name': po.name,
-                        'product': po_line.product_id.display_name,
-                        'vendor': po.partner_id.name,
-                        'type': 'CFE' if po.cfe else 'Vendor'
-                    })
-        child_branches = self.env['mrp.bom.line.branch'].search([('parent_branch_id', '=', self.id)])
-        for child in child_branches:
-            res_deleted, res_confirmed = child._cleanup_branch_purchase_orders_recursive_data(root_bom)
-            deleted_pos.extend(res_deleted)
-            confirmed_pos.extend(res_confirmed)
+        po_lines = self.env['purchase.order.line'].search([
+            ('component_branch_id', 'in', components.ids),
+            ('bom_id', '=', root_bom.id),
+        ]) if components else self.env['purchase.order.line']
+        for po_line in po_lines:
+            po = po_line.order_id
+            if po.state in ['draft', 'sent', 'to approve']:
+                deleted_pos.append({
+                    'po_name': po.name, 
+                    'product': po_line.product_id.display_name,
+                    'type': 'CFE' if po.cfe else 'Vendor'
+                })
+                _logger.info(f"  ✗ Deleting branch PO line from {po.name}")
+                po_line.unlink()
+                if not po.order_line:
+                    po.button_cancel()
+                    po.unlink()
+            elif po.state in ['purchase', 'done']:
+                confirmed_pos.append({
+                    'po_name': po.name,
+                    'product': po_line.product_id.display_name,
+                    'vendor': po.partner_id.name,
+                    'type': 'CFE' if po.cfe else 'Vendor'
+                })
         return deleted_pos, confirmed_pos
 
     def _notify_purchase_admin_for_branch(self, confirmed_pos):
@@ -270,9 +152,8 @@ class MrpBomLineBranch(models.Model):
             message += f"  ... and {len(confirmed_pos) - 10} more\n"
 
         for user in purchase_admin_group.users:
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 user.partner_id,
-                'simple_notification',
                 {
                     'title': 'MAKE → BUY: Branch Hierarchy Review Required',
                     'message': message,
@@ -286,22 +167,6 @@ class MrpBomLineBranch(models.Model):
         results = []
         origin = f"EVR Flow - {root_bom.display_name}"
         
-        # Gather all descendant component lines
-        def get_all_descendant_lines(branch):
-            lines = []
-            components = self.env['mrp.bom.line.branch.components'].search([
-                ('bom_line_branch_id', '=', branch.id),
-                ('root_bom_id', '=', root_bom.id)
-            ])
-            lines.extend(components.mapped('cr_bom_line_id.id'))
-            
-            child_branches = self.env['mrp.bom.line.branch'].search([('parent_branch_id', '=', branch.id)])
-            for child in child_branches:
-                lines.extend(get_all_descendant_lines(child))
-            return lines
-
-        descendant_line_ids = get_all_descendant_lines(self)
-
         # 1. Cancel pending transfers related to any descendant component
         pickings = self.env['stock.picking'].search([
             ('root_bom_id', '=', root_bom.id),
@@ -322,45 +187,39 @@ class MrpBomLineBranch(models.Model):
             ('origin', '=', origin)
         ])
 
-        for picking in done_pickings:
-            for move in picking.move_ids:
-                if move.quantity > 0:
-                    reversed_trans = self.env['mrp.bom.line']._create_reverse_transfer_to_free(move, root_bom)
-                    if reversed_trans:
-                        _logger.info(f"  ↩ Created reverse transfer for branch descendant: {reversed_trans.name}")
-                        results.append({
-                            'transfer_name': reversed_trans.name,
-                            'product': move.product_id.display_name,
-                            'qty': move.quantity,
-                            'reversed': True
-                        })
-            # Remove link to prevent double-reversal as requested by user
-            picking.write({'root_bom_id': False})
+        done_moves = done_pickings.mapped('move_ids')
+        reversed_by_move = self.env['mrp.bom.line']._create_reverse_transfers_to_free(done_moves, root_bom)
+        for move in done_moves:
+            reversed_trans = reversed_by_move.get(move.id)
+            if reversed_trans:
+                results.append({
+                    'transfer_name': reversed_trans.name,
+                    'product': move.product_id.display_name,
+                    'qty': move.quantity,
+                    'reversed': True
+                })
+        # Remove link to prevent double-reversal as requested by user
+        done_pickings.write({'root_bom_id': False})
 
         return results
 
     def _cleanup_descendant_branch_records(self, root_bom):
-        """Delete descendant branch and component records (Recursive)"""
-        total_branches = 0
-        total_components = 0
-        
-        # Clean up components directly under this branch
+        """Delete descendant branch and component records of the whole subtree"""
+        descendants = self._get_branch_subtree() - self
+
+        # Components under this branch and every descendant branch
         components = self.env['mrp.bom.line.branch.components'].search([
-            ('bom_line_branch_id', '=', self.id),
+            ('bom_line_branch_id', 'child_of', self.id),
             ('root_bom_id', '=', root_bom.id)
         ])
+        total_components = len(components)
         if components:
-            total_components += len(components)
             _logger.info(f"  ✗ Deleting {len(components)} descendant components")
             components.unlink()
-            
-        # Recurse into child branches
-        child_branches = self.env['mrp.bom.line.branch'].search([('parent_branch_id', '=', self.id)])
-        for child in child_branches:
-            b, c = child._cleanup_descendant_branch_records(root_bom)
-            total_branches += b + 1
-            total_components += c
-            _logger.info(f"  ✗ Deleting descendant branch: {child.branch_name}")
-            child.unlink()
-            
+
+        total_branches = len(descendants)
+        if descendants:
+            _logger.info(f"  ✗ Deleting {total_branches} descendant branches: {', '.join(descendants.mapped('branch_name'))}")
+            descendants.unlink()
+
         return total_branches, total_components
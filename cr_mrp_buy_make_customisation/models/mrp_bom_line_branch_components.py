@@ -5,6 +5,9 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# precommit.data key of the transfer demand planned by _process_purchase_flow
+TRANSFER_DEMAND_PLAN_KEY = 'cr_mrp_buy_make_transfer_demand_plan'
+
 
 class MrpBomLine(models.Model):
     _inherit = 'mrp.bom.line.branch.components'
@@ -68,7 +71,7 @@ class MrpBomLine(models.Model):
                             if not message:
                                 message = _("Branch %s has been automatically approved for manufacture.") % branch.branch_name
                                 
-                            self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
+                            self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
                                 'title': _("Automated Manufacture Approval"),
                                 'message': message,
                                 'sticky': False,
@@ -136,814 +139,576 @@ class MrpBomLine(models.Model):
 
     def _should_consider_location(self, location, bom_line=None):
         """
-        Override to include TAPY locations when buy_make_selection is 'buy'.
-        - If line has buy_make_selection = 'buy': Include FREE + TAPY locations
-        - Otherwise: Include only FREE locations
-
-        Args:
-            location: stock.location record to check
-            bom_line: optional mrp.bom.line record (to avoid recordset issues)
+        Override to include TAPY locations for MECH category products.
+        Returns True if the location (or an ancestor) is FREE, or if it is TAPY
+        and the product of ``bom_line`` has MECH category.
         """
+        if not location:
+            return False
         product = bom_line.product_id if bom_line else False
         is_mech_product = product and product.categ_id and product.categ_id.mech
 
-        location_fields = self.env['stock.location']._fields
-        use_boolean_field = 'free_to_use' in location_fields
-
-        cur = location
-        while cur:
-            # Check if current location is free
-            is_free = False
-            is_tapy = False
-
-            if use_boolean_field:
-                try:
-                    is_free = bool(cur.free_to_use)
-                except Exception:
-                    pass
-            else:
-                try:
-                    location_cat = getattr(cur, 'location_category', False)
-                    is_free = location_cat == 'free'
-                    is_tapy = location_cat == 'tapy'
-                except Exception:
-                    pass
-
-            # If free location found, always consider it
-            if is_free:
-                return True
-
-            # If TAPY location and product is MECH category, consider it
-            if is_tapy and is_mech_product:
-                return True
-
-            # Move to parent and continue checking
-            cur = cur.location_id
+        is_free, is_tapy = self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id]
+        return is_free or bool(is_tapy and is_mech_product)
 
-        # No matching location found in the entire parent chain
-        return False
-
-    @api.depends(
-        'cr_bom_line_id.product_id',
-        'cr_bom_line_id.product_id.stock_quant_ids',
-        'cr_bom_line_id.product_id.stock_quant_ids.quantity',
-        'cr_bom_line_id.product_id.stock_quant_ids.reserved_quantity',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id.location_category',
-        'cr_bom_line_id.product_id.stock_quant_ids.location_id.location_id.location_category'
-    )
+    @api.depends('cr_bom_line_id.product_id')
     def _compute_free_to_use(self):
-        """Override to pass bom_line explicitly to avoid singleton issues"""
-        StockQuant = self.env['stock.quant']
-
+        """Override to count TAPY stock for MECH products, read from the shared snapshot"""
+        snapshot = self.env['cr.mrp.bom.helpers']._get_free_stock_snapshot(
+            self.mapped('cr_bom_line_id.product_id').ids
+        )
         for rec in self:
-            rec.free_to_use = 0.0
-            if not rec.cr_bom_line_id or not rec.cr_bom_line_id.product_id:
-                continue
-
             product = rec.cr_bom_line_id.product_id
-            bom_line = rec.cr_bom_line_id  # Store for this specific record
-
-            # Search for quants with positive quantity
-            quants = StockQuant.search([
-                ('product_id', '=', product.id),
-                ('quantity', '>', 0),
-                ('owner_id', '=', False),
-            ])
-
-            total_qty = 0.0
-
-            # Check each location that has stock and calculate available quantity
-            for quant in quants:
-                # Calculate available quantity (quantity - reserved_quantity)
-                available_qty = quant.quantity - quant.reserved_quantity
-                if available_qty > 0 and rec._should_consider_location(quant.location_id, bom_line):
-                    total_qty += available_qty
-
-            rec.free_to_use = float(total_qty)
+            if not product:
+                rec.free_to_use = 0.0
+                continue
+            stock = snapshot[product.id]
+            is_mech_product = product.categ_id and product.categ_id.mech
+            rec.free_to_use = float(stock['free'] + (stock['tapy'] if is_mech_product else 0.0))
 
-    def _process_purchase_flow(self):
-        """Process purchase flow for this component"""
+    def _is_purchase_flow_ready(self):
+        """Whether the purchase flow applies to this component (approved BUY component not yet consumed)"""
         self.ensure_one()
-
         bom_line = self.cr_bom_line_id
         if not bom_line:
-            return
+            return False
 
         if self.used > 0:
-            return
+            return False
 
         if self.bom_line_branch_id and self.bom_line_branch_id.transferred > 0:
-            return
+            return False
 
         if self.bom_line_branch_id and self.bom_line_branch_id.used > 0:
-            return
+            return False
 
         # Check native buy_make_selection (preventing processing if mistakenly set to make)
         if bom_line.product_id.manufacture_purchase == 'buy_make' and self.buy_make_selection != 'buy':
-            return
+            return False
 
         # # Skip if MAKE is selected (treat as sub-BOM, not component)
         # if bom_line.buy_make_selection == 'make':
         #     return
 
         # Check if approvals are TRUE
-        if not (self.approval_1 and self.approval_2):
+        return bool(self.approval_1 and self.approval_2)
+
+    def _process_purchase_flow(self):
+        """
+        Process purchase flow for these components (e.g. every component of a
+        root BOM). Transfer demand of the whole set is reconciled up front in
+        one pass per flow; the per-component flows then read their planned
+        to-transfer quantity instead of querying stock one component at a time.
+        """
+        components = self.filtered(lambda c: c._is_purchase_flow_ready())
+        if not components:
             return
 
-        if self.cfe_quantity != self.transferred_cfe:
-            self._process_cfe_flow()
+        cfe_components = components.filtered(lambda c: c.cfe_quantity != c.transferred_cfe)
+        regular_components = components.filtered(
+            lambda c: c.cr_bom_line_id.product_qty != c.transferred
+        )
 
-        if bom_line.product_qty != self.transferred:
-            self._process_regular_flow()
+        plan = self.env.cr.precommit.data.setdefault(TRANSFER_DEMAND_PLAN_KEY, {})
+        try:
+            cfe_targets = []
+            for component in cfe_components:
+                customer = component._get_cfe_customer()
+                cfe_qty = float(component.cfe_quantity or 0)
+                if customer and cfe_qty > 0:
+                    cfe_targets.append((component, customer, cfe_qty, component.transferred_cfe))
+            regular_targets = [
+                (component, component._get_transfer_vendor_partner(),
+                 component.cr_bom_line_id.product_qty, component.transferred)
+                for component in regular_components
+            ]
+            for cfe, targets in ((True, cfe_targets), (False, regular_targets)):
+                result = self._reconcile_transfer_demand(targets, cfe=cfe)
+                for component, partner, qty, done in targets:
+                    plan[(component.id, cfe)] = (partner.id, qty, done, result.get(component.id, 0.0))
+
+            for component in components:
+                if component in cfe_components:
+                    component._process_cfe_flow()
+                if component in regular_components:
+                    component._process_regular_flow()
+        finally:
+            self.env.cr.precommit.data.pop(TRANSFER_DEMAND_PLAN_KEY, None)
+
+    def _pop_planned_transfer_demand(self, cfe, partner, qty, transferred):
+        """
+        To-transfer quantity planned for this component by _process_purchase_flow,
+        or None when there is no plan or it was made for other quantities.
+        """
+        self.ensure_one()
+        plan = self.env.cr.precommit.data.get(TRANSFER_DEMAND_PLAN_KEY)
+        if not plan:
+            return None
+        planned = plan.pop((self.id, cfe), None)
+        if not planned or planned[:3] != ((partner.id if partner else False), qty, transferred):
+            return None
+        return planned[3]
+
+    def _get_cfe_customer(self):
+        """Customer furnishing the CFE quantity: the partner of the root BOM's project"""
+        self.ensure_one()
+        project = self.root_bom_id.project_id
+        return project.partner_id if project else False
 
     def _is_tapy_location(self, location):
         """Check if location or any parent is TAPY"""
-        cur = location
-        while cur:
-            try:
-                if getattr(cur, 'location_category', False) == 'tapy':
-                    return True
-            except Exception:
-                pass
-            cur = cur.location_id
-        return False
+        if not location:
+            return False
+        return self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id][1]
 
     def _is_free_location(self, location):
         """Check if location or any parent is FREE"""
-        cur = location
-        while cur:
-            try:
-                if getattr(cur, 'location_category', False) == 'free':
-                    return True
-            except Exception:
-                pass
-            cur = cur.location_id
-        return False
+        if not location:
+            return False
+        return self.env['cr.mrp.bom.helpers']._get_location_stock_flags([location.id])[location.id][0]
+
+    def _send_notification(self, title, message, notif_type='info'):
+        """Queue a transfer notification for the current user (flushed at commit)"""
+        self.env['cr.mrp.bom.helpers']._queue_notification(self.env.user.partner_id, {
+            'title': title,
+            'message': message,
+            'sticky': False,
+            'type': notif_type,
+        })
 
 
     def _calculate_to_transfer_cfe(self, customer, cfe_qty, transferred_cfe):
         """Calculate to transfer CFE quantity and create/update internal transfers"""
-        _logger.info(
-            "START _calculate_to_transfer_cfe | component=%s customer=%s cfe_qty=%s transferred_cfe=%s",
-            self.id, customer.id if customer else None, cfe_qty, transferred_cfe
-        )
-
-        StockMove = self.env["stock.move"]
-        StockQuant = self.env["stock.quant"]
-
-        bom_line = self.cr_bom_line_id
-        _logger.info("BOM line=%s product=%s", bom_line.id if bom_line else None,
-                     bom_line.product_id.id if bom_line else None)
+        self.ensure_one()
+        planned = self._pop_planned_transfer_demand(True, customer, cfe_qty, transferred_cfe)
+        if planned is not None:
+            return planned
+        return self._reconcile_transfer_demand(
+            [(self, customer, cfe_qty, transferred_cfe)], cfe=True
+        ).get(self.id, 0.0)
+
+    def _get_transfer_vendor_partner(self):
+        """Main vendor (or default seller) partner of the component's product"""
+        self.ensure_one()
+        product = self.cr_bom_line_id.product_id
+        vendor = product.seller_ids.filtered(lambda s: s.main_vendor)[:1] or product._select_seller()
+        return vendor.partner_id if vendor else self.env['res.partner']
+
+    # ─────────────────────────────────────────────
+    # Transfer demand reconciliation
+    # ─────────────────────────────────────────────
+    @api.model
+    def _reconcile_transfer_demand(self, targets, cfe=False):
+        """
+        Set-based to-transfer calculation for many components (e.g. all
+        components of a root BOM).
+
+        ``targets`` is a list of ``(component, partner, qty, transferred)``:
+        the customer (CFE) or main vendor, the required quantity and what was
+        already transferred. Waiting pickings, pending moves and source quants
+        are loaded for all components in a few queries, needed/excess is
+        computed in memory, and move updates, unlinks and cancellations are
+        applied as grouped writes. Shortfalls are topped up per component
+        afterwards. Returns {component_id: quantity pending transfer}.
+        """
+        helpers = self.env['cr.mrp.bom.helpers']
+        trace = helpers._get_tracer('transfers')
+        Picking = self.env["stock.picking"]
+        Move = self.env["stock.move"]
+        Quant = self.env["stock.quant"]
+
+        result = {}
+        targets = [t for t in targets if t[0].cr_bom_line_id.product_id]
+        if not targets:
+            return result
 
-        waiting_pickings = self.env["stock.picking"].search([
-            ("partner_id", "=", customer.id),
-            ("picking_type_id.code", "=", 'internal'),
-            ("owner_id", "=", customer.id),
-            ("location_dest_id", "=", self.location_id.id),
-            ("state", "=", "confirmed"),
-        ])
-        _logger.info("Found waiting_pickings=%s", waiting_pickings.ids)
+        components = self.browse([t[0].id for t in targets])
+        product_ids = components.cr_bom_line_id.product_id.ids
+        dest_ids = components.location_id.ids
+        partner_keys = list({partner.id or False for _comp, partner, _qty, _done in targets})
+        partner_ids = [pid for pid in partner_keys if pid]
 
-        if waiting_pickings:
-            for picking in waiting_pickings:
-                _logger.info("Checking waiting picking=%s source_location=%s", picking.name, picking.location_id.id)
-                if self._should_consider_location(picking.location_id, bom_line):
-                    _logger.info("Picking %s source location allowed", picking.name)
+        def owner_of(partner):
+            return (partner.id or False) if cfe else False
 
-                    product_moves = picking.move_ids_without_package.filtered(
-                        lambda m: m.product_id == self.cr_bom_line_id.product_id
-                    )
-                    _logger.info("Product moves in picking %s: %s", picking.name, product_moves.ids)
+        def allowed(component, location):
+            return component._should_consider_location(location, component.cr_bom_line_id)
 
-                    if product_moves:
-                        _logger.info("Cancelling picking %s due to recalculation", picking.name)
-                        picking.action_cancel()
-                        self._send_notification(
+        # ── 1. Cancel waiting transfers so they get recalculated ──────────────
+        cancelled = Picking
+        if partner_ids:
+            waiting = Picking.search([
+                ("picking_type_id.code", "=", 'internal'),
+                ("partner_id", "in", partner_ids),
+                ("location_dest_id", "in", dest_ids),
+                ("state", "=", "confirmed"),
+            ])
+            if cfe:
+                waiting = waiting.filtered(lambda p: p.owner_id == p.partner_id)
+            helpers._get_location_stock_flags(waiting.location_id.ids)
+            waiting_by_key = {}
+            for picking in waiting:
+                waiting_by_key.setdefault((picking.location_dest_id.id, picking.partner_id.id), []).append(picking)
+
+            notices = []
+            for component, partner, _qty, _done in targets:
+                product = component.cr_bom_line_id.product_id
+                for picking in waiting_by_key.get((component.location_id.id, partner.id), []):
+                    if picking in cancelled or not allowed(component, picking.location_id):
+                        continue
+                    if picking.move_ids_without_package.filtered(lambda m: m.product_id == product):
+                        cancelled |= picking
+                        notices.append((component, picking, partner))
+            if cancelled:
+                cancelled.action_cancel()
+                for component, picking, partner in notices:
+                    if cfe:
+                        component._send_notification(
                             "Internal Transfer Cancelled (CFE)",
-                            f"Cancelled waiting transfer {picking.name} for recalculation (Customer: {customer.name})",
+                            f"Cancelled waiting transfer {picking.name} for recalculation (Customer: {partner.name})",
+                            "warning"
+                        )
+                    else:
+                        component._send_notification(
+                            "Internal Transfer Cancelled",
+                            f"Cancelled waiting transfer {picking.name} for recalculation (Vendor: {partner.name})",
                             "warning"
                         )
 
-        pending_moves = StockMove.search([
-            ("product_id", "=", self.cr_bom_line_id.product_id.id),
-            ("location_dest_id", "=", self.location_id.id),
+        # ── 2. Load pending moves and source quants of every component ───────
+        moves = Move.search([
+            ("product_id", "in", product_ids),
+            ("location_dest_id", "in", dest_ids),
             ("state", "not in", ["done", "cancel"]),
-            ("restrict_partner_id", "=", customer.id),
+            ("restrict_partner_id", "in", partner_ids) if cfe else ("restrict_partner_id", "=", False),
         ])
-        _logger.info("Initial pending_moves=%s", pending_moves.ids)
-
-        pending_moves = pending_moves.filtered(
-            lambda m: self._should_consider_location(m.location_id, bom_line)
-        )
-        _logger.info("Filtered pending_moves=%s", pending_moves.ids)
-
-        existing_demand = sum(pending_moves.mapped("product_uom_qty"))
-        _logger.info("Existing demand=%s", existing_demand)
-
-        needed = cfe_qty - transferred_cfe - existing_demand
-        _logger.info("Calculated needed=%s", needed)
-
-        if needed == 0.0:
-            _logger.info("Needed is zero, validating existing moves")
-
-            sorted_moves = pending_moves.sorted(key=lambda m: m.product_uom_qty, reverse=True)
-            return_qty = 0
-            for move in sorted_moves:
-                _logger.info("Checking move=%s qty=%s", move.id, move.product_uom_qty)
-                if move.picking_id.picking_type_id.code == 'internal':
-                    source_location = move.picking_id.location_id
-                    _logger.info("Source location=%s", source_location.id)
-
-                    source_quants = StockQuant.search([
-                        ("product_id", "=", self.cr_bom_line_id.product_id.id),
-                        ("location_id", "=", source_location.id),
-                        ("owner_id", "=", customer.id),
-                        ("quantity", ">", 0),
-                    ])
-                    available_in_source = sum(source_quants.mapped("quantity"))
-                    _logger.info("Available in source=%s", available_in_source)
-
-                    if available_in_source < move.product_uom_qty:
-                        _logger.info(
-                            "Reducing move %s qty from %s to %s",
-                            move.id, move.product_uom_qty, available_in_source
-                        )
-                        move.with_context(bypass_custom_internal_transfer_restrictions=True).write({
-                            'product_uom_qty': available_in_source,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
-                        })
-
-                        needed = cfe_qty - transferred_cfe - available_in_source
-                        _logger.info("Recalculated needed=%s", needed)
+        helpers._get_location_stock_flags(moves.location_id.ids)
+        moves_by_key = {}
+        for move in moves:
+            key = (move.product_id.id, move.location_dest_id.id, move.restrict_partner_id.id or False)
+            moves_by_key.setdefault(key, []).append(move)
+        move_qty = {move.id: move.product_uom_qty for move in moves}
+
+        source_qty = {}
+
+        def load_source_qty(location_ids):
+            missing = [lid for lid in location_ids if lid and lid not in loaded_sources]
+            if not missing:
+                return
+            loaded_sources.update(missing)
+            for product, location, owner, quantity in Quant._read_group([
+                ("product_id", "in", product_ids),
+                ("location_id", "in", missing),
+                ("owner_id", "in", partner_ids) if cfe else ("owner_id", "=", False),
+                ("quantity", ">", 0),
+            ], ['product_id', 'location_id', 'owner_id'], ['quantity:sum']):
+                source_qty[(product.id, location.id, owner.id or False)] = quantity
+
+        loaded_sources = set()
+        load_source_qty(moves.picking_id.location_id.ids)
+
+        # ── 3. Validate / reduce existing demand in memory ───────────────────
+        writes = {}
+        to_unlink = Move
+        removals = []
+        shortfalls = []
+        for component, partner, qty, done in targets:
+            bom_line = component.cr_bom_line_id
+            product = bom_line.product_id
+            owner_id = owner_of(partner)
+            pending = [
+                move for move in moves_by_key.get((product.id, component.location_id.id, owner_id), [])
+                if move not in to_unlink and allowed(component, move.location_id)
+            ]
+            existing_demand = sum(move_qty[move.id] for move in pending)
+            needed = qty - done - existing_demand
+            trace.debug(
+                "Reconcile component=%s product=%s demand=%s needed=%s",
+                component.id, product.id, existing_demand, needed
+            )
 
-                        self._send_notification(
+            if needed == 0.0:
+                return_qty = 0
+                for move in sorted(pending, key=lambda m: move_qty[m.id], reverse=True):
+                    if move.picking_id.picking_type_id.code != 'internal':
+                        continue
+                    available_in_source = source_qty.get((product.id, move.picking_id.location_id.id, owner_id), 0.0)
+                    if available_in_source < move_qty[move.id]:
+                        writes.setdefault((available_in_source, bom_line.id, True), []).append(move)
+                        move_qty[move.id] = available_in_source
+                        partner_label = f"Customer: {partner.name}" if cfe else f"Vendor: {partner.name}"
+                        component._send_notification(
                             "Internal Transfer Updated",
-                            f"Updated {move.picking_id.name}: to {available_in_source} {self.cr_bom_line_id.product_id.uom_id.name} "
-                            f"of {self.cr_bom_line_id.product_id.display_name} (Customer: {customer.name})",
+                            f"Updated {move.picking_id.name}: to {available_in_source} {product.uom_id.name} "
+                            f"of {product.display_name} ({partner_label})",
                             "info"
                         )
-
-                    return_qty = return_qty + move.product_uom_qty
-
-
-            _logger.info("RETURN needed=%s", return_qty)
-            return return_qty
-
-        if needed < 0:
-            _logger.info("Needed < 0, starting reduction flow | needed=%s", needed)
-            reduction_needed = abs(needed)
-
-            sorted_moves = pending_moves.sorted(key=lambda m: m.product_uom_qty, reverse=True)
-
-            for move in sorted_moves:
-                if reduction_needed <= 0:
-                    break
-
-                _logger.info(
-                    "Reducing move=%s qty=%s reduction_needed=%s",
-                    move.id, move.product_uom_qty, reduction_needed
-                )
-
-                if move.product_uom_qty <= reduction_needed:
-                    reduction_qty = move.product_uom_qty
-                    reduction_needed -= reduction_qty
-                    picking = move.picking_id
-                    _logger.info("Removing move=%s from picking=%s", move.id, picking.name)
-                    move.unlink()
-
-                    if not picking.move_ids_without_package:
-                        _logger.info("Removing empty picking=%s", picking.name)
-                        picking.unlink()
-                        self._send_notification(
-                            "Internal Transfer Removed (CFE)",
-                            f"Removed {picking.name}: CFE quantity reduced to {cfe_qty} (Customer: {customer.name})",
-                            "warning"
-                        )
+                    return_qty += move_qty[move.id]
+                result[component.id] = return_qty
+
+            elif needed < 0:
+                reduction_needed = abs(needed)
+                for move in sorted(pending, key=lambda m: move_qty[m.id], reverse=True):
+                    if reduction_needed <= 0:
+                        break
+                    if move_qty[move.id] <= reduction_needed:
+                        reduction_needed -= move_qty[move.id]
+                        to_unlink |= move
+                        removals.append((component, partner, qty, move.picking_id, move_qty[move.id]))
+                        move_qty[move.id] = 0.0
                     else:
-                        self._send_notification(
-                            "Internal Transfer Updated (CFE)",
-                            f"Removed {reduction_qty} {self.cr_bom_line_id.product_id.uom_id.name} from {picking.name}: "
-                            f"CFE quantity reduced to {cfe_qty} (Customer: {customer.name})",
-                            "warning"
-                        )
-                else:
-                    move.product_uom_qty -= reduction_needed
-                    move.mrp_bom_line_id = self.cr_bom_line_id.id
-                    _logger.info(
-                        "Reduced move=%s new_qty=%s",
-                        move.id, move.product_uom_qty
+                        move_qty[move.id] -= reduction_needed
+                        writes.setdefault((move_qty[move.id], bom_line.id, False), []).append(move)
+                        if cfe:
+                            component._send_notification(
+                                "Internal Transfer Updated (CFE)",
+                                f"Reduced {move.picking_id.name}: Decreased by {reduction_needed} {product.uom_id.name} "
+                                f"of {product.display_name}, new CFE quantity: {qty} (Customer: {partner.name})",
+                                "warning"
+                            )
+                        reduction_needed = 0
+                result[component.id] = sum(move_qty[move.id] for move in pending)
+
+            else:
+                result[component.id] = existing_demand
+                shortfalls.append((component, partner, needed))
+
+        # Grouped writes: one per (quantity, BOM line) and one unlink for all removed moves
+        for (quantity, bom_line_id, bypass), grouped in writes.items():
+            grouped = Move.browse([move.id for move in grouped])
+            if bypass:
+                grouped = grouped.with_context(bypass_custom_internal_transfer_restrictions=True)
+            grouped.write({'product_uom_qty': quantity, 'mrp_bom_line_id': bom_line_id})
+
+        if to_unlink:
+            touched_pickings = to_unlink.picking_id
+            picking_names = {picking.id: picking.name for picking in touched_pickings}
+            to_unlink.unlink()
+            empty_pickings = touched_pickings.exists().filtered(lambda p: not p.move_ids_without_package)
+            for component, partner, qty, picking, removed_qty in removals:
+                if not cfe:
+                    component._send_notification("Internal Transfer Updated", f"Quantity reduced to {qty}", "warning")
+                elif picking in empty_pickings:
+                    component._send_notification(
+                        "Internal Transfer Removed (CFE)",
+                        f"Removed {picking_names[picking.id]}: CFE quantity reduced to {qty} (Customer: {partner.name})",
+                        "warning"
                     )
-                    self._send_notification(
+                else:
+                    component._send_notification(
                         "Internal Transfer Updated (CFE)",
-                        f"Reduced {move.picking_id.name}: Decreased by {reduction_needed} {self.cr_bom_line_id.product_id.uom_id.name} "
-                        f"of {self.cr_bom_line_id.product_id.display_name}, new CFE quantity: {cfe_qty} (Customer: {customer.name})",
+                        f"Removed {removed_qty} {component.cr_bom_line_id.product_id.uom_id.name} from "
+                        f"{picking_names[picking.id]}: CFE quantity reduced to {qty} (Customer: {partner.name})",
                         "warning"
                     )
-                    reduction_needed = 0
-
-            existing_demand = sum(pending_moves.exists().mapped("product_uom_qty"))
-            _logger.info("RETURN existing_demand after reduction=%s", existing_demand)
-            return existing_demand
+            empty_pickings.unlink()
 
-        if needed > 0:
-            _logger.info("Needed > 0, creating/updating internal transfers | needed=%s", needed)
-
-            existing_picking = self.env["stock.picking"].search([
-                ("partner_id", "=", customer.id),
+        # ── 4. Top up shortfalls: existing open picking first, then new transfers
+        open_pickings = {}
+        if shortfalls:
+            for picking in Picking.search([
                 ("picking_type_id.code", "=", 'internal'),
-                ("owner_id", "=", customer.id),
-                ("location_dest_id", "=", self.location_id.id),
+                ("partner_id", "in", partner_keys),
+                ("owner_id", "in", partner_ids) if cfe else ("owner_id", "=", False),
+                ("location_dest_id", "in", dest_ids),
                 ("state", "not in", ["done", "cancel"]),
-            ], limit=1)
-            _logger.info("Existing picking=%s", existing_picking.name if existing_picking else None)
-
-            if existing_picking:
-                existing_picking = existing_picking.filtered(
-                    lambda p: self._should_consider_location(p.location_id, bom_line)
-                )
-
-            if existing_picking:
+            ]):
+                if cfe and picking.owner_id != picking.partner_id:
+                    continue
+                open_pickings.setdefault((picking.location_dest_id.id, picking.partner_id.id or False), picking)
+            load_source_qty([picking.location_id.id for picking in open_pickings.values()])
+
+        for component, partner, needed in shortfalls:
+            bom_line = component.cr_bom_line_id
+            product = bom_line.product_id
+            owner_id = owner_of(partner)
+            key = (component.location_id.id, partner.id or False)
+            if key not in open_pickings:
+                # Invalidated by transfers created for a previous component
+                open_pickings[key] = Picking.search([
+                    ("picking_type_id.code", "=", 'internal'),
+                    ("partner_id", "=", partner.id),
+                    ("owner_id", "=", owner_id),
+                    ("location_dest_id", "=", component.location_id.id),
+                    ("state", "not in", ["done", "cancel"]),
+                ], limit=1)
+                load_source_qty(open_pickings[key].location_id.ids)
+            existing_picking = open_pickings[key]
+
+            if existing_picking and allowed(component, existing_picking.location_id):
                 source_location = existing_picking.location_id
-                _logger.info("Using source_location=%s", source_location.id)
-
-                source_quants = StockQuant.search([
-                    ("product_id", "=", self.cr_bom_line_id.product_id.id),
-                    ("location_id", "=", source_location.id),
-                    ("owner_id", "=", customer.id),
-                    ("quantity", ">", 0),
-                ])
-                available_in_source = sum(source_quants.mapped("quantity"))
-                _logger.info("Available in source=%s", available_in_source)
-
+                available_in_source = source_qty.get((product.id, source_location.id, owner_id), 0.0)
+                existing_move = existing_picking.move_ids_without_package.filtered(
+                    lambda m: m.product_id == product
+                )
                 if available_in_source:
-                    existing_move = existing_picking.move_ids_without_package.filtered(
-                        lambda m: m.product_id == self.cr_bom_line_id.product_id
-                    )
-                    available_in_source -= existing_move.product_uom_qty
-                    _logger.info("Adjusted available_in_source=%s", available_in_source)
+                    available_in_source -= sum(existing_move.mapped('product_uom_qty'))
 
                 if available_in_source > 0:
                     transfer_qty = min(needed, available_in_source)
-                    _logger.info("Transfer qty=%s", transfer_qty)
-
-                    existing_move = existing_picking.move_ids_without_package.filtered(
-                        lambda m: m.product_id == self.cr_bom_line_id.product_id
-                    )
-
                     if existing_move:
                         existing_move.with_context(bypass_custom_internal_transfer_restrictions=True).write({
-                            'product_uom_qty': existing_move.product_uom_qty + transfer_qty,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
+                            'product_uom_qty': existing_move[:1].product_uom_qty + transfer_qty,
+                            "mrp_bom_line_id": bom_line.id,
                         })
                     else:
-                        self.env["stock.move"].with_context(bypass_custom_internal_transfer_restrictions=True).create({
-                            "name": self.cr_bom_line_id.product_id.display_name,
-                            "product_id": self.cr_bom_line_id.product_id.id,
+                        Move.with_context(bypass_custom_internal_transfer_restrictions=True).create({
+                            "name": product.display_name,
+                            "product_id": product.id,
                             "product_uom_qty": transfer_qty,
-                            "product_uom": self.cr_bom_line_id.product_id.uom_id.id,
+                            "product_uom": product.uom_id.id,
                             "picking_id": existing_picking.id,
                             "location_id": source_location.id,
-                            "location_dest_id": self.location_id.id,
-                            "restrict_partner_id": customer.id,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
+                            "location_dest_id": component.location_id.id,
+                            "restrict_partner_id": owner_id,
+                            "mrp_bom_line_id": bom_line.id,
                         })
-
-                    existing_picking.origin = f"EVR Flow - {self.root_bom_id.display_name}"
-                    existing_picking.root_bom_id = self.root_bom_id.id
+                    picking_vals = {'root_bom_id': component.root_bom_id.id}
+                    if cfe:
+                        picking_vals['origin'] = f"EVR Flow - {component.root_bom_id.display_name}"
+                    existing_picking.write(picking_vals)
                     existing_picking.action_confirm()
-
-                    existing_demand += transfer_qty
+                    result[component.id] += transfer_qty
                     needed -= transfer_qty
-                    _logger.info("Updated existing_demand=%s remaining_needed=%s", existing_demand, needed)
 
             if needed > 0:
-                _logger.info("Creating multiple internal transfers | needed=%s", needed)
-                total_qty = self._create_multiple_internal_transfers_cfe(customer, needed)
-                existing_demand += total_qty
-                _logger.info("Added total_qty=%s new_existing_demand=%s", total_qty, existing_demand)
-
-        _logger.info("END _calculate_to_transfer_cfe | return=%s", existing_demand)
-        return existing_demand
+                if cfe:
+                    total_qty = component._create_multiple_internal_transfers_cfe(partner, needed)
+                else:
+                    total_qty = component._create_multiple_internal_transfers_regular(partner, needed)
+                result[component.id] += total_qty
+                if total_qty:
+                    open_pickings.pop(key, None)
+
+        trace.summary(
+            "transfer demand" + (" (CFE)" if cfe else ""), components=len(targets),
+            cancelled=len(cancelled), removed=len(to_unlink), updated=sum(len(m) for m in writes.values()),
+            topped_up=len(shortfalls),
+        )
+        return result
 
 
     def _create_multiple_internal_transfers_cfe(self, customer, needed_qty):
         """Override to prioritize TAPY locations for MECH products"""
-        _logger.info(
+        helpers = self.env['cr.mrp.bom.helpers']
+        trace = helpers._get_tracer('transfers')
+        trace.debug(
             "START _create_multiple_internal_transfers_cfe | component=%s customer=%s needed_qty=%s",
             self.id, customer.id if customer else None, needed_qty
         )
 
-        StockQuant = self.env["stock.quant"]
-
         bom_line = self.cr_bom_line_id
-        is_mech_product = bom_line and bom_line.product_id.categ_id and bom_line.product_id.categ_id.mech
-        _logger.info(
+        product = bom_line.product_id
+        is_mech_product = bom_line and product.categ_id and product.categ_id.mech
+        trace.debug(
             "BOM line=%s product=%s is_mech_product=%s",
-            bom_line.id if bom_line else None,
-            bom_line.product_id.id if bom_line else None,
-            is_mech_product
+            bom_line.id if bom_line else None, product.id, is_mech_product
         )
 
-        # Filter quants to only those with available quantity (quantity - reserved_quantity) > 0
-        all_quants = StockQuant.search([
-            ("product_id", "=", bom_line.product_id.id),
-            ("owner_id", "=", customer.id),
-            ("quantity", ">", 0),
-            ("location_id", '!=', self.location_id.id)
-        ]).filtered(lambda q: (q.quantity - q.reserved_quantity) > 0)
-        _logger.info("Found all_quants with availability=%s", all_quants.ids)
-
-        tapy_quants = []
-        free_quants = []
-
-        for quant in all_quants:
-            _logger.info(
-                "Evaluating quant=%s location=%s qty=%s reserved=%s",
-                quant.id, quant.location_id.id, quant.quantity, quant.reserved_quantity
-            )
-
-            if is_mech_product and self._is_tapy_location(quant.location_id):
-                _logger.info("Quant %s is TAPY location", quant.id)
-                if not self._has_pending_transfer_from_location(quant.location_id, customer):
-                    tapy_quants.append(quant)
-                    _logger.info("Added quant %s to tapy_quants", quant.id)
-            elif self._is_free_location(quant.location_id):
-                _logger.info("Quant %s is FREE location", quant.id)
-                if not self._has_pending_transfer_from_location(quant.location_id, customer):
-                    free_quants.append(quant)
-                    _logger.info("Added quant %s to free_quants", quant.id)
+        # Customer-owned stock available per FREE/TAPY source location (shared owner index)
+        stock_by_location = {
+            location_id: qty
+            for location_id, qty in helpers._get_owner_stock_index([customer.id], [product.id])[(customer.id, product.id)].items()
+            if location_id != self.location_id.id and qty > 0
+        }
+        blocked = self._get_pending_transfer_sources(customer, list(stock_by_location))
+        flags = helpers._get_location_stock_flags(list(stock_by_location))
+        trace.debug("Owner stock by location=%s blocked=%s", stock_by_location, blocked)
+
+        tapy_sources = []
+        free_sources = []
+        for location_id, available_qty in stock_by_location.items():
+            if location_id in blocked:
+                continue
+            is_free, is_tapy = flags[location_id]
+            if is_mech_product and is_tapy:
+                tapy_sources.append((location_id, available_qty))
+            elif is_free:
+                free_sources.append((location_id, available_qty))
 
         # Sort each list by AVAILABLE quantity descending
-        tapy_quants.sort(key=lambda q: (q.quantity - q.reserved_quantity), reverse=True)
-        free_quants.sort(key=lambda q: (q.quantity - q.reserved_quantity), reverse=True)
-
-        _logger.info(
-            "TAPY quants (sorted)=%s FREE quants (sorted)=%s",
-            [(q.id, q.quantity - q.reserved_quantity) for q in tapy_quants],
-            [(q.id, q.quantity - q.reserved_quantity) for q in free_quants]
-        )
+        tapy_sources.sort(key=lambda source: source[1], reverse=True)
+        free_sources.sort(key=lambda source: source[1], reverse=True)
+        trace.debug("TAPY sources (sorted)=%s FREE sources (sorted)=%s", tapy_sources, free_sources)
 
         total_qty = 0
         remaining = needed_qty
 
-        # STEP 1: Try to fulfill completely from TAPY locations
-        if is_mech_product and tapy_quants:
-            _logger.info("STEP 1: Attempting to fulfill from TAPY locations | remaining=%s", remaining)
-
-            for quant in tapy_quants:
-                if remaining <= 0:
-                    break
-
-                available_qty = quant.quantity - quant.reserved_quantity
-                transfer_qty = min(available_qty, remaining)
-                _logger.info(
-                    "Creating TAPY transfer | quant=%s available=%s transfer_qty=%s",
-                    quant.id, available_qty, transfer_qty
-                )
-
-                picking = self._create_single_internal_transfer(customer, False, quant.location_id, transfer_qty)
-
-                if picking:
-                    picking.action_confirm()
-                    total_qty += transfer_qty
-                    remaining -= transfer_qty
-
-                    _logger.info(
-                        "Created TAPY picking=%s qty=%s | total_qty=%s remaining=%s",
-                        picking.name, transfer_qty, total_qty, remaining
-                    )
-
-                    self._send_notification(
-                        "Internal Transfer Created (CFE)",
-                        f"Created {picking.name}: {transfer_qty} {bom_line.product_id.uom_id.name} "
-                        f"from TAPY location {quant.location_id.display_name} (Customer: {customer.name})",
-                        "success"
-                    )
-
-        # STEP 2: If still needed, fulfill from FREE locations
-        if remaining > 0 and free_quants:
-            _logger.info("STEP 2: Attempting to fulfill remaining from FREE locations | remaining=%s", remaining)
-
-            for quant in free_quants:
+        # STEP 1: TAPY locations first (MECH products only), STEP 2: FREE locations
+        for label, sources in (('TAPY', tapy_sources), ('FREE', free_sources)):
+            for location_id, available_qty in sources:
                 if remaining <= 0:
                     break
 
-                available_qty = quant.quantity - quant.reserved_quantity
+                location = self.env['stock.location'].browse(location_id)
                 transfer_qty = min(available_qty, remaining)
-                _logger.info(
-                    "Creating FREE transfer | quant=%s available=%s transfer_qty=%s",
-                    quant.id, available_qty, transfer_qty
+                trace.debug(
+                    "Creating %s transfer | location=%s available=%s transfer_qty=%s",
+                    label, location_id, available_qty, transfer_qty
                 )
 
-                picking = self._create_single_internal_transfer(customer, False, quant.location_id, transfer_qty)
+                picking = self._create_single_internal_transfer(customer, False, location, transfer_qty)
 
                 if picking:
                     picking.action_confirm()
+                    helpers._consume_owner_stock(customer.id, product.id, location_id, transfer_qty)
                     total_qty += transfer_qty
                     remaining -= transfer_qty
 
-                    _logger.info(
-                        "Created FREE picking=%s qty=%s | total_qty=%s remaining=%s",
-                        picking.name, transfer_qty, total_qty, remaining
+                    trace.debug(
+                        "Created %s picking=%s qty=%s | total_qty=%s remaining=%s",
+                        label, picking.name, transfer_qty, total_qty, remaining
                     )
 
                     self._send_notification(
                         "Internal Transfer Created (CFE)",
-                        f"Created {picking.name}: {transfer_qty} {bom_line.product_id.uom_id.name} "
-                        f"from FREE location {quant.location_id.display_name} (Customer: {customer.name})",
+                        f"Created {picking.name}: {transfer_qty} {product.uom_id.name} "
+                        f"from {label} location {location.display_name} (Customer: {customer.name})",
                         "success"
                     )
 
-        _logger.info(
-            "END _create_multiple_internal_transfers_cfe | return total_qty=%s",
-            total_qty
+        trace.summary(
+            "CFE transfers", component=self.id, sources=len(stock_by_location),
+            needed=needed_qty, transferred=total_qty,
         )
         return total_qty
 
+    def _get_pending_transfer_sources(self, customer, location_ids):
+        """Subset of ``location_ids`` with an open CFE transfer of this product to the component"""
+        self.ensure_one()
+        if not location_ids:
+            return set()
+        moves = self.env["stock.move"].search([
+            ("product_id", "=", self.cr_bom_line_id.product_id.id),
+            ("picking_id.partner_id", "=", customer.id),
+            ("picking_id.owner_id", "=", customer.id),
+            ("picking_id.picking_type_id.code", "=", 'internal'),
+            ("picking_id.location_id", "in", location_ids),
+            ("picking_id.location_dest_id", "=", self.location_id.id),
+            ("picking_id.state", "not in", ["done", "cancel"]),
+        ])
+        return set(moves.picking_id.location_id.ids)
 
     def _has_pending_transfer_from_location(self, source_location, customer):
         """Check if there's already a pending transfer from this location"""
-        _logger.info(
-            "START _has_pending_transfer_from_location | component=%s source_location=%s customer=%s",
-            self.id,
-            source_location.id if source_location else None,
-            customer.id if customer else None
-        )
-
-        existing_picking = self.env["stock.picking"].search([
-            ("partner_id", "=", customer.id),
-            ("picking_type_id.code", "=", 'internal'),
-            ("owner_id", "=", customer.id),
-            ("location_id", "=", source_location.id),
-            ("location_dest_id", "=", self.location_id.id),
-            ("state", "not in", ["done", "cancel"]),
-        ], limit=1)
-
-        _logger.info(
-            "Existing picking found=%s",
-            existing_picking.name if existing_picking else None
-        )
-
-        if existing_picking:
-            existing_move = existing_picking.move_ids_without_package.filtered(
-                lambda m: m.product_id == self.cr_bom_line_id.product_id
-            )
-            _logger.info(
-                "Existing move found=%s move_ids=%s",
-                bool(existing_move),
-                existing_move.ids
-            )
-
-            result = bool(existing_move)
-            _logger.info("RETURN %s", result)
-            return result
-
-        _logger.info("RETURN False (no existing picking)")
-        return False
+        return source_location.id in self._get_pending_transfer_sources(customer, source_location.ids)
 
 
     def _calculate_to_transfer(self, x_qty, transferred):
         """Calculate to transfer quantity and create/update internal transfers"""
-        _logger.info(
-            "START _calculate_to_transfer | component=%s x_qty=%s transferred=%s",
-            self.id, x_qty, transferred
-        )
-
-        StockMove = self.env["stock.move"]
-        StockQuant = self.env["stock.quant"]
-
-        bom_line = self.cr_bom_line_id
-        _logger.info("BOM line=%s product=%s", bom_line.id if bom_line else None,
-                     bom_line.product_id.id if bom_line else None)
-
-        vendor = (self.cr_bom_line_id.product_id.seller_ids.filtered(lambda s: s.main_vendor)[:1]
-                  or self.cr_bom_line_id.product_id._select_seller())
-        _logger.info("Vendor=%s", vendor.partner_id.id if vendor and vendor.partner_id else None)
-
-        if vendor and vendor.partner_id:
-            waiting_pickings = self.env["stock.picking"].search([
-                ("picking_type_id.code", "=", 'internal'),
-                ("partner_id", "=", vendor.partner_id.id),
-                ("location_dest_id", "=", self.location_id.id),
-                ("state", "=", "confirmed"),
-            ])
-            _logger.info("Waiting pickings=%s", waiting_pickings.ids)
-
-            if waiting_pickings:
-                for picking in waiting_pickings:
-                    _logger.info("Evaluating waiting picking=%s", picking.name)
-                    if self._should_consider_location(picking.location_id, bom_line):
-                        _logger.info("Picking %s source location allowed", picking.name)
-                        product_moves = picking.move_ids_without_package.filtered(
-                            lambda m: m.product_id == self.cr_bom_line_id.product_id
-                        )
-                        _logger.info(
-                            "Picking %s product moves=%s",
-                            picking.name, product_moves.ids
-                        )
-
-                        if product_moves:
-                            picking.action_cancel()
-                            _logger.info("Cancelled picking=%s", picking.name)
-                            self._send_notification(
-                                "Internal Transfer Cancelled",
-                                f"Cancelled waiting transfer {picking.name} for recalculation (Vendor: {vendor.partner_id.name})",
-                                "warning"
-                            )
-
-        pending_moves = StockMove.search([
-            ("product_id", "=", self.cr_bom_line_id.product_id.id),
-            ("location_dest_id", "=", self.location_id.id),
-            ("state", "not in", ["done", "cancel"]),
-            ("restrict_partner_id", "=", False),
-        ])
-        _logger.info("Pending moves (raw)=%s", pending_moves.ids)
-
-        pending_moves = pending_moves.filtered(
-            lambda m: self._should_consider_location(m.location_id, bom_line)
-        )
-        _logger.info("Pending moves (filtered)=%s", pending_moves.ids)
-
-        existing_demand = sum(pending_moves.mapped("product_uom_qty"))
-        _logger.info("Existing demand=%s", existing_demand)
-
-        needed = x_qty - transferred - existing_demand
-        _logger.info("Calculated needed=%s", needed)
-
-        if needed == 0.0:
-            _logger.info("Needed == 0, validating existing transfers")
-
-            sorted_moves = pending_moves.sorted(key=lambda m: m.product_uom_qty, reverse=True)
-            return_qty = 0
-            for move in sorted_moves:
-                if move.picking_id.picking_type_id.code == 'internal':
-                    source_location = move.picking_id.location_id
-                    source_quants = StockQuant.search([
-                        ("product_id", "=", self.cr_bom_line_id.product_id.id),
-                        ("location_id", "=", source_location.id),
-                        ("owner_id", "=", False),
-                        ("quantity", ">", 0),
-                    ])
-                    available_in_source = sum(source_quants.mapped("quantity"))
-                    _logger.info(
-                        "Move=%s available_in_source=%s move_qty=%s",
-                        move.id, available_in_source, move.product_uom_qty
-                    )
-
-                    if available_in_source < move.product_uom_qty:
-                        move.with_context(bypass_custom_internal_transfer_restrictions=True).write({
-                            'product_uom_qty': available_in_source,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
-                        })
-                        needed = x_qty - transferred - available_in_source
-                        _logger.info("Adjusted move=%s new_needed=%s", move.id, needed)
-
-                        self._send_notification(
-                            "Internal Transfer Updated",
-                            f"Updated {move.picking_id.name}: to {available_in_source} {self.cr_bom_line_id.product_id.uom_id.name} "
-                            f"of {self.cr_bom_line_id.product_id.display_name} (Vendor: {vendor.partner_id.name})",
-                            "info"
-                        )
-
-                    return_qty = return_qty + move.product_uom_qty
-
-            _logger.info("RETURN needed=%s", needed)
-            return return_qty
-
-        if needed < 0:
-            _logger.info("Needed < 0, reduction flow started | needed=%s", needed)
-            reduction_needed = abs(needed)
-
-            sorted_moves = pending_moves.sorted(key=lambda m: m.product_uom_qty, reverse=True)
-            for move in sorted_moves:
-                if reduction_needed <= 0:
-                    break
-
-                _logger.info(
-                    "Reducing move=%s qty=%s reduction_needed=%s",
-                    move.id, move.product_uom_qty, reduction_needed
-                )
-
-                if move.product_uom_qty <= reduction_needed:
-                    reduction_qty = move.product_uom_qty
-                    reduction_needed -= reduction_qty
-                    picking = move.picking_id
-                    move.unlink()
-                    _logger.info("Removed move=%s reduction_qty=%s", move.id, reduction_qty)
-
-                    if not picking.move_ids_without_package:
-                        picking_name = picking.name
-                        picking.unlink()
-                        _logger.info("Removed empty picking=%s", picking_name)
-                    self._send_notification(
-                        "Internal Transfer Updated",
-                        f"Quantity reduced to {x_qty}",
-                        "warning"
-                    )
-                else:
-                    move.product_uom_qty -= reduction_needed
-                    move.mrp_bom_line_id = self.cr_bom_line_id.id
-                    _logger.info(
-                        "Reduced move=%s by=%s",
-                        move.id, reduction_needed
-                    )
-                    reduction_needed = 0
-
-            existing_demand = sum(pending_moves.exists().mapped("product_uom_qty"))
-            _logger.info("RETURN existing_demand=%s", existing_demand)
-            return existing_demand
-
-        if needed > 0:
-            _logger.info("Needed > 0, creation/update flow started | needed=%s", needed)
-
-            existing_picking = self.env["stock.picking"].search([
-                ("picking_type_id.code", "=", 'internal'),
-                ("partner_id", "=", vendor.partner_id.id),
-                ("owner_id", "=", False),
-                ("location_dest_id", "=", self.location_id.id),
-                ("state", "not in", ["done", "cancel"]),
-            ], limit=1)
-            _logger.info("Existing picking=%s", existing_picking.name if existing_picking else None)
-
-            if existing_picking:
-                existing_picking = existing_picking.filtered(
-                    lambda p: self._should_consider_location(p.location_id, bom_line)
-                )
-
-            if existing_picking:
-                source_location = existing_picking.location_id
-                source_quants = StockQuant.search([
-                    ("product_id", "=", self.cr_bom_line_id.product_id.id),
-                    ("location_id", "=", source_location.id),
-                    ("owner_id", "=", False),
-                    ("quantity", ">", 0),
-                ])
-                available_in_source = sum(source_quants.mapped("quantity"))
-                _logger.info("Available in source=%s", available_in_source)
-
-                if available_in_source:
-                    existing_move = existing_picking.move_ids_without_package.filtered(
-                        lambda m: m.product_id == self.cr_bom_line_id.product_id
-                    )
-                    available_in_source -= existing_move.product_uom_qty
-                    _logger.info("Adjusted available_in_source=%s", available_in_source)
-
-                if available_in_source > 0:
-                    transfer_qty = min(needed, available_in_source)
-                    _logger.info("Transfer qty=%s", transfer_qty)
-
-                    existing_move = existing_picking.move_ids_without_package.filtered(
-                        lambda m: m.product_id == self.cr_bom_line_id.product_id
-                    )
-
-                    if existing_move:
-                        existing_move.with_context(bypass_custom_internal_transfer_restrictions=True).write({
-                            'product_uom_qty': existing_move.product_uom_qty + transfer_qty,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
-                        })
-                        _logger.info("Updated existing move=%s", existing_move.id)
-                    else:
-                        self.env["stock.move"].with_context(
-                            bypass_custom_internal_transfer_restrictions=True
-                        ).create({
-                            "name": self.cr_bom_line_id.product_id.display_name,
-                            "product_id": self.cr_bom_line_id.product_id.id,
-                            "product_uom_qty": transfer_qty,
-                            "product_uom": self.cr_bom_line_id.product_id.uom_id.id,
-                            "picking_id": existing_picking.id,
-                            "location_id": source_location.id,
-                            "location_dest_id": self.location_id.id,
-                            "restrict_partner_id": False,
-                            "mrp_bom_line_id": self.cr_bom_line_id.id,
-                        })
-                        _logger.info("Created new move in picking=%s", existing_picking.name)
-
-                    existing_picking.action_confirm()
-                    existing_picking.root_bom_id = self.root_bom_id.id
-                    existing_demand += transfer_qty
-                    needed -= transfer_qty
-                    _logger.info(
-                        "Updated totals | existing_demand=%s needed=%s",
-                        existing_demand, needed
-                    )
-
-            if needed > 0:
-                total_qty = self._create_multiple_internal_transfers_regular(
-                    vendor.partner_id if vendor else False, needed
-                )
-                _logger.info("total_qty=%s", total_qty)
-                _logger.info("existing_demand(before)=%s", existing_demand)
-                existing_demand += total_qty
-                _logger.info("existing_demand(after)=%s", existing_demand)
-
-        _logger.info("END _calculate_to_transfer | return=%s", existing_demand)
-        return existing_demand
-
+        self.ensure_one()
+        vendor_partner = self._get_transfer_vendor_partner()
+        planned = self._pop_planned_transfer_demand(False, vendor_partner, x_qty, transferred)
+        if planned is not None:
+            return planned
+        return self._reconcile_transfer_demand(
+            [(self, vendor_partner, x_qty, transferred)]
+        ).get(self.id, 0.0)
 
     def _create_multiple_internal_transfers_regular(self, vendor_partner, needed_qty):
         """Override to prioritize TAPY locations for MECH products"""
-        _logger.info(
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('transfers')
+        trace.debug(
             "START _create_multiple_internal_transfers_regular | component=%s vendor=%s needed_qty=%s",
             self.id,
             vendor_partner.id if vendor_partner else None,
@@ -954,41 +719,49 @@ class MrpBomLine(models.Model):
 
         bom_line = self.cr_bom_line_id
         is_mech_product = bom_line and bom_line.product_id.categ_id and bom_line.product_id.categ_id.mech
-        _logger.info(
+        trace.debug(
             "BOM line=%s product=%s is_mech_product=%s",
             bom_line.id if bom_line else None,
             bom_line.product_id.id if bom_line else None,
             is_mech_product
         )
 
+        helpers = self.env['cr.mrp.bom.helpers']
+        stock = helpers._get_free_stock_snapshot([bom_line.product_id.id])[bom_line.product_id.id]
+        if not stock['free'] and not (is_mech_product and stock['tapy']):
+            trace.debug("No FREE/TAPY stock in snapshot for product=%s", bom_line.product_id.id)
+            return 0
+
         all_quants = StockQuant.search([
             ("product_id", "=", bom_line.product_id.id),
             ("owner_id", "=", False),
             ("quantity", ">", 0),
             ("location_id", '!=', self.location_id.id)
         ]).filtered(lambda q: (q.quantity - q.reserved_quantity) > 0)
-        _logger.info("Found all_quants=%s", all_quants.ids)
+        trace.debug("Found all_quants=%s", all_quants.ids)
+        # Resolve the location categories of every candidate quant at once
+        helpers._get_location_stock_flags(all_quants.location_id.ids)
 
         tapy_quants = []
         free_quants = []
 
         for quant in all_quants:
-            _logger.info(
+            trace.debug(
                 "Evaluating quant=%s location=%s qty=%s",
                 quant.id, quant.location_id.id, quant.quantity
             )
 
             if is_mech_product and self._is_tapy_location(quant.location_id):
-                _logger.info("Quant %s is TAPY location", quant.id)
+                trace.debug("Quant %s is TAPY location", quant.id)
                 if not self._has_pending_vendor_transfer_from_location(quant.location_id, vendor_partner):
                     tapy_quants.append(quant)
-                    _logger.info("Added quant %s to tapy_quants", quant.id)
+                    trace.debug("Added quant %s to tapy_quants", quant.id)
 
             elif self._is_free_location(quant.location_id):
-                _logger.info("Quant %s is FREE location", quant.id)
+                trace.debug("Quant %s is FREE location", quant.id)
                 if not self._has_pending_vendor_transfer_from_location(quant.location_id, vendor_partner):
                     free_quants.append(quant)
-                    _logger.info("Added quant %s to free_quants", quant.id)
+                    trace.debug("Added quant %s to free_quants", quant.id)
 
         # Sort each list by quantity descending
         # tapy_quants.sort(key=lambda q: q.quantity, reverse=True)
@@ -996,10 +769,10 @@ class MrpBomLine(models.Model):
         tapy_quants.sort(key=lambda q: (q.quantity - q.reserved_quantity), reverse=True)
         free_quants.sort(key=lambda q: (q.quantity - q.reserved_quantity), reverse=True)
 
-        _logger.info(
+        trace.debug(
             "TAPY quants (sorted)=%s FREE quants (sorted)=%s",
-            [(q.id, q.quantity) for q in tapy_quants],
-            [(q.id, q.quantity) for q in free_quants]
+            lambda: [(q.id, q.quantity) for q in tapy_quants],
+            lambda: [(q.id, q.quantity) for q in free_quants]
         )
 
         total_qty = 0
@@ -1007,14 +780,14 @@ class MrpBomLine(models.Model):
 
         # STEP 1: Try to fulfill completely from TAPY locations
         if is_mech_product and tapy_quants:
-            _logger.info("STEP 1: Attempting to fulfill from TAPY locations | remaining=%s", remaining)
+            trace.debug("STEP 1: Attempting to fulfill from TAPY locations | remaining=%s", remaining)
 
             for quant in tapy_quants:
                 if remaining <= 0:
                     break
 
                 transfer_qty = min(quant.quantity, remaining)
-                _logger.info(
+                trace.debug(
                     "Creating TAPY transfer | quant=%s qty=%s transfer_qty=%s",
                     quant.id, quant.quantity, transfer_qty
                 )
@@ -1028,7 +801,7 @@ class MrpBomLine(models.Model):
                     total_qty += transfer_qty
                     remaining -= transfer_qty
 
-                    _logger.info(
+                    trace.debug(
                         "Created TAPY picking=%s qty=%s | total_qty=%s remaining=%s",
                         picking.name, transfer_qty, total_qty, remaining
                     )
@@ -1043,14 +816,14 @@ class MrpBomLine(models.Model):
 
         # STEP 2: If still needed, fulfill from FREE locations
         if remaining > 0 and free_quants:
-            _logger.info("STEP 2: Attempting to fulfill remaining from FREE locations | remaining=%s", remaining)
+            trace.debug("STEP 2: Attempting to fulfill remaining from FREE locations | remaining=%s", remaining)
 
             for quant in free_quants:
                 if remaining <= 0:
                     break
 
                 transfer_qty = min(quant.quantity, remaining)
-                _logger.info(
+                trace.debug(
                     "Creating FREE transfer | quant=%s qty=%s transfer_qty=%s",
                     quant.id, quant.quantity, transfer_qty
                 )
@@ -1064,7 +837,7 @@ class MrpBomLine(models.Model):
                     total_qty += transfer_qty
                     remaining -= transfer_qty
 
-                    _logger.info(
+                    trace.debug(
                         "Created FREE picking=%s qty=%s | total_qty=%s remaining=%s",
                         picking.name, transfer_qty, total_qty, remaining
                     )
@@ -1077,16 +850,17 @@ class MrpBomLine(models.Model):
                         "success"
                     )
 
-        _logger.info(
-            "END _create_multiple_internal_transfers_regular | return total_qty=%s",
-            total_qty
+        trace.summary(
+            "vendor transfers", component=self.id, quants=len(all_quants),
+            needed=needed_qty, transferred=total_qty,
         )
         return total_qty
 
 
     def _has_pending_vendor_transfer_from_location(self, source_location, vendor_partner):
         """Check if there's already a pending vendor transfer from this location"""
-        _logger.info(
+        trace = self.env['cr.mrp.bom.helpers']._get_tracer('transfers')
+        trace.debug(
             "START _has_pending_vendor_transfer_from_location | component=%s source_location=%s vendor=%s",
             self.id,
             source_location.id if source_location else None,
@@ -1101,7 +875,7 @@ class MrpBomLine(models.Model):
             ("state", "not in", ["done", "cancel"]),
         ], limit=1)
 
-        _logger.info(
+        trace.debug(
             "Existing picking found=%s",
             existing_picking.name if existing_picking else None
         )
@@ -1110,22 +884,24 @@ class MrpBomLine(models.Model):
             existing_move = existing_picking.move_ids_without_package.filtered(
                 lambda m: m.product_id == self.cr_bom_line_id.product_id
             )
-            _logger.info(
+            trace.debug(
                 "Existing move found=%s move_ids=%s",
                 bool(existing_move),
                 existing_move.ids
             )
 
             result = bool(existing_move)
-            _logger.info("RETURN %s", result)
+            trace.debug("RETURN %s", result)
             return result
 
-        _logger.info("RETURN False (no existing picking)")
+        trace.debug("RETURN False (no existing picking)")
         return False
 
     def _create_single_internal_transfer(self, owner, vendor_partner,source_location, quantity):
         """Create a single internal transfer from specific source location"""
-        _logger.info(f'>>>>>>> quantity {quantity}')
+        self.env['cr.mrp.bom.helpers']._get_tracer('transfers').debug(
+            "Creating internal transfer for component=%s quantity=%s", self.id, quantity
+        )
         StockPicking = self.env["stock.picking"]
 
         picking_type = self.env["stock.picking.type"].search([
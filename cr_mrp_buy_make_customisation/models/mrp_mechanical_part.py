@@ -66,8 +66,19 @@ class MrpMechanicalPart(models.Model):
                 parent_branch_name=rec.parent_branch_name
             )
 
+    def action_plan_buy_make_transition(self, new_value):
+        """Read-only impact preview of switching this part to ``new_value``."""
+        self.ensure_one()
+        return self.root_bom_id.action_plan_bom_line_transition(
+            line_id=self.bom_line_id.id,
+            record_model=self._name,
+            record_id=self.id,
+            new_value=new_value,
+            parent_branch_name=self.parent_branch_name
+        )
+
     @api.model
-    def sync_mechanical_parts(self, root_bom, structural_data):
+    def sync_mechanical_parts(self, root_bom, structural_data, scope_parent_branch_names=None):
         """
         Synchronize mechanical.part records with structural data.
         'structural_data' is a list of dicts: [
@@ -75,6 +86,8 @@ class MrpMechanicalPart(models.Model):
              'selection': 'buy/make', 'mo_ids': [IDs]},
             ...
         ]
+        With 'scope_parent_branch_names' (subtree rebuild), only parts under those
+        parent branches are purged; the rest of the root is left untouched.
         """
         # 1. Map existing records for this root BoM
         existing_parts = self.search([('root_bom_id', '=', root_bom.id)])
@@ -113,4 +126,6 @@ class MrpMechanicalPart(models.Model):
         
         # 3. Purge those not in the current structure
         to_unlink = existing_parts.filtered(lambda p: p.path_key not in seen_keys)
+        if scope_parent_branch_names is not None:
+            to_unlink = to_unlink.filtered(lambda p: p.parent_branch_name in scope_parent_branch_names)
         to_unlink.unlink()
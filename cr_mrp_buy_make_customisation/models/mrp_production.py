@@ -137,6 +137,25 @@ class MrpProduction(models.Model):
         return result
 
 
+    def _cancel_and_unlink_with_summary(self, label='MO'):
+        """
+        Cancel and delete these MOs as a single set.
+        Returns the cleanup summary (name, product, state), read in one call beforehand.
+        """
+        if not self:
+            return []
+        summary = [{
+            'name': vals['name'],
+            'product': vals['product_id'][1] if vals['product_id'] else '',
+            'state': vals['state'],
+        } for vals in self.read(['name', 'product_id', 'state'])]
+
+        _logger.info("  ✗ Deleting %s %s(s): %s", len(summary), label, ', '.join(m['name'] for m in summary))
+        self.action_cancel()
+        self.unlink()
+        return summary
+
+
     @api.depends('state', 'reservation_state', 'date_start', 'move_raw_ids', 'move_raw_ids.forecast_availability', 'move_raw_ids.forecast_expected_date', 'move_raw_ids.critical')
     def _compute_components_availability(self):
         # First call original logic
@@ -1,5 +1,12 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+from odoo import api, models, fields
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Last location id scanned by the branch location garbage collector
+BRANCH_GC_CURSOR_PARAM = 'cr_mrp_buy_make.branch_location_gc_cursor'
+
 
 class StockLocation(models.Model):
     _inherit = "stock.location"
@@ -7,4 +14,122 @@ class StockLocation(models.Model):
     location_category = fields.Selection(
         selection_add=[("tapy", "TAPY Location")],
         ondelete={'tapy': 'set null'}
-    )
\ No newline at end of file
+    )
+    branch_root_bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Branch Root BOM',
+        index=True,
+        copy=False,
+        ondelete='set null',
+        help="Root BOM this branch location belongs to. Reused per branch code across structural rebuilds.",
+    )
+
+    # ─────────────────────────────────────────────
+    # Branch location garbage collection
+    # ─────────────────────────────────────────────
+    @api.model
+    def _get_branch_location_gc_candidates(self, limit=None, after_id=0):
+        """
+        Active branch locations with id > ``after_id``, scanned in id order:
+        tagged with a root BOM, or legacy untagged locations named like a
+        branch code directly under a project location.
+        Returns (candidates, last_scanned_id); last_scanned_id is False once
+        the scan reached the end.
+        """
+        helpers = self.env['cr.mrp.bom.helpers']
+        project_locations = self.env['mrp.bom'].search([
+            ('cfe_project_location_id', '!=', False),
+        ]).mapped('cfe_project_location_id')
+
+        domain = [('id', '>', after_id), ('branch_root_bom_id', '!=', False)]
+        if project_locations:
+            domain = [('id', '>', after_id), '|',
+                      ('branch_root_bom_id', '!=', False),
+                      '&', '&',
+                      ('branch_root_bom_id', '=', False),
+                      ('location_id', 'in', project_locations.ids),
+                      ('usage', '=', 'internal')]
+        scanned = self.search(domain, order='id', limit=limit)
+        candidates = scanned.filtered(
+            lambda loc: loc.branch_root_bom_id or helpers.decode_branch_code(loc.name) >= 0
+        )
+        last_id = scanned[-1].id if limit and len(scanned) == limit else False
+        return candidates, last_id
+
+    def _get_referenced_branch_locations(self):
+        """Subset of ``self`` still holding stock, children or open references."""
+        ids = self.ids
+        Production = self.env['mrp.production']
+        referenced = self.env['mrp.bom.line.branch'].search([
+            ('location_id', 'in', ids),
+        ]).mapped('location_id')
+
+        referenced |= self.env['stock.quant'].search([
+            ('location_id', 'in', ids),
+            '|', ('quantity', '!=', 0), ('reserved_quantity', '!=', 0),
+        ]).mapped('location_id')
+
+        referenced |= self.search([('location_id', 'in', ids)]).mapped('location_id')
+
+        moves = self.env['stock.move'].search([
+            ('state', 'not in', ('done', 'cancel')),
+            '|', ('location_id', 'in', ids), ('location_dest_id', 'in', ids),
+        ])
+        referenced |= moves.mapped('location_id') | moves.mapped('location_dest_id')
+
+        productions = Production.search([
+            ('state', 'not in', ('done', 'cancel')),
+            '|', '|', '|',
+            ('location_src_id', 'in', ids),
+            ('location_dest_id', 'in', ids),
+            ('branch_intermediate_location_id', 'in', ids),
+            ('cr_final_location_id', 'in', ids),
+        ])
+        for field_name in ('location_src_id', 'location_dest_id',
+                           'branch_intermediate_location_id', 'cr_final_location_id'):
+            referenced |= productions.mapped(field_name)
+
+        return referenced & self
+
+    def _get_locations_in_use(self):
+        """
+        Subset of ``self`` that cannot be deleted: still linked to a branch or
+        component, or carrying any quant or stock move. One grouped query per table.
+        """
+        ids = self.ids
+        if not ids:
+            return self
+        in_use_ids = set()
+        for model, field_names in (
+            ('mrp.bom.line.branch', ['location_id']),
+            ('mrp.bom.line.branch.components', ['location_id']),
+            ('stock.quant', ['location_id']),
+            ('stock.move', ['location_id', 'location_dest_id']),
+        ):
+            for field_name in field_names:
+                for location, in self.env[model]._read_group([(field_name, 'in', ids)], [field_name]):
+                    in_use_ids.add(location.id)
+        return self.browse(in_use_ids) & self
+
+    @api.model
+    def _cron_archive_unused_branch_locations(self, limit=5000):
+        """
+        Scheduled action: archive branch locations left behind by structural
+        rebuilds that hold no stock and are not referenced anymore.
+        Archived locations stay in the per-root pool and are reactivated on reuse.
+        Each run scans the next ``limit`` locations by id and stores its
+        position, so live locations never starve the rest of the pool.
+        """
+        Param = self.env['ir.config_parameter'].sudo()
+        after_id = int(Param.get_param(BRANCH_GC_CURSOR_PARAM, 0) or 0)
+        candidates, last_id = self._get_branch_location_gc_candidates(limit=limit, after_id=after_id)
+        Param.set_param(BRANCH_GC_CURSOR_PARAM, last_id or 0)
+
+        unused = candidates - candidates._get_referenced_branch_locations()
+        if unused:
+            unused.write({'active': False})
+        _logger.info(
+            "[Branch GC] Archived %s of %s branch location candidate(s) after id %s",
+            len(unused), len(candidates), after_id
+        )
+        return len(unused)
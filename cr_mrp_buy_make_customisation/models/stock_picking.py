@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from odoo import models, fields, api
 
 
@@ -19,129 +21,239 @@ class StockPicking(models.Model):
             limit=1
         )
 
-    def _handle_pick_components(self, picking, mo):
+    def _get_related_mos(self):
+        """Resolve the MOs of all pickings in self by origin with one query."""
+        origins = set(self.filtered('origin').mapped('origin'))
+        if not origins:
+            return {}
+        mos = self.env['mrp.production'].search([('name', 'in', list(origins))])
+        mo_by_name = {}
+        for mo in mos:
+            mo_by_name.setdefault(mo.name, mo)
+        return mo_by_name
+
+    def _get_done_moves(self, picking):
+        return picking.move_ids_without_package.filtered(
+            lambda m: m.state == 'done' and m.quantity > 0
+        )
+
+    def _get_child_mos_by_parent(self, mos):
+        """Map parent MO id -> first child MO, for all ``mos`` at once."""
+        children = self.env['mrp.production'].search([('parent_mo_id', 'in', mos.ids)])
+        child_map = {}
+        for child in children:
+            child_map.setdefault(child.parent_mo_id.id, child)
+        return child_map
+
+    def _get_usage_index(self, picking_mos):
+        """
+        Preload everything the usage handlers need for a list of
+        (picking, mo) pairs: branch components, direct components, unused
+        root branches and child MOs, each with a single query.
+        """
+        ComponentModel = self.env['mrp.bom.line.branch.components']
+        mos = self.env['mrp.production'].concat(*[mo for _picking, mo in picking_mos])
+        products = self.env['stock.move'].concat(
+            *[self._get_done_moves(picking) for picking, _mo in picking_mos]
+        ).mapped('product_id')
+        root_ids = mos.mapped('root_bom_id').ids
+
+        components = {}
+        direct_components = {}
+        for component in ComponentModel.search([
+            ('root_bom_id', 'in', root_ids),
+            ('cr_bom_line_id.product_id', 'in', products.ids),
+            '|',
+            ('is_direct_component', '=', True),
+            ('bom_line_branch_id', 'in', mos.mapped('branch_mapping_id').ids),
+        ]):
+            product_id = component.cr_bom_line_id.product_id.id
+            if component.is_direct_component:
+                direct_components.setdefault((component.root_bom_id.id, product_id), component)
+            else:
+                components.setdefault(
+                    (component.bom_line_branch_id.id, component.root_bom_id.id, product_id), component
+                )
+
+        unused_branches = defaultdict(lambda: self.env['mrp.bom.line.branch'])
+        for branch in self.env['mrp.bom.line.branch'].search([
+            ('bom_id', 'in', root_ids),
+            ('used', '=', 0),
+            ('bom_line_id.product_id', 'in', products.ids),
+        ]):
+            unused_branches[(branch.bom_id.id, branch.bom_line_id.product_id.id)] |= branch
+
+        return {
+            'components': components,
+            'direct_components': direct_components,
+            'unused_branches': unused_branches,
+            'child_mos': self._get_child_mos_by_parent(mos),
+        }
+
+    def _queue_usage_write(self, pending, record, vals, sudo=False):
+        """
+        Buffer a write; later values for the same record/field win, as with
+        sequential writes. ``sudo`` entries go to their own buffer and are
+        applied as superuser.
+        """
+        bucket = (record._name, bool(sudo))
+        other = pending.get((record._name, not sudo), {}).get(record.id)
+        if other:
+            for field_name in vals:
+                other.pop(field_name, None)
+        pending.setdefault(bucket, {}).setdefault(record.id, {}).update(vals)
+
+    def _get_pending_value(self, pending, record, field_name):
+        """Current value of a field, taking buffered writes into account."""
+        for sudo in (False, True):
+            vals = pending.get((record._name, sudo), {}).get(record.id, {})
+            if field_name in vals:
+                return vals[field_name]
+        return record[field_name]
+
+    def _flush_usage_writes(self, pending):
+        """Apply buffered writes, one write() per model, privilege and distinct set of values."""
+        for (model_name, sudo), vals_by_id in pending.items():
+            Model = self.env[model_name].sudo() if sudo else self.env[model_name]
+            groups = defaultdict(list)
+            for record_id, vals in vals_by_id.items():
+                if vals:
+                    groups[tuple(sorted(vals.items()))].append(record_id)
+            for vals_items, record_ids in groups.items():
+                Model.browse(record_ids).write(dict(vals_items))
+        pending.clear()
+
+    def _direct_component_usage_vals(self, quantity):
+        return {'used': quantity, 'transferred': 0, 'transferred_cfe': 0}
+
+    def _handle_pick_components(self, picking, mo, index=None, pending=None):
         # if not mo.branch_mapping_id:
         #     return
+        flush = pending is None
+        if index is None:
+            index = self._get_usage_index([(picking, mo)])
+        if pending is None:
+            pending = {}
 
-        ComponentModel = self.env['mrp.bom.line.branch.components']
-        BranchModel = self.env['mrp.bom.line.branch']
-        MrpModel = self.env['mrp.production']
+        for move in self._get_done_moves(picking):
+            product_id = move.product_id.id
 
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
             # 1️⃣ Update Component
-            component = ComponentModel.search([
-                ('is_direct_component', '=', False),
-                ('bom_line_branch_id', '=', mo.branch_mapping_id.id),
-                ('cr_bom_line_id.product_id', '=', move.product_id.id),
-                ('root_bom_id','=',mo.root_bom_id.id)
-            ], limit=1)
+            component = index['components'].get(
+                (mo.branch_mapping_id.id, mo.root_bom_id.id, product_id)
+            )
 
             if component:
-                component.write({'used': move.quantity, 'transferred': 0,
-                'transferred_cfe': 0,})
-                self._update_child_mo_usage(mo, move, MrpModel)
+                self._queue_usage_write(pending, component, {
+                    'used': move.quantity, 'transferred': 0, 'transferred_cfe': 0,
+                })
+                self._update_child_mo_usage(mo, move, index=index, pending=pending)
                 continue
 
             # 2️⃣ Fallback Branch Update
             if mo.branch_intermediate_location_id:
-                if  mo.bom_id.id == mo.root_bom_id.id:
-                    branches = BranchModel.search([
-                        ('bom_id', '=', mo.root_bom_id.id),
-                        ('used', '=',0)
-                    ])
-
-                    matching_branch = branches.filtered(
-                        lambda b: b.bom_line_id.product_id == move.product_id
+                if mo.bom_id.id == mo.root_bom_id.id:
+                    # Branches already marked used earlier in this batch no longer match
+                    matching_branch = index['unused_branches'][(mo.root_bom_id.id, product_id)].filtered(
+                        lambda b: not self._get_pending_value(pending, b, 'used')
                     )
 
-                    if matching_branch:
-                        matching_branch.write({'used': move.quantity,'transferred': 0,})
+                    for branch in matching_branch:
+                        self._queue_usage_write(pending, branch, {'used': move.quantity, 'transferred': 0})
                 else:
-                    self._update_child_mo_usage(mo, move, MrpModel)
+                    self._update_child_mo_usage(mo, move, index=index, pending=pending)
 
             if not mo.branch_mapping_id:
-                component = ComponentModel.search([
-                    ('is_direct_component', '=', True),
-                    ('root_bom_id','=',mo.root_bom_id.id),
-                    ('cr_bom_line_id.product_id', '=', move.product_id.id)
-                ], limit=1)
+                component = index['direct_components'].get((mo.root_bom_id.id, product_id))
 
                 if component:
-                    component.write({'used': move.quantity, 'transferred': 0,
-                                     'transferred_cfe': 0, })
+                    self._queue_usage_write(pending, component, self._direct_component_usage_vals(move.quantity))
 
+        if flush:
+            self._flush_usage_writes(pending)
 
-    def _update_child_mo_usage(self, mo, move, MrpModel):
-        child_mo = MrpModel.search(
-            [('parent_mo_id', '=', mo.id)],
-            limit=1
-        )
+
+    def _update_child_mo_usage(self, mo, move, index=None, pending=None):
+        if index is not None:
+            child_mo = index['child_mos'].get(mo.id)
+        else:
+            child_mo = self._get_child_mos_by_parent(mo).get(mo.id)
 
         if (
                 child_mo
                 and child_mo.branch_mapping_id
                 and child_mo.branch_mapping_id.bom_line_id.product_id == move.product_id
         ):
-            child_mo.branch_mapping_id.sudo().write({
-                'transferred': 0,
-                'used': move.quantity
-            })
+            vals = {'transferred': 0, 'used': move.quantity}
+            if pending is not None:
+                self._queue_usage_write(pending, child_mo.branch_mapping_id, vals, sudo=True)
+            else:
+                child_mo.branch_mapping_id.sudo().write(vals)
 
-    def _handle_store_finished_product(self, picking, mo):
+    def _handle_store_finished_product(self, picking, mo, pending=None):
         if not mo.branch_mapping_id:
             return
 
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
+        flush = pending is None
+        if pending is None:
+            pending = {}
+
+        for move in self._get_done_moves(picking):
             # Update transferred qty
-            mo.branch_mapping_id.write({
+            self._queue_usage_write(pending, mo.branch_mapping_id, {
                 'transferred': move.quantity
             })
 
-            # Reset all component counters in single write
-            mo.branch_mapping_id.mrp_bom_line_branch_component_ids.write({
-                'to_order': 0,
-                'to_order_cfe': 0,
-                'ordered': 0,
-                'ordered_cfe': 0,
-                'to_transfer': 0,
-                'to_transfer_cfe': 0,
-                'transferred': 0,
-                'transferred_cfe': 0,
-            })
+            # Reset all component counters
+            for component in mo.branch_mapping_id.mrp_bom_line_branch_component_ids:
+                self._queue_usage_write(pending, component, {
+                    'to_order': 0,
+                    'to_order_cfe': 0,
+                    'ordered': 0,
+                    'ordered_cfe': 0,
+                    'to_transfer': 0,
+                    'to_transfer_cfe': 0,
+                    'transferred': 0,
+                    'transferred_cfe': 0,
+                })
+
+        if flush:
+            self._flush_usage_writes(pending)
 
-    def reset_values(self, picking, mo):
+    def reset_values(self, picking, mo, pending=None):
         # Run logic only for root MO
         if (
                 mo.bom_id
                 and mo.root_bom_id
                 and mo.bom_id.id == mo.root_bom_id.id
         ):
+            flush = pending is None
+            if pending is None:
+                pending = {}
+
             branches = self.env['mrp.bom.line.branch'].search([
                 ('bom_id', '=', mo.bom_id.id)
             ])
-
             for branch in branches:
-                branch.write({
+                self._queue_usage_write(pending, branch, {
                     'transferred': 0,
                     'used': 0,
-                    'approve_to_manufacture':False,
+                    'approve_to_manufacture': False,
                 })
 
             components = self.env['mrp.bom.line.branch.components'].search([
                 ('root_bom_id', '=', mo.root_bom_id.id),
             ])
-
             for component in components:
-                component.write({
+                self._queue_usage_write(pending, component, {
                     'used': 0,
                     'transferred': 0,
                     'transferred_cfe': 0,
                 })
 
+            if flush:
+                self._flush_usage_writes(pending)
+
 
 
     @api.model
@@ -19,9 +19,11 @@ class MrpProduction(models.Model):
                     if bom.project_id:
                         vals['project_id'] = bom.project_id.id
 
-                    for line in bom.bom_line_ids:
-                        if not bom._check_all_children_approved(line):
-                            unapproved_lines.append(line.product_id.display_name)
+                    # Stored roll-up: only look at the lines when something below is unapproved
+                    if not bom.subtree_approved:
+                        for line in bom.bom_line_ids:
+                            if not line.subtree_approved:
+                                unapproved_lines.append(line.product_id.display_name)
 
                     if unapproved_lines:
                         raise ValidationError(
@@ -2,7 +2,7 @@
 # Part of Creyox Technologies
 {
     'name': 'Sale Order MTO Multi MO BOM',
-    'version': '18.0.0.15',
+    'version': '18.0.0.17',
     'category': 'Sales',
     'summary': 'Create hierarchical BOMs on SO confirmation for RE orders',
     "author": "Creyox Technologies",
@@ -15,6 +15,8 @@
         'cr_purchase_po_enhancement',
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/mrp_production.xml',
         'views/mrp_bom.xml',
         'views/sale_order.xml',
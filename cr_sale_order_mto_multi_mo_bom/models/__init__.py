@@ -9,5 +9,6 @@ from . import product_template
 from . import sale_order_line
 from . import stock_rule
 from . import sale_order
+from . import sale_order_bom_job
 from . import stock_picking
 from . import purchase_order
\ No newline at end of file
@@ -1,25 +1,13 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
 import uuid
+from collections import defaultdict
+
 from odoo import models, fields, api
 import logging
 
 _logger = logging.getLogger(__name__)
 
-# Generate branch codes: A-Z, A1-Z9, AA-ZZ
-def _generate_branch_codes():
-    codes = []
-    for c in range(ord('A'), ord('Z') + 1):
-        codes.append(chr(c))
-    for c in range(ord('A'), ord('Z') + 1):
-        for d in range(1, 10):
-            codes.append(f"{chr(c)}{d}")
-    for c1 in range(ord('A'), ord('Z') + 1):
-        for c2 in range(ord('A'), ord('Z') + 1):
-            codes.append(chr(c1) + chr(c2))
-    return codes
-
-
 class MrpBom(models.Model):
     _inherit = 'mrp.bom'
 
@@ -182,7 +170,8 @@ class MrpBom(models.Model):
 
             if root_bom.is_so_root_bom:
                 # Root SO BOM (is_so_root_bom=True): assign branches per child BOM
-                root_bom._assign_so_bom_branches()
+                if root_bom._lock_roots_or_defer('branches'):
+                    root_bom._assign_so_bom_branches()
 
             elif root_bom.sale_order_id:
                 # Child SO BOM (has SO but is not root) — handled normally via super()
@@ -194,6 +183,12 @@ class MrpBom(models.Model):
 
         return True
 
+    def _can_transition_subtree(self, line, parent_branch):
+        """SO root BOMs place branches per PN location; keep their full rebuild."""
+        if self.is_so_root_bom:
+            return False
+        return super()._can_transition_subtree(line, parent_branch)
+
     def _assign_so_bom_branches(self):
         """
         Assign branches for a root BOM created from a Sale Order incrementally and recursively.
@@ -202,7 +197,7 @@ class MrpBom(models.Model):
 
         Branch = self.env['mrp.bom.line.branch']
         Component = self.env['mrp.bom.line.branch.components']
-        codes = _generate_branch_codes()
+        helpers = self.env['cr.mrp.bom.helpers']
 
         _logger.info(
             "[SO BOM] Starting recursive incremental branch assignment for root BOM: %s", self.display_name
@@ -215,32 +210,16 @@ class MrpBom(models.Model):
                 self.cfe_project_location_id = project_loc.id
                 _logger.info("[SO BOM] Set cfe_project_location_id for root BOM: %s", project_loc.display_name)
 
-        # Clear old root assignments for this root BOM
-        root_id_str = str(self.id)
-        sub_boms = self.env['mrp.bom'].search([('used_in_root_bom_ids_str', 'ilike', root_id_str)])
-        _logger.info(f"DEBUG SO BOM: Starting assignment for ROOT BOM: {self.id}. Clearing old traces in {len(sub_boms)} sub-boms.")
-        for sub_bom in sub_boms:
-            if sub_bom.used_in_root_bom_ids_str:
-                ids = [i.strip() for i in sub_bom.used_in_root_bom_ids_str.split(',') if i.strip() and i.strip() != root_id_str]
-                sub_bom.used_in_root_bom_ids_str = ",".join(ids)
+        # Sub-BOMs reached by this pass; replaces the root's usage links afterwards
+        used_sub_bom_ids = set()
 
         # OLD CODE COMMENTED OUT AS REQUESTED
         # # Remove old branches/components for this root BOM
         # Branch.search([('bom_id', '=', self.id)]).unlink()
         # Component.search([('root_bom_id', '=', self.id)]).unlink()
 
-        # Initialize index based on existing branches
-        existing_branches = Branch.search([('bom_id', '=', self.id)])
-        existing_names = existing_branches.mapped('branch_name')
-        max_idx = -1
-        for name in existing_names:
-            try:
-                if name in codes:
-                    max_idx = max(max_idx, codes.index(name))
-            except ValueError:
-                continue
-        
-        current_idx_ptr = max_idx + 1
+        # Continue the root's persistent branch code sequence
+        current_idx_ptr = self._get_next_branch_code_index()
         new_branches_to_mo = []
 
         # Use a dictionary to track which lines were processed for component cleanup
@@ -296,11 +275,7 @@ class MrpBom(models.Model):
                     ], limit=1)
 
                     if not branch:
-                        if current_idx_ptr >= len(codes):
-                            _logger.error("[SO BOM] No more branch codes available")
-                            return
-
-                        branch_code = codes[current_idx_ptr]
+                        branch_code = helpers.encode_branch_code(current_idx_ptr)
                         current_idx_ptr += 1
 
                         # Create branch sub-location
@@ -323,18 +298,8 @@ class MrpBom(models.Model):
                         })
                         new_branches_to_mo.append(line.id)
 
-                    # Track BOM usage in Root BOM (The new logic requested by user)
-                    root_id_str = str(self.id)
-                    current_ids = [i.strip() for i in (child_bom.used_in_root_bom_ids_str or '').split(',') if i.strip()]
-                    
-                    _logger.info(f"DEBUG SO BOM: Checking tracking for child BOM {child_bom.id} (under root {root_id_str}). Current strings: {current_ids}")
-                    if root_id_str not in current_ids:
-                        current_ids.append(root_id_str)
-                        new_str = ",".join(current_ids)
-                        child_bom.write({'used_in_root_bom_ids_str': new_str})
-                        _logger.info(f"DEBUG SO BOM: WROTE new string '{new_str}' to child BOM {child_bom.id} ({child_bom.display_name})")
-                    else:
-                        _logger.info(f"DEBUG SO BOM: Root {root_id_str} is ALREADY tracked in child BOM {child_bom.id}")
+                    # Track BOM usage in Root BOM
+                    used_sub_bom_ids.add(child_bom.id)
 
                     # Create/Update assignment for this context
                     Assignment = self.env['mrp.bom.line.branch.assignment']
@@ -418,6 +383,8 @@ class MrpBom(models.Model):
         # Use root project location as the initial parent_location_id for the DFS
         root_proj_loc = self.cfe_project_location_id.id if self.cfe_project_location_id else False
         dfs(self, root_proj_loc, 0, None, None)
+        self._set_next_branch_code_index(current_idx_ptr)
+        self._set_root_sub_boms(used_sub_bom_ids)
 
         _logger.info(
             "[SO BOM] Incremental recursive branch assignment complete for root BOM: %s",
@@ -438,26 +405,44 @@ class MrpBom(models.Model):
         After branch (re)assignment for a root SO BOM, update all draft MOs
         so their branch_intermediate_location_id, branch_mapping_id and
         cr_final_location_id match the latest branch records.
+        Branches and draft MOs are loaded once; MOs sharing the same target
+        values are updated with a single write.
         """
         self.ensure_one()
         Branch = self.env['mrp.bom.line.branch']
+        Production = self.env['mrp.production']
 
-        for line in self.bom_line_ids:
-            child_bom = line.child_bom_id
-            if not child_bom:
-                continue
+        lines = self.bom_line_ids.filtered('child_bom_id')
+        if not lines:
+            return
 
-            branch = Branch.search([
-                ('bom_id', '=', self.id),
-                ('bom_line_id', '=', line.id),
-            ], order='sequence', limit=1)
+        # Lowest-sequence branch per root line
+        branch_by_line = {}
+        for branch in Branch.search([
+            ('bom_id', '=', self.id),
+            ('bom_line_id', 'in', lines.ids),
+        ], order='sequence'):
+            branch_by_line.setdefault(branch.bom_line_id.id, branch)
+
+        # Draft MOs per (line, child BOM)
+        draft_mos_by_line = defaultdict(lambda: Production)
+        for mo in Production.search([
+            ('root_bom_id', '=', self.id),
+            ('line', 'in', [str(line_id) for line_id in lines.ids]),
+            ('state', '=', 'draft'),
+        ]):
+            draft_mos_by_line[(mo.line, mo.bom_id.id)] |= mo
 
+        # Point 4: Special location swap for direct components of SO root BOM
+        # (root_bom is 'self' here)
+        is_direct_so_root_component = self.is_so_root_bom and (self.product_id.name == self.product_id.default_code)
+
+        updates = defaultdict(lambda: Production)
+        for line in lines:
+            child_bom = line.child_bom_id
+            branch = branch_by_line.get(line.id)
             child_loc = self._get_so_child_bom_location(child_bom)
 
-            # Point 4: Special location swap for direct components of SO root BOM
-            # (root_bom is 'self' here)
-            is_direct_so_root_component = self.is_so_root_bom and (self.product_id.name == self.product_id.default_code)
-            
             if is_direct_so_root_component and child_loc:
                 # cr_final_location_id -> root bom's project_location (parent of child_loc)
                 # branch_intermediate_location_id -> its own bom's project_location (child_loc)
@@ -472,27 +457,32 @@ class MrpBom(models.Model):
             if not branch_loc_id and not final_loc_id:
                 continue
 
-            draft_mos = self.env['mrp.production'].search([
-                ('root_bom_id', '=', self.id),
-                ('line', '=', str(line.id)),
-                ('bom_id', '=', child_bom.id),
-                ('state', '=', 'draft'),
-            ])
-
-            if draft_mos:
-                update_vals = {}
-                if branch_loc_id:
-                    update_vals['branch_intermediate_location_id'] = branch_loc_id
-                if final_loc_id:
-                    update_vals['cr_final_location_id'] = final_loc_id
-                if branch:
-                    update_vals['branch_mapping_id'] = branch.id
-                if update_vals:
-                    draft_mos.write(update_vals)
-                    _logger.info(
-                        "[SO BOM] Synced %d draft MO(s) for line '%s' with new branch locations",
-                        len(draft_mos), line.product_id.display_name
-                    )
+            draft_mos = draft_mos_by_line.get((str(line.id), child_bom.id))
+            if not draft_mos:
+                continue
+
+            update_vals = {}
+            if branch_loc_id:
+                update_vals['branch_intermediate_location_id'] = branch_loc_id
+            if final_loc_id:
+                update_vals['cr_final_location_id'] = final_loc_id
+            if branch:
+                update_vals['branch_mapping_id'] = branch.id
+
+            # Only MOs that are actually out of sync
+            stale_mos = draft_mos.filtered(
+                lambda mo: any(mo[field].id != value for field, value in update_vals.items())
+            )
+            if stale_mos:
+                updates[tuple(sorted(update_vals.items()))] |= stale_mos
+
+        for vals_key, mos in updates.items():
+            mos.write(dict(vals_key))
+        if updates:
+            _logger.info(
+                "[SO BOM] Synced %d draft MO(s) for root BOM %s with new branch locations (%d write(s))",
+                sum(len(mos) for mos in updates.values()), self.display_name, len(updates)
+            )
 
 
     # ─────────────────────────────────────────────────────────
@@ -507,6 +497,8 @@ class MrpBom(models.Model):
         Otherwise fall through to super().
         """
         if root_bom is None and self.is_so_root_bom:
+            if not self._lock_roots_or_defer('mos'):
+                return []
             return self._create_so_bom_mos(root_bom=self)
 
         return super().action_create_child_mos_recursive(
@@ -519,23 +511,57 @@ class MrpBom(models.Model):
             parent_branch_id=parent_branch_id,
         )
 
+    def _get_so_mo_unit_chunks(self, root_bom, first_unit, total_units):
+        """
+        Split units first_unit..total_units of a root SO line into (first, last)
+        ranges according to the sale order MO split mode.
+        """
+        if first_unit > total_units:
+            return []
+        order = root_bom.sale_order_id
+        mode = order.so_mo_split_mode if order else 'unit'
+        if mode == 'range':
+            size = total_units - first_unit + 1
+        elif mode == 'batch':
+            size = max(order.so_mo_batch_size, 1)
+        else:
+            size = 1
+        return [
+            (start, min(start + size - 1, total_units))
+            for start in range(first_unit, total_units + 1, size)
+        ]
+
+    def _get_so_part_number(self, code, first_unit, last_unit):
+        """
+        Part number for an SO MO: CODE.01 for a single unit,
+        CODE.01-CODE.10 for a serial range, CODE for aggregated sub-level MOs.
+        """
+        if not first_unit:
+            return f"{code}"
+        if first_unit == last_unit:
+            return f"{code}.{str(first_unit).zfill(2)}"
+        return f"{code}.{str(first_unit).zfill(2)}-{code}.{str(last_unit).zfill(2)}"
+
     def _create_so_bom_mos(self, root_bom=None, parent_mos=None, parent_branch_id=None):
         """
-        Create MOs for an SO-created root BOM hierarchy recursively.
-        - If self == root_bom: split qty N into N separate MOs (qty=1).
+        Create MOs for an SO-created root BOM hierarchy.
+        - If self == root_bom: split qty N into unit MOs (qty=1), batches or a
+          single serial-range MO depending on the sale order MO split mode.
         - If self != root_bom: aggregate requirements of all parent_mos into ONE MO.
         - Links child MOs to parents via M2M parent_mo_ids.
         - Preserves branch mappings and locations at all levels.
+        The tree is planned level by level in memory: every level is created with a
+        single create(vals_list) and existing draft MOs are synced with grouped writes.
         """
         self.ensure_one()
         root_bom = root_bom or self
+        Production = self.env['mrp.production']
         # Convert single parent_mo to recordset if needed for backward compatibility
         if parent_mos and not isinstance(parent_mos, models.AbstractModel):
-             parent_mos = self.env['mrp.production'].browse(parent_mos.id if hasattr(parent_mos, 'id') else parent_mos)
-        
-        parent_mos = parent_mos or self.env['mrp.production']
+            parent_mos = Production.browse(parent_mos.id if hasattr(parent_mos, 'id') else parent_mos)
+
+        parent_mos = parent_mos or Production
 
-        Branch = self.env['mrp.bom.line.branch']
         warehouse = self.env['stock.warehouse'].search(
             [('company_id', '=', self.env.company.id)], limit=1
         )
@@ -543,169 +569,188 @@ class MrpBom(models.Model):
         all_created_mos_data = []
 
         _logger.info(
-            "[SO BOM] Recursive MO creation for BOM: %s (Root: %s, Parents: %s)", 
-            self.display_name, root_bom.display_name, parent_mos.mapped('name')
+            "[SO BOM] MO tree creation for BOM: %s (Root: %s, Parents: %s)",
+            self.display_name, root_bom.display_name, len(parent_mos)
         )
 
-        for line in self.bom_line_ids:
-            child_bom = line.child_bom_id
-            if not child_bom:
-                continue
-
-            # Skip BUY-selected lines
-            if (line.product_id.manufacture_purchase in ('buy', 'buy_make') and
-                    getattr(line, 'buy_make_selection', '') == 'buy'):
-                continue
-
-            # Get child BOM's location (final destination)
-            child_loc = self._get_so_child_bom_location(child_bom)
-            
-            # Find branch mapping for this path (context-aware via root_bom + parent_branch_id)
-            # For aggregated components, branch mapping might be one of the parents' mappings
-            # or we take the first one.
-            branch = Branch.search([
-                ('bom_id', '=', root_bom.id),
-                ('bom_line_id', '=', line.id),
-                ('parent_branch_id', '=', parent_branch_id)
-            ], order='sequence', limit=1)
-
-            # Determine locations
-            is_at_root = (self.id == root_bom.id)
-            
-            if is_at_root and child_loc:
-                final_loc_id = child_loc.location_id.id
-                branch_loc_id = child_loc.id
-            else:
-                # SUB-COMPONENT (Aggregation)
-                branch_loc_id = branch.location_id.id if branch and branch.location_id else (
-                    child_loc.id if child_loc else stock_location.id if stock_location else False
-                )
-                # FIX: In sub-hierarchies, final destination is ALWAYS the parent MO's workstation
-                # If multiple parents, take the first one or project root
-                first_parent = parent_mos[:1]
-                if first_parent and first_parent.branch_intermediate_location_id:
-                    final_loc_id = first_parent.branch_intermediate_location_id.id
-                else:
-                    final_loc_id = child_loc.id if child_loc else (
-                        stock_location.id if stock_location else False
-                    )
-
-            # Quantity and Splitting Logic: 
-            # - If at Root BOM: split qty N into N separate MOs of qty 1.
-            # - If NOT at Root BOM: create ONE MO for the aggregated qty.
-            if is_at_root:
-                total_mo_count = int(line.product_qty or 1)
-                mo_qty_per_creation = 1.0
-            else:
-                total_mo_count = 1
-                # Aggregated qty = sum of parent mo qties * line qty
-                parent_total_qty = sum(parent_mos.mapped('product_qty')) or 1.0
-                mo_qty_per_creation = parent_total_qty * line.product_qty
+        # Load branch mappings and draft MOs of the whole root once
+        branch_map = {}
+        for branch in self.env['mrp.bom.line.branch'].search(
+            [('bom_id', '=', root_bom.id)], order='sequence'
+        ):
+            branch_map.setdefault((branch.bom_line_id.id, branch.parent_branch_id.id or False), branch)
+
+        draft_mo_map = defaultdict(lambda: Production)
+        for mo in Production.search([
+            ('root_bom_id', '=', root_bom.id),
+            ('state', '=', 'draft'),
+        ]):
+            draft_mo_map[(mo.line, mo.bom_id.id)] |= mo
+
+        child_locations = {}
+
+        # Node: (bom, parent MOs, parent branch id)
+        current_level = [(self, parent_mos, parent_branch_id or False)]
+        depth = 0
+        while current_level:
+            next_level = []
+            level_vals = []
+            level_lines = []
+            updates = defaultdict(lambda: Production)
+
+            for bom, node_parents, node_branch_id in current_level:
+                is_at_root = (bom.id == root_bom.id)
+
+                for line in bom.bom_line_ids:
+                    child_bom = line.child_bom_id
+                    if not child_bom:
+                        continue
+
+                    # Skip BUY-selected lines
+                    if (line.product_id.manufacture_purchase in ('buy', 'buy_make') and
+                            getattr(line, 'buy_make_selection', '') == 'buy'):
+                        continue
+
+                    # Get child BOM's location (final destination)
+                    if child_bom.id not in child_locations:
+                        child_locations[child_bom.id] = self._get_so_child_bom_location(child_bom)
+                    child_loc = child_locations[child_bom.id]
+
+                    # Branch mapping for this path (context-aware via root_bom + parent_branch_id)
+                    branch = branch_map.get((line.id, node_branch_id))
+
+                    # Determine locations
+                    if is_at_root and child_loc:
+                        final_loc_id = child_loc.location_id.id
+                        branch_loc_id = child_loc.id
+                    else:
+                        # SUB-COMPONENT (Aggregation)
+                        branch_loc_id = branch.location_id.id if branch and branch.location_id else (
+                            child_loc.id if child_loc else stock_location.id if stock_location else False
+                        )
+                        # In sub-hierarchies, final destination is ALWAYS the parent MO's workstation
+                        # If multiple parents, take the first one or project root
+                        first_parent = node_parents[:1]
+                        if first_parent and first_parent.branch_intermediate_location_id:
+                            final_loc_id = first_parent.branch_intermediate_location_id.id
+                        else:
+                            final_loc_id = child_loc.id if child_loc else (
+                                stock_location.id if stock_location else False
+                            )
+
+                    # Quantity and Splitting Logic:
+                    # - If at Root BOM: split qty N into unit chunks according to the
+                    #   sale order split mode (one MO per unit, batches, or one range MO).
+                    # - If NOT at Root BOM: create ONE MO for the aggregated qty.
+                    if is_at_root:
+                        total_units = int(line.product_qty or 1)
+                        mo_qty_per_creation = 1.0
+                    else:
+                        total_units = 1
+                        # Aggregated qty = sum of parent mo qties * line qty
+                        parent_total_qty = sum(node_parents.mapped('product_qty')) or 1.0
+                        mo_qty_per_creation = parent_total_qty * line.product_qty
+
+                    child_bom_code = child_bom.code or child_bom.display_name
+
+                    # Existing draft MOs for this path: root MOs have no parents,
+                    # aggregated MOs must link to at least one of the current parents.
+                    candidates = draft_mo_map[(str(line.id), child_bom.id)]
+                    if is_at_root:
+                        existing_mos = candidates.filtered(lambda m: not m.parent_mo_ids)
+                    else:
+                        existing_mos = candidates.filtered(lambda m: m.parent_mo_ids & node_parents)
+
+                    # Handle existing MOs: sync locations/quantities
+                    if existing_mos:
+                        write_vals = {
+                            'branch_intermediate_location_id': branch_loc_id,
+                            'cr_final_location_id': final_loc_id,
+                            'branch_mapping_id': branch.id if branch else False,
+                        }
+                        # For aggregated, sync quantity if parent total changed
+                        if not is_at_root and existing_mos[0].product_qty != mo_qty_per_creation:
+                            write_vals['product_qty'] = mo_qty_per_creation
+                        updates[tuple(sorted(write_vals.items()))] |= existing_mos
+
+                    # Determine the unit ranges still to be created
+                    if is_at_root:
+                        covered_units = int(sum(existing_mos.mapped('product_qty')))
+                        chunks = self._get_so_mo_unit_chunks(root_bom, covered_units + 1, total_units)
+                    else:
+                        chunks = [] if existing_mos else [(None, None)]
+
+                    vals_start = len(level_vals)
+                    for first_unit, last_unit in chunks:
+                        mo_vals = {
+                            'product_id': child_bom.product_tmpl_id.product_variant_id.id,
+                            'product_uom_id': child_bom.product_uom_id.id,
+                            'product_qty': (
+                                float(last_unit - first_unit + 1) if first_unit else mo_qty_per_creation
+                            ),
+                            'bom_id': child_bom.id,
+                            'root_bom_id': root_bom.id,
+                            'parent_mo_ids': [(6, 0, node_parents.ids)],
+                            'parent_mo_id': node_parents[0].id if node_parents else False,
+                            'line': line.id,
+                            'cr_final_location_id': final_loc_id,
+                            'branch_intermediate_location_id': branch_loc_id,
+                            'branch_mapping_id': branch.id if branch else False,
+                            'state': 'draft',
+                            'part_number': self._get_so_part_number(child_bom_code, first_unit, last_unit),
+                            'part_serial_from': first_unit or 0,
+                            'part_serial_to': last_unit or 0,
+                        }
+                        if root_bom.project_id:
+                            mo_vals['project_id'] = root_bom.project_id.id
+                        level_vals.append(mo_vals)
+
+                    level_lines.append((
+                        child_bom, branch, is_at_root, existing_mos,
+                        vals_start, len(level_vals) - vals_start,
+                    ))
+
+            # Existing MOs sharing the same target values are written together
+            for write_items, mos in updates.items():
+                mos.write(dict(write_items))
+
+            # Materialize the whole level at once. Locations are carried in the
+            # vals, so no per-MO location context is needed here.
+            created_mos = Production
+            if level_vals:
+                created_mos = Production.with_context(
+                    skip_component_moves=True,
+                    force_skip_component_moves=True,
+                ).create(level_vals)
 
             _logger.info(
-                "[SO BOM] Line %s: is_at_root=%s, total_mo_count=%s, mo_qty_per_creation=%s",
-                line.product_id.display_name, is_at_root, total_mo_count, mo_qty_per_creation
+                "[SO BOM] Level %s of %s: %s MOs created, %s synced",
+                depth, root_bom.code, len(created_mos), sum(len(mos) for mos in updates.values())
             )
 
-            child_bom_code = child_bom.code or child_bom.display_name
-
-            # Check existing draft MOs for this path
-            # For aggregated MOs, we search for MOs linked to ALL parents? 
-            # Actually, just search for an MO for this line/root/parents combination.
-            # Since we aggregate into ONE MO for non-root, we check if one exists.
-            search_domain = [
-                ('root_bom_id', '=', root_bom.id),
-                ('line', '=', str(line.id)),
-                ('bom_id', '=', child_bom.id),
-                ('state', '=', 'draft'),
-            ]
-            if not is_at_root:
-                # For non-root, it must link to at least one of these parents
-                # In our case it should be linked to all, but search by first will suffice
-                search_domain.append(('parent_mo_ids', 'in', parent_mos.ids))
-            else:
-                # For root, it has no parents
-                search_domain.append(('parent_mo_ids', '=', False))
-
-            existing_mos = self.env['mrp.production'].search(search_domain)
-            existing_count = len(existing_mos)
-
-            line_created_mos = self.env['mrp.production']
-
-            # Handle existing MOs: sync locations/quantities
-            if existing_mos:
-                write_vals = {
-                    'branch_intermediate_location_id': branch_loc_id,
-                    'cr_final_location_id': final_loc_id,
-                    'branch_mapping_id': branch.id if branch else False,
-                }
-                # For aggregated, sync quantity if parent total changed
-                if not is_at_root and existing_mos[0].product_qty != mo_qty_per_creation:
-                    write_vals['product_qty'] = mo_qty_per_creation
-                
-                existing_mos.write(write_vals)
-                line_created_mos |= existing_mos
-
-            # Create remaining MOs
-            for i in range(existing_count + 1, total_mo_count + 1):
-                part_suffix = str(i).zfill(2)
+            # Plan next level:
+            # - At root, ALL unit MOs of a line are the parents of ONE aggregated child level.
+            # - Below root, each aggregated MO is the parent of its own children.
+            for child_bom, branch, is_at_root, existing_mos, vals_start, count in level_lines:
+                line_mos = existing_mos | created_mos[vals_start:vals_start + count]
+                for m in line_mos:
+                    all_created_mos_data.append({'name': m.name, 'product': m.product_id.display_name, 'qty': m.product_qty})
+                if not line_mos:
+                    continue
+                branch_id = branch.id if branch else False
                 if is_at_root:
-                    part_number = f"{child_bom_code}.{part_suffix}"
+                    next_level.append((child_bom, line_mos, branch_id))
                 else:
-                    part_number = f"{child_bom_code}"
-
-                mo_vals = {
-                    'product_id': child_bom.product_tmpl_id.product_variant_id.id,
-                    'product_uom_id': child_bom.product_uom_id.id,
-                    'product_qty': mo_qty_per_creation,
-                    'bom_id': child_bom.id,
-                    'root_bom_id': root_bom.id,
-                    'parent_mo_ids': [(6, 0, parent_mos.ids)],
-                    'parent_mo_id': parent_mos[0].id if parent_mos else False,
-                    'line': line.id,
-                    'cr_final_location_id': final_loc_id,
-                    'branch_intermediate_location_id': branch_loc_id,
-                    'branch_mapping_id': branch.id if branch else False,
-                    'state': 'draft',
-                    'part_number': part_number,
-                }
-                if root_bom.project_id:
-                    mo_vals['project_id'] = root_bom.project_id.id
+                    next_level.extend((child_bom, m, branch_id) for m in line_mos)
 
-                mo = self.env['mrp.production'].with_context(
-                    branch_intermediate_location=branch_loc_id,
-                    branch_final_location=final_loc_id,
-                    skip_component_moves=True,
-                    force_skip_component_moves=True,
-                ).create(mo_vals)
-                line_created_mos |= mo
-
-            # Collect results for summary
-            for m in line_created_mos:
-                all_created_mos_data.append({'name': m.name, 'product': m.product_id.display_name, 'qty': m.product_qty})
-
-            # RECURSE: For each created MO (or the single aggregated one), recurse.
-            # If we were at root, we now have multiple unit MOs.
-            # If we were NOT at root, we have one aggregated MO.
-            # To stick to the aggregation rule:
-            # - If self == root_bom, each unit MO recurses separately (because they might have different branches).
-            # - Wait, if sub-components are aggregated, then A1 and A2 should share X.
-            # - So even at root, after creating [A1, A2], we should call recursion ONCE for child_bom with parents=[A1, A2].
-            
-            if is_at_root:
-                # Call recursion ONCE with all unit MOs as parents for the next level
-                child_bom._create_so_bom_mos(root_bom=root_bom, parent_mos=line_created_mos, parent_branch_id=branch.id if branch else False)
-            else:
-                # We are already aggregated. Recurse with our single aggregated MO.
-                for m in line_created_mos:
-                     child_bom._create_so_bom_mos(root_bom=root_bom, parent_mos=m, parent_branch_id=branch.id if branch else False)
+            current_level = next_level
+            depth += 1
 
-        # Notify summary (only at the end of the top-level call)
+        # Notify summary (only for the top-level call)
         if self.id == root_bom.id and not parent_mos and all_created_mos_data:
             src_name = stock_location.display_name if stock_location else "WH/Stock"
-            self.env['bus.bus']._sendone(
+            self.env['cr.mrp.bom.helpers']._queue_notification(
                 self.env.user.partner_id,
-                'simple_notification',
                 {
                     'title': 'Manufacturing Orders Created',
                     'message': (
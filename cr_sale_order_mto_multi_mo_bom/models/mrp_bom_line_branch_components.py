@@ -39,6 +39,12 @@ class MrpBomLineBranchComponentsSoBom(models.Model):
 
     # ── CFE flow ──────────────────────────────────────────────────────────────
 
+    def _get_cfe_customer(self):
+        """SO root BOMs have no project: the customer comes from the child BOM's project."""
+        if self._is_so_root_bom():
+            return self._get_so_bom_customer()
+        return super()._get_cfe_customer()
+
     # def _process_cfe_flow(self):
     #     self.ensure_one()
     #
@@ -36,6 +36,17 @@ class MrpProduction(models.Model):
         ),
     )
 
+    part_serial_from = fields.Integer(
+        string='First Unit',
+        copy=False,
+        help='First unit serial covered by this MO when it carries a serial range.',
+    )
+    part_serial_to = fields.Integer(
+        string='Last Unit',
+        copy=False,
+        help='Last unit serial covered by this MO when it carries a serial range.',
+    )
+
     # ─────────────────────────────────────────────────────────
     # Approve all sibling MOs when this one is approved
     # ─────────────────────────────────────────────────────────
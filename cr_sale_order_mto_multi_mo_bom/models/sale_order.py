@@ -15,11 +15,56 @@ class SaleOrder(models.Model):
         help='Number of BOMs linked to this Sale Order.',
     )
 
+    so_mo_split_mode = fields.Selection(
+        [
+            ('unit', 'One MO per Unit'),
+            ('batch', 'Batches of Units'),
+            ('range', 'Single MO (Serial Range)'),
+        ],
+        string='MO Split Mode',
+        default='unit',
+        help='How root-level quantities are split into Manufacturing Orders. '
+             'Batch and range MOs keep per-unit traceability through their part number range.',
+    )
+    so_mo_batch_size = fields.Integer(
+        string='MO Batch Size',
+        default=10,
+        help='Number of units per Manufacturing Order in batch mode.',
+    )
+
+    bom_job_ids = fields.One2many(
+        'sale.order.bom.job',
+        'sale_order_id',
+        string='BOM Generation Jobs',
+        copy=False,
+    )
+    bom_job_state = fields.Selection(
+        related='bom_job_ids.state',
+        string='BOM Generation',
+    )
+    bom_job_stage = fields.Selection(
+        related='bom_job_ids.stage',
+        string='BOM Generation Stage',
+    )
+    bom_job_progress = fields.Integer(
+        related='bom_job_ids.progress',
+        string='BOM Generation Progress',
+    )
+    bom_job_error = fields.Text(
+        related='bom_job_ids.last_error',
+        string='BOM Generation Error',
+    )
+
     def _compute_bom_count(self):
+        # One grouped query for all orders in self
+        counts = {
+            order.id: count
+            for order, count in self.env['mrp.bom']._read_group(
+                [('sale_order_id', 'in', self.ids)], ['sale_order_id'], ['__count']
+            )
+        }
         for order in self:
-            order.bom_count = self.env['mrp.bom'].search_count([
-                ('sale_order_id', '=', order.id)
-            ])
+            order.bom_count = counts.get(order.id, 0)
 
     so_confirmed_mo_count = fields.Integer(
         string='Confirmed MOs',
@@ -28,19 +73,21 @@ class SaleOrder(models.Model):
 
     @api.depends('bom_count')
     def _compute_so_confirmed_mo_count(self):
+        # Root SO BOMs of all orders, then one grouped MO count per root BOM
+        root_boms = self.env['mrp.bom'].search([
+            ('sale_order_id', 'in', self.ids),
+            ('project_id', '=', False),
+        ])
+        order_by_root = {bom.id: bom.sale_order_id.id for bom in root_boms}
+        counts = dict.fromkeys(self.ids, 0)
+        if root_boms:
+            for root_bom, count in self.env['mrp.production']._read_group(
+                [('root_bom_id', 'in', root_boms.ids), ('state', '!=', 'draft')],
+                ['root_bom_id'], ['__count'],
+            ):
+                counts[order_by_root[root_bom.id]] += count
         for order in self:
-            # Find root SO BOMs for this order
-            root_boms = self.env['mrp.bom'].search([
-                ('sale_order_id', '=', order.id),
-                ('project_id', '=', False),
-            ])
-            if not root_boms:
-                order.so_confirmed_mo_count = 0
-                continue
-            order.so_confirmed_mo_count = self.env['mrp.production'].search_count([
-                ('root_bom_id', 'in', root_boms.ids),
-                ('state', '!=', 'draft'),
-            ])
+            order.so_confirmed_mo_count = counts.get(order.id, 0)
 
     def action_view_so_confirmed_mos(self):
         self.ensure_one()
@@ -113,30 +160,53 @@ class SaleOrder(models.Model):
     # ─────────────────────────────────────────────
     def action_confirm(self):
         res = super().action_confirm()
-        for order in self:
-            try:
-                order._create_order_boms()
-            except Exception as e:
-                _logger.error(
-                    "Failed to create BOMs for SO %s: %s", order.name, str(e)
-                )
+        # BOM/MO generation runs in a background job per order
+        self.env['sale.order.bom.job']._enqueue_for_orders(self)
         return res
 
+    def action_retry_bom_job(self):
+        """Re-queue the latest failed BOM generation job from its last checkpoint."""
+        for order in self:
+            job = order.bom_job_ids[:1]
+            if job and job.state == 'failed':
+                job.action_retry()
+        return True
+
     def _create_order_boms(self):
         """
-        Main logic for Sale Order -> recursive EVR BOM hierarchy.
+        Main logic for Sale Order -> recursive EVR BOM hierarchy (synchronous).
+        The background job runs the same stages with a checkpoint after each one.
         Performance: Use skip_branch_recompute=True during creation steps.
         """
         self.ensure_one()
         _logger.info("[BOM] Starting SO-BOM creation for SO %s", self.name)
-        
-        # ── 1. Preparation ────────────────────────────────────────────────
-        so_digits = self._get_so_digits()
-        evr_code = f"EVR{so_digits}"
-        project_id = getattr(self, 'project_id', False)
-        project_id = project_id.id if project_id else False
 
-        # ── 2. Parent Product ─────────────────────────────────────────────
+        parent_product = self._create_so_parent_product()
+        parent_bom = self._create_so_bom_structure(parent_product)
+
+        # ── 5. Final Finalization ──────────────────────────────────────────
+        _logger.info("[BOM] Finalizing root BOM hierarchy for %s", parent_bom.code)
+        try:
+            # 5.1 Assign branches
+            parent_bom._assign_branches_for_bom()
+
+            # 5.2 Create MOs for the whole tree
+            _logger.info("[SO BOM] Creating MOs for parent BOM %s", parent_bom.code)
+            parent_bom.action_create_child_mos_recursive()
+
+        except Exception as e:
+            _logger.exception(
+                "[SO BOM] Error finalizing branches/MOs for BOM %s: %s",
+                parent_bom.code, e
+            )
+
+        return parent_bom
+
+    def _create_so_parent_product(self):
+        """Stage 'products': create the parent EVR{digits} product of the order."""
+        self.ensure_one()
+        evr_code = f"EVR{self._get_so_digits()}"
+
         _logger.info("[BOM] Creating parent EVR product: %s", evr_code)
         evr_category = self.env['product.category'].search(
             [('name', '=ilike', 'EVR')], limit=1
@@ -149,7 +219,17 @@ class SaleOrder(models.Model):
         if evr_category:
             tmpl_vals['categ_id'] = evr_category.id
         parent_template = self.env['product.template'].create(tmpl_vals)
-        parent_product = parent_template.product_variant_ids[:1]
+        return parent_template.product_variant_ids[:1]
+
+    def _create_so_bom_structure(self, parent_product):
+        """Stage 'boms': create or sync the parent BOM, child BOMs and parent BOM lines."""
+        self.ensure_one()
+
+        # ── 1. Preparation ────────────────────────────────────────────────
+        so_digits = self._get_so_digits()
+        evr_code = f"EVR{so_digits}"
+        project_id = getattr(self, 'project_id', False)
+        project_id = project_id.id if project_id else False
 
         # ── 3. Parent BOM ────────────────────────────────────────────────
         parent_bom = self.env['mrp.bom'].search([
@@ -176,7 +256,7 @@ class SaleOrder(models.Model):
                 sync_vals['project_id'] = project_id
             if not parent_bom.is_so_root_bom:
                 sync_vals['is_so_root_bom'] = True
-            
+
             if sync_vals:
                 parent_bom.with_context(skip_branch_recompute=True).write(sync_vals)
 
@@ -217,7 +297,7 @@ class SaleOrder(models.Model):
                     sync_vals['project_id'] = project_id
                 if child_bom.code != everest_pn:
                     sync_vals['code'] = everest_pn
-                
+
                 if sync_vals:
                     child_bom.with_context(skip_branch_recompute=True).write(sync_vals)
 
@@ -249,22 +329,6 @@ class SaleOrder(models.Model):
                         'product_qty': line.product_uom_qty
                     })
 
-        # ── 5. Final Finalization ──────────────────────────────────────────
-        _logger.info("[BOM] Finalizing root BOM hierarchy for %s", parent_bom.code)
-        try:
-            # 5.1 Assign branches
-            parent_bom._assign_so_bom_branches()
-            
-            # 5.2 Create MOs for the whole tree
-            _logger.info("[SO BOM] Creating MOs for parent BOM %s", parent_bom.code)
-            parent_bom._create_so_bom_mos()
-            
-        except Exception as e:
-            _logger.exception(
-                "[SO BOM] Error finalizing branches/MOs for BOM %s: %s",
-                parent_bom.code, e
-            )
-        
         return parent_bom
 
     # ─────────────────────────────────────────────
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+from datetime import timedelta
+
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Ordered pipeline stages and the progress reached once a stage is entered
+JOB_STAGES = [
+    ('products', 'Products'),
+    ('boms', 'BOMs'),
+    ('branches', 'Branches'),
+    ('mos', 'Manufacturing Orders'),
+    ('done', 'Done'),
+]
+STAGE_PROGRESS = {
+    'products': 0,
+    'boms': 25,
+    'branches': 50,
+    'mos': 75,
+    'done': 100,
+}
+
+
+class SaleOrderBomJob(models.Model):
+    _name = 'sale.order.bom.job'
+    _description = 'Sale Order BOM/MO Generation Job'
+    _order = 'id desc'
+    _rec_name = 'sale_order_id'
+
+    sale_order_id = fields.Many2one(
+        'sale.order',
+        string='Sale Order',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    state = fields.Selection(
+        [
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True,
+    )
+    stage = fields.Selection(
+        JOB_STAGES,
+        string='Stage',
+        default='products',
+        required=True,
+        help='Next stage to run. Completed stages are never re-run on retry.',
+    )
+    progress = fields.Integer(
+        string='Progress (%)',
+        compute='_compute_progress',
+        store=True,
+    )
+    parent_product_id = fields.Many2one(
+        'product.product',
+        string='Parent Product',
+        ondelete='set null',
+        help='Parent EVR product created by the Products stage, reused by later stages and retries.',
+    )
+    parent_bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Parent BOM',
+        ondelete='set null',
+        help='Root SO BOM produced by the BOMs stage.',
+    )
+    attempts = fields.Integer(string='Attempts', default=0)
+    max_attempts = fields.Integer(string='Max Attempts', default=3)
+    last_error = fields.Text(string='Last Error', readonly=True)
+    date_started = fields.Datetime(string='Started On', readonly=True)
+    date_done = fields.Datetime(string='Finished On', readonly=True)
+
+    @api.depends('stage')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = STAGE_PROGRESS.get(job.stage, 0)
+
+    # ─────────────────────────────────────────────
+    # Queueing
+    # ─────────────────────────────────────────────
+    @api.model
+    def _enqueue_for_orders(self, orders):
+        """Create one pending job per order (unless one is already queued) and wake the worker."""
+        active_orders = self.search([
+            ('sale_order_id', 'in', orders.ids),
+            ('state', 'in', ('pending', 'running')),
+        ]).mapped('sale_order_id')
+        new_orders = orders - active_orders
+        jobs = self.create([{'sale_order_id': order.id} for order in new_orders])
+        if jobs:
+            self._trigger_worker()
+        return jobs
+
+    @api.model
+    def _trigger_worker(self):
+        cron = self.env.ref(
+            'cr_sale_order_mto_multi_mo_bom.ir_cron_process_so_bom_jobs',
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron._trigger()
+
+    def action_retry(self):
+        """Reset failed jobs so the worker resumes them from their last checkpoint."""
+        failed = self.filtered(lambda j: j.state == 'failed')
+        failed.write({'state': 'pending', 'attempts': 0, 'last_error': False})
+        if failed:
+            self._trigger_worker()
+        return True
+
+    # ─────────────────────────────────────────────
+    # Worker
+    # ─────────────────────────────────────────────
+    @api.model
+    def _cron_process_so_bom_jobs(self, limit=10):
+        """
+        Scheduled action: run pending jobs, retry failed ones that still have
+        attempts left and pick up jobs left 'running' by a dead worker.
+        """
+        stale_before = fields.Datetime.now() - timedelta(hours=1)
+        jobs = self.search([
+            '|',
+            ('state', 'in', ('pending', 'failed')),
+            '&', ('state', '=', 'running'), ('write_date', '<', stale_before),
+        ], order='id asc')
+        jobs = jobs.filtered(lambda j: j.state != 'failed' or j.attempts < j.max_attempts)[:limit]
+
+        _logger.info("[SO BOM Job] Processing %s job(s)", len(jobs))
+        for job in jobs:
+            job._run()
+
+    def _run(self):
+        """
+        Run the remaining stages of this job. Each finished stage is committed
+        so a failure (or a killed worker) resumes from the last checkpoint.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        self.write({
+            'state': 'running',
+            'attempts': self.attempts + 1,
+            'date_started': fields.Datetime.now(),
+        })
+        cr.commit()
+
+        order = self.sale_order_id
+        stage_keys = [key for key, _label in JOB_STAGES]
+        try:
+            while self.stage != 'done':
+                _logger.info("[SO BOM Job] %s: running stage '%s'", order.name, self.stage)
+                if not self._run_stage(self.stage):
+                    # Root BOM busy in another transaction: resume this stage on a later run
+                    _logger.info("[SO BOM Job] %s: root BOM busy, stage '%s' postponed", order.name, self.stage)
+                    self.write({'state': 'pending', 'attempts': self.attempts - 1})
+                    cr.commit()
+                    return False
+                self.stage = stage_keys[stage_keys.index(self.stage) + 1]
+                # Checkpoint: the stage result survives later failures
+                cr.commit()
+        except Exception as e:
+            cr.rollback()
+            _logger.exception("[SO BOM Job] %s failed at stage '%s'", order.name, self.stage)
+            self.write({'state': 'failed', 'last_error': str(e)})
+            cr.commit()
+            return False
+
+        self.write({
+            'state': 'done',
+            'last_error': False,
+            'date_done': fields.Datetime.now(),
+        })
+        cr.commit()
+        _logger.info("[SO BOM Job] %s: BOM/MO generation complete", order.name)
+        return True
+
+    def _get_stage_order(self):
+        """
+        The job's sale order in its own company (warehouse and locations follow
+        it), acting as the salesperson so notifications reach them rather than
+        the cron user. Runs in superuser mode like the worker itself.
+        """
+        self.ensure_one()
+        order = self.sale_order_id
+        user = order.user_id or self.env.user
+        return order.with_company(order.company_id).with_user(user).sudo()
+
+    def _run_stage(self, stage):
+        """
+        Execute a single pipeline stage for the job's sale order. Returns False
+        when the root BOM is being rebuilt by another transaction, so the stage
+        is retried by the job rather than deferred to the rebuild queue.
+        """
+        order = self._get_stage_order()
+        if stage == 'products':
+            if not self.parent_product_id:
+                self.parent_product_id = order._create_so_parent_product()
+        elif stage == 'boms':
+            if not self.parent_product_id:
+                self.parent_product_id = order._create_so_parent_product()
+            self.parent_bom_id = order._create_so_bom_structure(self.parent_product_id.with_env(order.env))
+        elif stage in ('branches', 'mos'):
+            root_bom = self.parent_bom_id.with_env(order.env)
+            # The lock is re-entrant: once held, the locked entry points below never defer
+            if root_bom and not root_bom._try_lock_root_rebuild():
+                return False
+            if stage == 'branches':
+                root_bom._assign_branches_for_bom()
+            else:
+                root_bom.action_create_child_mos_recursive()
+        return True
@@ -13,126 +13,76 @@ class StockPickingSoBom(models.Model):
     def _get_related_mo(self, origin):
         return self.env['mrp.production'].search([('name', '=', origin)], limit=1)
 
+    def _get_child_mos_by_parent(self, mos):
+        """SO MOs may link to their parents through parent_mo_ids as well."""
+        children = self.env['mrp.production'].search([
+            '|',
+            ('parent_mo_id', 'in', mos.ids),
+            ('parent_mo_ids', 'in', mos.ids),
+        ])
+        child_map = {}
+        for child in children:
+            for parent in child.parent_mo_id | child.parent_mo_ids:
+                child_map.setdefault(parent.id, child)
+        return child_map
+
+    def _direct_component_usage_vals(self, quantity):
+        return {
+            'used': quantity, 'to_order': 0, 'to_order_cfe': 0,
+            'ordered': 0, 'ordered_cfe': 0,
+            'to_transfer': 0, 'to_transfer_cfe': 0,
+            'transferred': 0, 'transferred_cfe': 0,
+        }
+
     # ── main override ─────────────────────────────────────────────────────────
 
     def button_validate(self):
         res = super().button_validate()
 
-        for picking in self:
-            if picking.picking_type_id.code != 'internal' or not picking.origin:
-                continue
-
-            mo = self._get_related_mo(picking.origin)
-            if not mo:
-                continue
-
+        pickings = self.filtered(
+            lambda p: p.picking_type_id.code == 'internal' and p.origin
+        )
+        if not pickings:
+            return res
+
+        # Resolve all MOs once, then build one shared lookup index
+        mo_by_name = pickings._get_related_mos()
+        picking_mos = [
+            (picking, mo_by_name[picking.origin])
+            for picking in pickings
+            if picking.origin in mo_by_name
+        ]
+        if not picking_mos:
+            return res
+
+        index = self._get_usage_index(picking_mos)
+        pending = {}
+
+        for picking, mo in picking_mos:
             is_so = self._is_so_bom_mo(mo)
             is_direct_comp = mo.bom_id.sale_order_id
 
             if picking.picking_type_id.name == 'Pick Components':
                 if is_so and is_direct_comp:
-                    self._handle_so_pick_components(picking, mo)
+                    self._handle_so_pick_components(picking, mo, index=index, pending=pending)
                 else:
-                    self._handle_pick_components(picking, mo)
+                    self._handle_pick_components(picking, mo, index=index, pending=pending)
 
             elif picking.picking_type_id.name == 'Store Finished Product':
                 if is_so and is_direct_comp:
-                    self._handle_so_store_finished_product(picking, mo)
+                    self._handle_so_store_finished_product(picking, mo, pending=pending)
                 else:
-                    self._handle_store_finished_product(picking, mo)
-                    self.reset_values(picking, mo)
+                    self._handle_store_finished_product(picking, mo, pending=pending)
+                    self.reset_values(picking, mo, pending=pending)
 
-        return res
+        # Grouped writes for everything touched by the validated pickings
+        self._flush_usage_writes(pending)
 
-    # ── Normal EVR BOM handlers (from cr_mrp_buy_make_customisation) ──────────
-
-    def _handle_pick_components(self, picking, mo):
-        ComponentModel = self.env['mrp.bom.line.branch.components']
-        BranchModel = self.env['mrp.bom.line.branch']
-        MrpModel = self.env['mrp.production']
-
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
-            component = ComponentModel.search([
-                ('is_direct_component', '=', False),
-                ('bom_line_branch_id', '=', mo.branch_mapping_id.id),
-                ('cr_bom_line_id.product_id', '=', move.product_id.id),
-                ('root_bom_id', '=', mo.root_bom_id.id),
-            ], limit=1)
-
-            if component:
-                component.write({'used': move.quantity, 'transferred': 0, 'transferred_cfe': 0})
-                self._update_child_mo_usage(mo, move, MrpModel)
-                continue
-
-            if mo.branch_intermediate_location_id:
-                if mo.bom_id.id == mo.root_bom_id.id:
-                    branches = BranchModel.search([
-                        ('bom_id', '=', mo.root_bom_id.id),
-                        ('used', '=', 0),
-                    ])
-                    matching_branch = branches.filtered(
-                        lambda b: b.bom_line_id.product_id == move.product_id
-                    )
-                    if matching_branch:
-                        matching_branch.write({'used': move.quantity, 'transferred': 0})
-                else:
-                    self._update_child_mo_usage(mo, move, MrpModel)
-
-            if not mo.branch_mapping_id:
-                component = ComponentModel.search([
-                    ('is_direct_component', '=', True),
-                    ('root_bom_id', '=', mo.root_bom_id.id),
-                    ('cr_bom_line_id.product_id', '=', move.product_id.id),
-                ], limit=1)
-                if component:
-                    component.write({'used': move.quantity, 'to_order': 0, 'to_order_cfe': 0,
-                'ordered': 0, 'ordered_cfe': 0,
-                'to_transfer': 0, 'to_transfer_cfe': 0,
-                'transferred': 0, 'transferred_cfe': 0,})
-
-    def _update_child_mo_usage(self, mo, move, MrpModel):
-        child_mo = MrpModel.search([
-            '|',
-            ('parent_mo_id', '=', mo.id),
-            ('parent_mo_ids', 'in', [mo.id])
-        ], limit=1)
-        if (
-            child_mo
-            and child_mo.branch_mapping_id
-            and child_mo.branch_mapping_id.bom_line_id.product_id == move.product_id
-        ):
-            child_mo.branch_mapping_id.sudo().write({'transferred': 0, 'used': move.quantity})
-
-    def _handle_store_finished_product(self, picking, mo):
-        if not mo.branch_mapping_id:
-            return
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
-            mo.branch_mapping_id.write({'transferred': move.quantity})
-            mo.branch_mapping_id.mrp_bom_line_branch_component_ids.write({
-                'to_order': 0, 'to_order_cfe': 0,
-                'ordered': 0, 'ordered_cfe': 0,
-                'to_transfer': 0, 'to_transfer_cfe': 0,
-                'transferred': 0, 'transferred_cfe': 0,
-            })
-
-    def reset_values(self, picking, mo):
-        if mo.bom_id and mo.root_bom_id and mo.bom_id.id == mo.root_bom_id.id:
-            branches = self.env['mrp.bom.line.branch'].search([('bom_id', '=', mo.bom_id.id)])
-            for branch in branches:
-                branch.write({'transferred': 0, 'used': 0, 'approve_to_manufacture': False})
-            components = self.env['mrp.bom.line.branch.components'].search([
-                ('root_bom_id', '=', mo.root_bom_id.id)
-            ])
-            for component in components:
-                component.write({'used': 0, 'transferred': 0, 'transferred_cfe': 0})
+        return res
 
     # ── SO BOM handlers ───────────────────────────────────────────────────────
 
-    def _handle_so_pick_components(self, picking, mo):
+    def _handle_so_pick_components(self, picking, mo, index=None, pending=None):
         """
         Per-MO (qty=1) logic:
           used      += 1
@@ -141,20 +91,19 @@ class StockPickingSoBom(models.Model):
         """
         if not mo.branch_mapping_id:
             return
-        ComponentModel = self.env['mrp.bom.line.branch.components']
-        MrpModel = self.env['mrp.production']
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
-            comp = ComponentModel.search([
-                ('is_direct_component', '=', False),
-                ('bom_line_branch_id', '=', mo.branch_mapping_id.id),
-                ('cr_bom_line_id.product_id', '=', move.product_id.id),
-                ('root_bom_id', '=', mo.root_bom_id.id),
-            ], limit=1)
+        flush = pending is None
+        if index is None:
+            index = self._get_usage_index([(picking, mo)])
+        if pending is None:
+            pending = {}
+
+        for move in self._get_done_moves(picking):
+            comp = index['components'].get(
+                (mo.branch_mapping_id.id, mo.root_bom_id.id, move.product_id.id)
+            )
             if comp:
-                comp.write({
-                    'used': (comp.used or 0) + move.quantity,
+                self._queue_usage_write(pending, comp, {
+                    'used': (self._get_pending_value(pending, comp, 'used') or 0) + move.quantity,
                     'transferred': 0,
                     'to_order': 0, 'to_order_cfe': 0,
                     'ordered': 0, 'ordered_cfe': 0,
@@ -163,31 +112,36 @@ class StockPickingSoBom(models.Model):
                 })
             else:
                 # Fallback: find child MO where current MO is listed as parent
-                child_mo = MrpModel.search([
-                    '|',
-                    ('parent_mo_id', '=', mo.id),
-                    ('parent_mo_ids', 'in', [mo.id])
-                ], limit=1)
+                child_mo = index['child_mos'].get(mo.id)
                 if (
                     child_mo
                     and child_mo.branch_mapping_id
                     and child_mo.branch_mapping_id.bom_line_id.product_id == move.product_id
                 ):
-                    child_mo.branch_mapping_id.write({
-                        'used': (child_mo.branch_mapping_id.used or 0) + move.quantity,
+                    branch = child_mo.branch_mapping_id
+                    self._queue_usage_write(pending, branch, {
+                        'used': (self._get_pending_value(pending, branch, 'used') or 0) + move.quantity,
                         'transferred': 0,
                     })
 
-    def _handle_so_store_finished_product(self, picking, mo):
+        if flush:
+            self._flush_usage_writes(pending)
+
+    def _handle_so_store_finished_product(self, picking, mo, pending=None):
         """
         Accumulate transferred on branch (no reset — other MOs still pending).
         """
         if not mo.branch_mapping_id:
             return
-        for move in picking.move_ids_without_package.filtered(
-                lambda m: m.state == 'done' and m.quantity > 0
-        ):
-            mo.branch_mapping_id.write({
-                'transferred': (mo.branch_mapping_id.transferred or 0) + move.quantity,
+        flush = pending is None
+        if pending is None:
+            pending = {}
+
+        branch = mo.branch_mapping_id
+        for move in self._get_done_moves(picking):
+            self._queue_usage_write(pending, branch, {
+                'transferred': (self._get_pending_value(pending, branch, 'transferred') or 0) + move.quantity,
             })
 
+        if flush:
+            self._flush_usage_writes(pending)